@@ -0,0 +1,124 @@
+// Клиент для facets/*.json (sitegen/facets.py): битовые маски по порядковым
+// номерам заклинаний, пересечение без обхода строк таблицы.
+window.Facets = (function () {
+  // popcount одного байта
+  const POP = new Uint8Array(256);
+  for (let i = 1; i < 256; i++) POP[i] = (i & 1) + POP[i >> 1];
+
+  function bytesFromBase64(s) {
+    const bin = atob(s);
+    const out = new Uint8Array(bin.length);
+    for (let i = 0; i < bin.length; i++) out[i] = bin.charCodeAt(i);
+    return out;
+  }
+
+  // "b..." — готовая маска, "d..." — LEB128-разности между номерами
+  function decode(encoded, n) {
+    const size = (n + 7) >> 3;
+    const data = bytesFromBase64(encoded.slice(1));
+    if (encoded[0] === "b") return data;
+
+    const bits = new Uint8Array(size);
+    let o = -1;
+    for (let i = 0; i < data.length;) {
+      let gap = 0, shift = 0, b;
+      do {
+        b = data[i++];
+        gap += (b & 0x7f) * 2 ** shift;
+        shift += 7;
+      } while (b & 0x80);
+      o += gap + 1;
+      bits[o >> 3] |= 1 << (o & 7);
+    }
+    return bits;
+  }
+
+  function and(masks) {
+    const out = masks[0].slice();
+    for (let m = 1; m < masks.length; m++) {
+      const other = masks[m];
+      for (let i = 0; i < out.length; i++) out[i] &= other[i];
+    }
+    return out;
+  }
+
+  function count(bits) {
+    let c = 0;
+    for (let i = 0; i < bits.length; i++) c += POP[bits[i]];
+    return c;
+  }
+
+  // номера установленных битов с start-го по end-й (не включая)
+  function select(bits, start, end) {
+    const out = [];
+    let seen = 0;
+    for (let i = 0; i < bits.length && seen < end; i++) {
+      const byte = bits[i];
+      if (!byte) continue;
+      if (seen + POP[byte] <= start) {
+        seen += POP[byte];
+        continue;
+      }
+      for (let j = 0; j < 8; j++) {
+        if (!(byte & (1 << j))) continue;
+        if (seen >= start && seen < end) out.push(i * 8 + j);
+        seen++;
+      }
+    }
+    return out;
+  }
+
+  function open(base) {
+    const cache = new Map();
+
+    function fetchJson(path) {
+      if (!cache.has(path)) {
+        cache.set(path, fetch(base + path).then(r => {
+          if (!r.ok) throw new Error(r.status + " " + path);
+          return r.json();
+        }));
+      }
+      return cache.get(path);
+    }
+
+    return fetchJson("meta.json").then(meta => {
+      const decoded = new Map();
+
+      return {
+        meta: meta,
+        size: meta.spells,
+
+        // [[key, label, count], ...] в порядке списка фильтра
+        values: family => meta.facets[family] || [],
+
+        async bitmap(family, key) {
+          const id = family + "\u0000" + key;
+          if (!decoded.has(id)) {
+            const maps = await fetchJson(family + ".json");
+            decoded.set(id, key in maps ? decode(maps[key], meta.spells) : new Uint8Array((meta.spells + 7) >> 3));
+          }
+          return decoded.get(id);
+        },
+
+        // filters: {family: key}; null, если ни один фильтр не выбран
+        async query(filters) {
+          const parts = Object.entries(filters).filter(([, key]) => key);
+          if (parts.length === 0) return null;
+          const masks = await Promise.all(parts.map(([family, key]) => this.bitmap(family, key)));
+          const bits = and(masks);
+          return { bits: bits, total: count(bits) };
+        },
+
+        // документы [row, title, spell_id, manuscript_id, siglum, page_label]
+        async docs(ordinals) {
+          const chunk = meta.doc_chunk;
+          const need = Array.from(new Set(ordinals.map(o => Math.floor(o / chunk))));
+          const chunks = new Map(await Promise.all(need.map(async c => [c, await fetchJson("d/" + c + ".json")])));
+          return ordinals.map(o => chunks.get(Math.floor(o / chunk))[o % chunk]);
+        },
+      };
+    });
+  }
+
+  return { open, decode, and, count, select };
+})();
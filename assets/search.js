@@ -0,0 +1,110 @@
+(function () {
+  const form = document.getElementById("search-form");
+  const input = document.getElementById("search-q");
+  const statusEl = document.getElementById("search-status");
+  const list = document.getElementById("search-results");
+
+  if (!form || !input || !statusEl || !list) return;
+
+  const indexBase = form.getAttribute("data-index") || "/search/";
+  const siteRoot = form.getAttribute("data-root") || "";
+  const MAX_RESULTS = 50;
+  const cache = new Map();
+
+  // должно совпадать с sitegen/search.py: normalize() + tokenize()
+  function normalize(s) {
+    return (s || "")
+      .normalize("NFD")
+      .replace(/\p{Mn}/gu, "")
+      .normalize("NFC")
+      .replace(/[܏ـ]/g, "")
+      .toLowerCase();
+  }
+
+  function tokenize(s) {
+    return (normalize(s).match(/[\p{L}\p{N}_]+/gu) || []).filter(t => t !== "_");
+  }
+
+  function fetchJson(path) {
+    if (!cache.has(path)) {
+      cache.set(path, fetch(indexBase + path).then(r => {
+        if (!r.ok) throw new Error(r.status + " " + path);
+        return r.json();
+      }));
+    }
+    return cache.get(path);
+  }
+
+  function shardKey(token, len) {
+    return Array.from(token).slice(0, len).map(c => c.codePointAt(0).toString(16)).join("-");
+  }
+
+  // все документы, в которых есть токен, начинающийся с term
+  async function lookup(meta, term) {
+    const key = shardKey(term, meta.prefix_len);
+    if (!meta.shards.includes(key)) return new Set();
+
+    const shard = await fetchJson("s/" + key + ".json");
+    const hits = new Set();
+    for (const tok in shard) {
+      if (tok.startsWith(term)) shard[tok].forEach(o => hits.add(o));
+    }
+    return hits;
+  }
+
+  function docHref(doc) {
+    const dir = doc[0] === "m" ? "/manuscripts/" : "/spells/";
+    return siteRoot + dir + encodeURIComponent(doc[1]) + ".html";
+  }
+
+  async function run(q) {
+    list.innerHTML = "";
+    const meta = await fetchJson("meta.json");
+    const terms = tokenize(q).filter(t => Array.from(t).length >= meta.prefix_len);
+
+    if (terms.length === 0) {
+      statusEl.textContent = q.trim() ? "Type at least " + meta.prefix_len + " letters." : "";
+      return;
+    }
+
+    const sets = await Promise.all(terms.map(t => lookup(meta, t)));
+    sets.sort((a, b) => a.size - b.size);
+    const found = Array.from(sets[0]).filter(o => sets.every(s => s.has(o))).sort((a, b) => a - b);
+
+    const shown = found.slice(0, MAX_RESULTS);
+    const chunkIds = Array.from(new Set(shown.map(o => Math.floor(o / meta.doc_chunk))));
+    const chunks = new Map(await Promise.all(
+      chunkIds.map(async n => [n, await fetchJson("d/" + n + ".json")])
+    ));
+
+    for (const o of shown) {
+      const doc = chunks.get(Math.floor(o / meta.doc_chunk))[o % meta.doc_chunk];
+      const li = document.createElement("li");
+      const a = document.createElement("a");
+      a.href = docHref(doc);
+      a.textContent = doc[2] || doc[1];
+      li.appendChild(a);
+      if (doc[3]) li.appendChild(document.createTextNode(" (" + doc[3] + ")"));
+      list.appendChild(li);
+    }
+
+    const noun = found.length === 1 ? "result" : "results";
+    statusEl.textContent = found.length + " " + noun +
+      (found.length > shown.length ? " (showing first " + shown.length + ")" : "");
+  }
+
+  form.addEventListener("submit", (e) => {
+    e.preventDefault();
+    const q = input.value;
+    const p = new URLSearchParams(window.location.search);
+    p.set("q", q);
+    history.replaceState(null, "", window.location.pathname + "?" + p.toString());
+    run(q).catch(err => { statusEl.textContent = "Search failed: " + err.message; });
+  });
+
+  const initial = new URLSearchParams(window.location.search).get("q") || "";
+  if (initial) {
+    input.value = initial;
+    run(initial).catch(err => { statusEl.textContent = "Search failed: " + err.message; });
+  }
+})();
@@ -1,19 +1,44 @@
 (function () {
-  // только верхнеуровневые строки таблицы (без вложенной таблицы occurrences)
-  const rows = Array.from(document.querySelectorAll("#sp-table > tbody > tr"))
-    .filter(r => r.hasAttribute("data-letter"));
+  // в HTML только первая страница; остальное подгружается из spells/data/<LETTER>-<n>.json
+  const table = document.getElementById("sp-table");
+  const tbody = table ? table.querySelector(":scope > tbody") : null;
 
   const countEl = document.getElementById("sp-count");
   const alphaRoot = document.getElementById("sp-alpha-filter");
   const perSel = document.getElementById("sp-per-page");
   const pagerEls = Array.from(document.querySelectorAll('[data-role="sp-pager"]'));
+  const facetsForm = document.getElementById("sp-facets");
+  const facetSels = facetsForm ? Array.from(facetsForm.querySelectorAll("select[data-facet]")) : [];
 
-  if (!rows.length || !countEl || !alphaRoot || !perSel || pagerEls.length === 0) return;
+  if (!tbody || !countEl || !alphaRoot || !perSel || pagerEls.length === 0) return;
+
+  const dataSrc = table.getAttribute("data-src") || "";
+  const siteRoot = table.getAttribute("data-root") || "";
+  const chunkSize = parseInt(table.getAttribute("data-chunk") || "100", 10);
+  const counts = JSON.parse(table.getAttribute("data-counts") || "{}");
+  const chunkCache = new Map();
 
   const allowedPer = new Set([20, 50, 100]);
   const allowedLetters = new Set(["ALL", "OTHER", ..."ABCDEFGHIJKLMNOPQRSTUVWXYZ".split("")]);
 
-  const state = { letter: "ALL", per: 20, page: 1 };
+  const state = { letter: "ALL", per: 20, page: 1, facets: {} };
+
+  // фильтры по рукописи / категории / ... — битовые маски из facets/ (assets/facets.js)
+  const facetsReady = (facetsForm && window.Facets)
+    ? window.Facets.open(facetsForm.getAttribute("data-src") || "").catch(() => null)
+    : Promise.resolve(null);
+
+  function facetActive() {
+    return Object.values(state.facets).some(Boolean);
+  }
+
+  function setFacetParams(p) {
+    for (const sel of facetSels) {
+      const family = sel.getAttribute("data-facet");
+      if (state.facets[family]) p.set(family, state.facets[family]);
+      else p.delete(family);
+    }
+  }
 
   function readStateFromUrl() {
     const p = new URLSearchParams(window.location.search);
@@ -25,6 +50,13 @@
     state.page = Number.isFinite(page) && page > 0 ? page : 1;
     state.letter = allowedLetters.has(letter) ? letter : "ALL";
 
+    state.facets = {};
+    for (const sel of facetSels) {
+      const family = sel.getAttribute("data-facet");
+      state.facets[family] = p.get(family) || "";
+      sel.value = state.facets[family];
+    }
+
     perSel.value = String(state.per);
   }
 
@@ -33,6 +65,7 @@
     p.set("per", String(state.per));
     p.set("page", String(page));
     p.set("letter", state.letter);
+    setFacetParams(p);
     return window.location.pathname + "?" + p.toString();
   }
 
@@ -41,12 +74,66 @@
     p.set("per", String(state.per));
     p.set("page", String(state.page));
     p.set("letter", state.letter);
+    setFacetParams(p);
     history.replaceState(null, "", window.location.pathname + "?" + p.toString());
   }
 
-  function rowsForLetter(letter) {
-    if (letter === "ALL") return rows;
-    return rows.filter(r => (r.getAttribute("data-letter") || "OTHER") === letter);
+  function fetchChunk(letter, n) {
+    const key = letter + "-" + n;
+    if (!chunkCache.has(key)) {
+      chunkCache.set(key, fetch(dataSrc + key + ".json").then(r => {
+        if (!r.ok) throw new Error(r.status + " " + key);
+        return r.json();
+      }));
+    }
+    return chunkCache.get(key);
+  }
+
+  // строки [start, end) выбранной буквы; затрагивает не больше двух чанков
+  async function loadRows(letter, start, end) {
+    if (end <= start) return [];
+    const first = Math.floor(start / chunkSize);
+    const last = Math.floor((end - 1) / chunkSize);
+    const parts = [];
+    for (let n = first; n <= last; n++) parts.push(fetchChunk(letter, n));
+    const rows = [].concat(...(await Promise.all(parts)));
+    return rows.slice(start - first * chunkSize, end - first * chunkSize);
+  }
+
+  function link(href, text) {
+    const a = document.createElement("a");
+    a.href = href;
+    a.textContent = text;
+    return a;
+  }
+
+  // та же разметка, что в templates/spells_index.html
+  function renderRow(row) {
+    const [title, refs] = row;
+    const tr = document.createElement("tr");
+
+    const tdTitle = document.createElement("td");
+    tdTitle.textContent = title || "Untitled";
+    tr.appendChild(tdTitle);
+
+    const tdRefs = document.createElement("td");
+    const inner = document.createElement("table");
+    const innerBody = document.createElement("tbody");
+    for (const [spellId, msId, siglum, page] of refs) {
+      const r = document.createElement("tr");
+      const c1 = document.createElement("td");
+      c1.appendChild(link(siteRoot + "/manuscripts/" + msId + ".html", siglum));
+      const c2 = document.createElement("td");
+      c2.appendChild(link(siteRoot + "/spells/" + spellId + ".html", page));
+      r.appendChild(c1);
+      r.appendChild(c2);
+      innerBody.appendChild(r);
+    }
+    inner.appendChild(innerBody);
+    tdRefs.appendChild(inner);
+    tr.appendChild(tdRefs);
+
+    return tr;
   }
 
   function addPagerItem(container, label, page, opts) {
@@ -98,24 +185,95 @@
     }
   }
 
-  function apply() {
-    const filtered = rowsForLetter(state.letter);
-    const total = filtered.length;
+  // документы подряд идущих номеров с одним row — одна строка таблицы
+  function groupDocs(docs) {
+    const rows = [];
+    let last = null;
+    for (const [row, title, spellId, msId, siglum, page] of docs) {
+      if (!last || last.row !== row) {
+        last = { row: row, data: [title, []] };
+        rows.push(last);
+      }
+      last.data[1].push([spellId, msId, siglum, page]);
+    }
+    return rows.map(r => r.data);
+  }
 
-    const pages = Math.max(1, Math.ceil(total / state.per));
-    state.page = Math.min(Math.max(1, state.page), pages);
+  async function applyFacets(seq, index) {
+    const filters = Object.assign({}, state.facets);
+    if (state.letter !== "ALL") filters.letter = state.letter;
+
+    let rows;
+    let total;
+    try {
+      const res = await index.query(filters);
+      total = res.total;
+
+      const pages = Math.max(1, Math.ceil(total / state.per));
+      state.page = Math.min(Math.max(1, state.page), pages);
+      const start = (state.page - 1) * state.per;
+      rows = groupDocs(await index.docs(window.Facets.select(res.bits, start, start + state.per)));
+    } catch (err) {
+      countEl.textContent = "Failed to load filters: " + err.message;
+      return;
+    }
+    if (seq !== applySeq) return;
 
-    rows.forEach(r => (r.style.display = "none"));
+    const noun = (total === 1) ? "spell" : "spells";
+    countEl.textContent = total + " " + noun + " matching the filters" + (state.letter === "ALL" ? "" : (" (" + state.letter + ")"));
+    renderPager(total);
+    writeStateToUrl();
 
-    const start = (state.page - 1) * state.per;
-    const end = start + state.per;
-    filtered.slice(start, end).forEach(r => (r.style.display = ""));
+    const frag = document.createDocumentFragment();
+    rows.forEach(row => frag.appendChild(renderRow(row)));
+    tbody.replaceChildren(frag);
+  }
+
+  let applySeq = 0;
+  // статическая первая страница из HTML совпадает с ALL / 20 / 1
+  let staticShown = true;
+
+  async function apply() {
+    const seq = ++applySeq;
+    if (facetActive()) {
+      const index = await facetsReady;
+      if (seq !== applySeq) return;
+      if (index) {
+        staticShown = false;
+        return applyFacets(seq, index);
+      }
+    }
+
+    const total = counts[state.letter] || 0;
+
+    const pages = Math.max(1, Math.ceil(total / state.per));
+    state.page = Math.min(Math.max(1, state.page), pages);
 
     const noun = (total === 1) ? "spell title" : "spell titles";
     countEl.textContent = total + " " + noun + (state.letter === "ALL" ? "" : (" (" + state.letter + ")"));
 
     renderPager(total);
     writeStateToUrl();
+
+    if (staticShown && state.letter === "ALL" && state.per === 20 && state.page === 1) return;
+    staticShown = false;
+
+    const start = (state.page - 1) * state.per;
+    const end = Math.min(total, start + state.per);
+
+    let rows;
+    try {
+      rows = await loadRows(state.letter, start, end);
+    } catch (err) {
+      countEl.textContent += " — failed to load: " + err.message;
+      return;
+    }
+    // пользователь успел переключить страницу, пока шла загрузка
+    if (seq !== applySeq) return;
+
+    const frag = document.createDocumentFragment();
+    rows.forEach(row => frag.appendChild(renderRow(row)));
+    tbody.replaceChildren(frag);
   }
 
   alphaRoot.addEventListener("click", (e) => {
@@ -151,6 +309,28 @@
     });
   }
 
+  for (const sel of facetSels) {
+    sel.addEventListener("change", () => {
+      state.facets[sel.getAttribute("data-facet")] = sel.value;
+      state.page = 1;
+      apply();
+    });
+  }
+
+  facetsReady.then(index => {
+    if (!index) return;
+    for (const sel of facetSels) {
+      for (const [key, label, n] of index.values(sel.getAttribute("data-facet"))) {
+        const opt = document.createElement("option");
+        opt.value = key;
+        opt.textContent = label + " (" + n + ")";
+        sel.appendChild(opt);
+      }
+      sel.value = state.facets[sel.getAttribute("data-facet")] || "";
+    }
+    facetsForm.hidden = false;
+  });
+
   window.addEventListener("popstate", () => {
     readStateFromUrl();
     apply();
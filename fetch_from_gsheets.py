@@ -1,63 +1,319 @@
-import os
-import csv
-import json
-from pathlib import Path
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-
-# !!! ЗДЕСЬ ВСТАВЬТЕ ВАШ ID ТАБЛИЦЫ !!!
-SPREADSHEET_ID = "1rZ8OgKe-lJWTASpfwLWwEC1sOdvFCeu1RmxeQ8v3NyQ"
-
-# Имена листов в том порядке, в каком они есть в таблице
-# Если ваши листы называются иначе, исправьте здесь
-SHEET_NAMES = ["manuscripts", "spells", "categories", "spell_categories"]
-
-# Папка для сохранения CSV
-DATA_DIR = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
-
-def fetch_sheet_to_csv(sheet_name):
-    """Читает лист и сохраняет как CSV с разделителем ';'."""
-    # Получаем лист по имени
-    worksheet = sh.worksheet(sheet_name)
-    # Читаем все значения (список списков)
-    records = worksheet.get_all_values()
-    if not records:
-        return
-    # Первая строка — заголовки столбцов
-    headers = records[0]
-    # Остальные строки — данные
-    rows = records[1:]
-
-    # Путь для сохранения
-    csv_path = DATA_DIR / f"{sheet_name}.csv"
-    with open(csv_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f, delimiter=";")
-        writer.writerow(headers)
-        writer.writerows(rows)
-    print(f"✓ {sheet_name}.csv сохранён, {len(rows)} строк")
-
-if __name__ == "__main__":
-    # Авторизация через сервисный аккаунт
-    # Ключ берётся из переменной окружения (секрета GitHub)
-    creds_json = os.environ.get("GCP_SERVICE_ACCOUNT_KEY")
-    if not creds_json:
-        raise ValueError("GCP_SERVICE_ACCOUNT_KEY environment variable not set")
-
-    # Загружаем ключ из строки JSON
-    creds_dict = json.loads(creds_json)
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    credentials = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    gc = gspread.authorize(credentials)
-
-    # Открываем таблицу по ID
-    sh = gc.open_by_key(SPREADSHEET_ID)
-
-    # Обрабатываем каждый лист
-    for sheet_name in SHEET_NAMES:
-        try:
-            fetch_sheet_to_csv(sheet_name)
-        except Exception as e:
-            print(f"Ошибка при обработке листа {sheet_name}: {e}")
-
-            raise  # Если ошибка, прекращаем выполнение
\ No newline at end of file
+import os
+import csv
+import json
+import hashlib
+import time
+import random
+import argparse
+import sys
+from pathlib import Path
+
+# корпуса из конфига разбирает тот же код, что и у build_site.py --config
+sys.path.insert(0, str(Path(__file__).resolve().parent / "scripts"))
+from sitegen.corpora import load_corpora  # noqa: E402
+
+# !!! ЗДЕСЬ ВСТАВЬТЕ ВАШ ID ТАБЛИЦЫ !!!
+SPREADSHEET_ID = "1rZ8OgKe-lJWTASpfwLWwEC1sOdvFCeu1RmxeQ8v3NyQ"
+
+# Имена листов в том порядке, в каком они есть в таблице
+# Если ваши листы называются иначе, исправьте здесь
+SHEET_NAMES = ["manuscripts", "spells", "categories", "spell_categories"]
+
+# Папка для сохранения CSV
+DATA_DIR = Path("data")
+
+# Метка последней успешной загрузки (modifiedTime таблицы) и хеши записанных CSV
+STATE_PATH = Path(".build/fetch.json")
+
+# Повторы при превышении квоты (429) и временных ошибках сервера
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimited(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _gspread_call(fn, *args, **kwargs):
+    # превышение квоты и временные ошибки API -> RateLimited для with_backoff
+    from gspread.exceptions import APIError
+
+    try:
+        return fn(*args, **kwargs)
+    except APIError as e:
+        status = getattr(e.response, "status_code", None)
+        if status in RETRY_STATUSES:
+            retry_after = e.response.headers.get("Retry-After")
+            raise RateLimited(str(e), float(retry_after) if retry_after else None) from e
+        raise
+
+
+class GspreadTransport:
+    """Настоящая таблица через gspread: один batchGet на все листы."""
+
+    def __init__(self, spreadsheet):
+        self.sh = spreadsheet
+
+    def _call(self, fn, *args, **kwargs):
+        return _gspread_call(fn, *args, **kwargs)
+
+    def modified_time(self):
+        return self._call(self.sh.get_lastUpdateTime)
+
+    def batch_values(self, sheet_names):
+        # имя листа в A1-нотации: кавычки внутри удваиваются
+        ranges = ["'" + name.replace("'", "''") + "'" for name in sheet_names]
+        resp = self._call(self.sh.values_batch_get, ranges)
+        value_ranges = resp.get("valueRanges", [])
+        return [_fill_gaps(vr.get("values", [])) for vr in value_ranges]
+
+
+class FakeSheetsSession:
+    """Офлайн-замена HTTP-сессии gspread: отвечает как Sheets/Drive API.
+
+    Данные — JSON вида {"modifiedTime": "...", "sheets": {"spells": [[...], ...]}}.
+    gspread.Client(None, session=FakeSheetsSession(...)) проходит тот же путь,
+    что и с настоящей таблицей: GspreadTransport, batchGet с A1-диапазонами,
+    обрезанные пустые хвосты строк, modifiedTime из Drive. Статусы из
+    ``failures`` (например [429, 503]) отдаются первым запросам по одному,
+    чтобы проверить повторы with_backoff.
+    """
+
+    def __init__(self, data, failures=(), retry_after=None):
+        self.data = data
+        self.failures = list(failures)
+        self.retry_after = retry_after
+        self.requests = []  # (url, params) каждого запроса
+
+    @classmethod
+    def from_file(cls, path: Path, failures=()):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), failures)
+
+    def get(self, url, params=None, **kwargs):
+        self.requests.append((url, params))
+        if self.failures:
+            status = self.failures.pop(0)
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+            return self._response(status, {"error": {"code": status, "message": "injected failure"}}, headers)
+
+        # .../drive/v3/files/<id> или .../spreadsheets/<id>[/values:batchGet]
+        path = url.split("/drive/v3/files/", 1)[-1].split("/spreadsheets/", 1)[-1]
+        spreadsheet_id = path.split("/")[0]
+        if url.startswith("https://www.googleapis.com/drive/v3/files/"):
+            return self._response(200, {
+                "id": spreadsheet_id,
+                "name": spreadsheet_id,
+                "modifiedTime": self.data.get("modifiedTime"),
+            })
+        if url.endswith("/values:batchGet"):
+            sheets = self.data.get("sheets", {})
+            value_ranges = []
+            for a1 in (params or {}).get("ranges", []):
+                name = a1[1:-1].replace("''", "'") if a1.startswith("'") else a1
+                if name not in sheets:
+                    return self._response(400, {"error": {"code": 400, "message": f"Unable to parse range: {a1}"}})
+                # как настоящий API: пустые ячейки в конце строк не приходят
+                rows = []
+                for row in sheets[name]:
+                    row = list(row)
+                    while row and row[-1] == "":
+                        row.pop()
+                    rows.append(row)
+                value_ranges.append({"range": a1, "majorDimension": "ROWS", "values": rows})
+            return self._response(200, {"spreadsheetId": spreadsheet_id, "valueRanges": value_ranges})
+        if url.startswith("https://sheets.googleapis.com/v4/spreadsheets/"):
+            return self._response(200, {
+                "spreadsheetId": spreadsheet_id,
+                "properties": {"title": spreadsheet_id},
+                "sheets": [{"properties": {"title": name, "index": i}} for i, name in enumerate(self.data.get("sheets", {}))],
+            })
+        return self._response(404, {"error": {"code": 404, "message": f"Not found: {url}"}})
+
+    def _response(self, status, body, headers=None):
+        from requests.models import Response
+
+        r = Response()
+        r.status_code = status
+        r._content = json.dumps(body).encode("utf-8")
+        r.encoding = "utf-8"
+        r.headers.update({"Content-Type": "application/json", **(headers or {})})
+        return r
+
+
+def _fill_gaps(values):
+    # batchGet обрезает пустые хвосты строк; get_all_values() их дополнял
+    width = max((len(r) for r in values), default=0)
+    return [list(r) + [""] * (width - len(r)) for r in values]
+
+
+def with_backoff(fn, *args):
+    """Вызывает fn, при RateLimited ждёт экспоненциально растущую паузу."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return fn(*args)
+        except RateLimited as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = e.retry_after or BACKOFF_BASE * (2 ** attempt) + random.uniform(0, BACKOFF_BASE)
+            print(f"… лимит запросов ({e}), повтор через {delay:.1f} с")
+            time.sleep(delay)
+
+
+def load_state(path=STATE_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+
+
+def csv_hash(path):
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def write_sheet_csv(sheet_name, records, data_dir=DATA_DIR):
+    """Сохраняет значения листа как CSV с разделителем ';'."""
+    if not records:
+        return False
+    # Первая строка — заголовки столбцов
+    headers = records[0]
+    # Остальные строки — данные
+    rows = records[1:]
+
+    # Путь для сохранения
+    csv_path = data_dir / f"{sheet_name}.csv"
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(headers)
+        writer.writerows(rows)
+    print(f"✓ {sheet_name}.csv сохранён, {len(rows)} строк")
+    return True
+
+
+def fetch_all(transport, sheet_names=SHEET_NAMES, force=False, data_dir=DATA_DIR, state_path=STATE_PATH):
+    """Скачивает все листы одним запросом, если таблица менялась.
+
+    Возвращает False, если загрузка пропущена: modifiedTime не изменился и
+    CSV на диске те же, что были записаны (кеш .build/ мог пережить data/).
+    """
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    stamp = with_backoff(transport.modified_time)
+    state = load_state(state_path)
+    sheets = state.get("sheets")
+    same_csv = isinstance(sheets, dict) and all(
+        csv_hash(data_dir / f"{name}.csv") == h for name, h in sheets.items()
+    )
+
+    if not force and stamp and state.get("modifiedTime") == stamp and same_csv:
+        print(f"• таблица не менялась с {stamp}, загрузка пропущена")
+        return False
+
+    values = with_backoff(transport.batch_values, list(sheet_names))
+    if len(values) != len(sheet_names):
+        raise RuntimeError(f"Ожидалось {len(sheet_names)} листов, получено {len(values)}")
+
+    written = [name for name, records in zip(sheet_names, values) if write_sheet_csv(name, records, data_dir)]
+
+    # метку сохраняем только после успешной записи всех листов
+    hashes = {name: csv_hash(data_dir / f"{name}.csv") for name in written}
+    save_state({"modifiedTime": stamp, "sheets": hashes}, state_path)
+    return True
+
+
+def gspread_client():
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    # Авторизация через сервисный аккаунт
+    # Ключ берётся из переменной окружения (секрета GitHub)
+    creds_json = os.environ.get("GCP_SERVICE_ACCOUNT_KEY")
+    if not creds_json:
+        raise ValueError("GCP_SERVICE_ACCOUNT_KEY environment variable not set")
+
+    # Загружаем ключ из строки JSON
+    creds_dict = json.loads(creds_json)
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    credentials = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    return gspread.authorize(credentials)
+
+
+def offline_client(path, failures=()):
+    import gspread
+
+    # настоящий клиент gspread, но запросы уходят в FakeSheetsSession
+    return gspread.Client(None, session=FakeSheetsSession.from_file(path, failures))
+
+
+def gspread_transport(gc, spreadsheet_id=SPREADSHEET_ID):
+    # Открываем таблицу по ID (open_by_key тоже делает запрос к API)
+    return GspreadTransport(with_backoff(_gspread_call, gc.open_by_key, spreadsheet_id))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Скачать листы Google Sheets в data/*.csv")
+    parser.add_argument(
+        "--from-file",
+        type=Path,
+        help="Взять листы из локального JSON вместо Google Sheets (офлайн, через gspread и FakeSheetsSession).",
+    )
+    parser.add_argument(
+        "--inject-errors",
+        type=lambda v: [int(x) for x in v.split(",") if x.strip()],
+        default=[],
+        metavar="429,503",
+        help="С --from-file: первые запросы получают эти HTTP-статусы (проверка повторов).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Скачать заново, даже если таблица не менялась.",
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        help="Скачать таблицы всех корпусов из JSON-конфига (см. build_site.py --config), "
+        "каждую в свою папку data_dir. С --from-file путь может содержать {name}.",
+    )
+    args = parser.parse_args()
+
+    if not args.config:
+        if args.from_file:
+            gc = offline_client(args.from_file, args.inject_errors)
+        else:
+            gc = gspread_client()
+        fetch_all(gspread_transport(gc), force=args.force)
+    else:
+        try:
+            corpora = load_corpora(args.config)
+        except ValueError as e:
+            parser.error(str(e))
+        missing = [c.name for c in corpora if not c.spreadsheet_id and not args.from_file]
+        if missing:
+            parser.error(f"{args.config}: нет spreadsheet_id у корпусов {', '.join(missing)}")
+        # одна авторизация на все таблицы
+        gc = None if args.from_file else gspread_client()
+        for corpus in corpora:
+            print(f"== {corpus.name}")
+            if args.from_file:
+                gc = offline_client(Path(str(args.from_file).replace("{name}", corpus.name)), args.inject_errors)
+            fetch_all(
+                gspread_transport(gc, corpus.spreadsheet_id or corpus.name),
+                corpus.sheet_names,
+                force=args.force,
+                data_dir=corpus.data_dir,
+                state_path=corpus.build_dir / "fetch.json",
+            )
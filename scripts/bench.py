@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from gen_corpus import generate
+
+SCRIPTS = Path(__file__).resolve().parent
+BENCH_DIR = Path(".build/bench")
+BASELINE = BENCH_DIR / "baseline.json"
+SIZES = (10**3, 10**4, 10**5, 10**6)
+
+# a stage only counts as regressed when it is both relatively and
+# absolutely worse, so millisecond stages do not flap on timer noise
+MIN_SECONDS = 0.05
+MIN_BYTES = 1 << 20
+
+
+def _sizes(text: str):
+    return [int(float(x)) for x in text.split(",") if x.strip()]
+
+
+def _link(name: str, workdir: Path) -> None:
+    src = Path(name).resolve()
+    try:
+        os.symlink(src, workdir / name, target_is_directory=True)
+    except OSError:
+        shutil.copytree(src, workdir / name)
+
+
+def _run(script: str, workdir: Path, *args) -> dict:
+    """Run a pipeline script in workdir; wall/CPU time and max RSS of that process.
+
+    CPU time and RSS come from wait4(), so they are None where it is missing (Windows).
+    """
+    log = workdir / f"{Path(script).stem}.log"
+    t0 = time.perf_counter()
+    usage = None
+    with open(log, "w", encoding="utf-8") as f:
+        proc = subprocess.Popen([sys.executable, str(SCRIPTS / script), *args], cwd=workdir, stdout=f, stderr=f)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            proc.wait()
+    wall = time.perf_counter() - t0
+    if proc.returncode:
+        raise SystemExit(f"{script} failed with exit code {proc.returncode}, see {log}")
+
+    if usage is None:
+        return {"wall_s": round(wall, 6), "cpu_s": None, "max_rss_bytes": None}
+    # kilobytes on Linux, bytes on macOS
+    rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return {
+        "wall_s": round(wall, 6),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime, 6),
+        "max_rss_bytes": rss,
+    }
+
+
+def bench_size(n: int, args) -> dict:
+    workdir = BENCH_DIR / f"n{n}"
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+    _link("templates", workdir)
+    _link("assets", workdir)
+
+    t0 = time.perf_counter()
+    counts = generate(
+        workdir / "data",
+        manuscripts=max(10, n // args.spells_per_manuscript),
+        spells=n,
+        links_per_spell=args.links_per_spell,
+        category_depth=args.category_depth,
+        category_fanout=args.category_fanout,
+        dup_title_rate=args.dup_title_rate,
+        seed=args.seed,
+    )
+    gen_s = time.perf_counter() - t0
+
+    stages = {"build_data": _run("build_data.py", workdir)}
+    site = _run(
+        "build_site.py", workdir,
+        "--validate", "--jobs", str(args.jobs), "--profile", "profile.json", "--profile-top", "0",
+    )
+
+    with open(workdir / "profile.json", encoding="utf-8") as f:
+        profile = json.load(f)
+    for s in profile["stages"]:
+        stages[s["stage"]] = {k: v for k, v in s.items() if k != "stage"}
+    stages["build_site"] = site
+
+    for stat in stages.values():
+        stat["spells_per_s"] = round(n / stat["wall_s"]) if stat["wall_s"] else None
+
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"counts": counts, "generate_s": round(gen_s, 3), "stages": stages}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for size, run in results["sizes"].items():
+        base_run = baseline.get("sizes", {}).get(size)
+        if not base_run:
+            continue
+        for name, stat in run["stages"].items():
+            base = base_run["stages"].get(name)
+            if not base:
+                continue
+            for key, floor in (("wall_s", MIN_SECONDS), ("peak_py_bytes", MIN_BYTES), ("max_rss_bytes", MIN_BYTES)):
+                if stat.get(key) is None or base.get(key) is None:
+                    continue
+                now, before = stat[key], base[key]
+                if now > before * (1 + tolerance) and now - before > floor:
+                    regressions.append(
+                        f"n={size} {name} {key}: {before} → {now} (+{(now / before - 1) * 100 if before else 0:.0f}%)"
+                    )
+    return regressions
+
+
+def _mib(value) -> str:
+    return "-" if value is None else f"{value / 2**20:.1f}"
+
+
+def format_results(results: dict) -> str:
+    lines = []
+    for size, run in results["sizes"].items():
+        counts = ", ".join(f"{v} {k}" for k, v in run["counts"].items())
+        lines.append(f"n={size} ({counts}; generated in {run['generate_s']:.1f}s)")
+        # profile stages report the process peak reached by their end
+        lines.append(f"  {'stage':<34} {'wall s':>9} {'spells/s':>11} {'peak py MiB':>12} {'proc peak MiB':>14}")
+        for name, s in run["stages"].items():
+            lines.append(
+                f"  {name:<34} {s['wall_s']:>9.3f} {s['spells_per_s'] or 0:>11} "
+                f"{_mib(s.get('peak_py_bytes')):>12} {_mib(s.get('max_rss_bytes')):>14}"
+            )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run build_data.py and build_site.py on synthetic corpora of growing size."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=_sizes,
+        default=list(SIZES),
+        metavar="N,N,...",
+        help="Spell counts to benchmark (default: 1e3,1e4,1e5,1e6).",
+    )
+    parser.add_argument("--jobs", type=int, default=1, metavar="N", help="Passed to build_site.py.")
+    parser.add_argument("--spells-per-manuscript", type=int, default=100)
+    parser.add_argument("--links-per-spell", type=float, default=1.5)
+    parser.add_argument("--category-depth", type=int, default=3)
+    parser.add_argument("--category-fanout", type=int, default=6)
+    parser.add_argument("--dup-title-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpora and sites.")
+    parser.add_argument("--out", type=Path, default=BENCH_DIR / "results.json", help="Where to write the results.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="Baseline to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown / memory growth reported as a regression (default 0.25).",
+    )
+    args = parser.parse_args()
+
+    if not Path("templates").is_dir():
+        raise SystemExit("Run from the repository root (templates/ not found).")
+
+    results = {"python": sys.version.split()[0], "jobs": args.jobs, "sizes": {}}
+    for n in args.sizes:
+        print(f"Benchmarking {n} spells ...", flush=True)
+        results["sizes"][str(n)] = bench_size(n, args)
+
+    print(format_results(results))
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    regressions = []
+    if args.baseline.exists():
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("jobs") != args.jobs:
+            print(f"WARNING: baseline was recorded with --jobs {baseline.get('jobs')}")
+        regressions = compare(results, baseline, args.tolerance)
+        for r in regressions:
+            print("REGRESSION:", r)
+        if not regressions:
+            print(f"No regressions against {args.baseline}")
+
+    if args.save_baseline:
+        shutil.copyfile(args.out, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
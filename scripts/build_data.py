@@ -1,34 +1,320 @@
-import csv
-import json
-from pathlib import Path
-
-DATA_DIR = Path("data")
-OUT_DIR = Path("site/data")
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-TABLES = ["manuscripts", "spells", "categories", "spell_categories"]
-
-def detect_delimiter(sample: str) -> str:
-    semicolons = sample.count(";")
-    commas = sample.count(",")
-    return ";" if semicolons >= commas else ","
-
-def csv_to_json(name: str) -> None:
-    csv_path = DATA_DIR / f"{name}.csv"
-    json_path = OUT_DIR / f"{name}.json"
-
-    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
-        sample = f.read(4096)
-        f.seek(0)
-
-        delimiter = detect_delimiter(sample)
-        reader = csv.DictReader(f, delimiter=delimiter)
-        rows = list(reader)
-
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(rows, f, ensure_ascii=False, indent=2)
-
-    print(f"✔ {name}.json created (delimiter='{delimiter}')")
-
-for t in TABLES:
-    csv_to_json(t)
\ No newline at end of file
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+from sitegen.corpora import load_corpora
+
+DATA_DIR = Path("data")
+OUT_DIR = Path("site/data")
+STATE_PATH = Path(".build/ingest.json")
+# <table>.changes.json: build bookkeeping, not part of the published site
+CHANGES_DIR = Path(".build")
+SQLITE_PATH = Path(".build/corpus.sqlite")
+SQLITE_SCHEMA = 1
+
+TABLES = ["manuscripts", "spells", "categories", "spell_categories"]
+
+# row identity used for changesets (link table has no own id)
+ROW_KEYS = {
+    "manuscripts": ("id",),
+    "spells": ("id",),
+    "categories": ("id",),
+    "spell_categories": ("spell_id", "category_id"),
+}
+
+def detect_delimiter(sample: str) -> str:
+    semicolons = sample.count(";")
+    commas = sample.count(",")
+    return ";" if semicolons >= commas else ","
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def sheet_rows(reader: csv.DictReader):
+    """The rows of ``reader``, with blank lines kept as rows of empty cells.
+
+    DictReader skips blank lines, which would shift every later row: row i
+    of a table must stay sheet row i + 2 for the build's findings.
+    """
+    fieldnames = reader.fieldnames or []
+    n = len(fieldnames)
+    for cells in reader.reader:
+        if not cells:
+            yield dict.fromkeys(fieldnames, "")
+            continue
+        row = dict(zip(fieldnames, cells))
+        if len(cells) > n:
+            row[reader.restkey] = cells[n:]
+        else:
+            for key in fieldnames[len(cells):]:
+                row[key] = reader.restval
+        yield row
+
+def row_key(name: str, row: dict) -> str:
+    return ":".join((row.get(k) or "").strip() for k in ROW_KEYS[name])
+
+def row_hash(row: dict) -> str:
+    # DictReader keeps cells beyond the header under None; like the SQLite
+    # store, hash them as _extra (a None key cannot be sorted with str keys)
+    row = {("_extra" if k is None else k): v for k, v in row.items()}
+    data = json.dumps(row, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+def load_state(path: Path = STATE_PATH) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+def save_state(state: dict, path: Path = STATE_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    tmp.replace(path)
+
+def write_changeset(name: str, changes: dict, changes_dir: Path = CHANGES_DIR) -> None:
+    changes_dir.mkdir(parents=True, exist_ok=True)
+    path = changes_dir / f"{name}.changes.json"
+    data = json.dumps(changes, ensure_ascii=False, indent=2)
+    if path.exists() and path.read_text(encoding="utf-8") == data:
+        return
+    path.write_text(data, encoding="utf-8")
+
+def csv_to_json(
+    name: str, prev: dict, force: bool = False, data_dir: Path = DATA_DIR, out_dir: Path = OUT_DIR,
+    changes_dir: Path = CHANGES_DIR,
+) -> dict:
+    csv_path = data_dir / f"{name}.csv"
+    json_path = out_dir / f"{name}.json"
+
+    source_hash = file_hash(csv_path)
+    if not force and prev.get("sha256") == source_hash and json_path.exists():
+        write_changeset(name, {"added": [], "removed": [], "modified": []}, changes_dir)
+        print(f"• {name}.json unchanged")
+        return prev
+
+    prev_rows = prev.get("rows") or {}
+    hashes = {}
+
+    tmp_path = json_path.with_suffix(".json.tmp")
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f, \
+            open(tmp_path, "w", encoding="utf-8") as out:
+        sample = f.read(4096)
+        f.seek(0)
+
+        delimiter = detect_delimiter(sample)
+        reader = csv.DictReader(f, delimiter=delimiter)
+
+        # stream rows out in the same layout json.dump(indent=2) produces
+        n = 0
+        for row in sheet_rows(reader):
+            out.write("[\n  " if n == 0 else ",\n  ")
+            out.write(json.dumps(row, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            n += 1
+
+            key = row_key(name, row)
+            if key:
+                hashes.setdefault(key, []).append(row_hash(row))
+
+        out.write("\n]" if n else "[]")
+
+    tmp_path.replace(json_path)
+
+    # a duplicated key is one entry whose hash covers all of its rows
+    rows_by_key = {
+        key: hs[0] if len(hs) == 1 else hashlib.sha1("".join(hs).encode("ascii")).hexdigest()
+        for key, hs in hashes.items()
+    }
+    added = [k for k in rows_by_key if k not in prev_rows]
+    modified = [k for k, h in rows_by_key.items() if k in prev_rows and prev_rows[k] != h]
+    removed = sorted(k for k in prev_rows if k not in rows_by_key)
+    write_changeset(name, {"added": added, "removed": removed, "modified": modified}, changes_dir)
+
+    print(
+        f"✔ {name}.json created (delimiter='{delimiter}', {n} rows; "
+        f"+{len(added)} -{len(removed)} ~{len(modified)})"
+    )
+    return {"sha256": source_hash, "rows": rows_by_key}
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _sqlite_table(db, name: str, data_dir: Path) -> int:
+    with open(data_dir / f"{name}.csv", "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=detect_delimiter(sample))
+        # duplicate headers collapse like they do in the JSON rows
+        columns = list(dict.fromkeys(reader.fieldnames or []))
+
+        db.execute(
+            f"CREATE TABLE {_ident(name)} (_row INTEGER PRIMARY KEY, "
+            + "".join(f"{_ident(c)} TEXT, " for c in columns)
+            + "_extra TEXT)"
+        )
+        db.executemany(
+            "INSERT INTO columns VALUES (?, ?, ?)",
+            [(name, i, c) for i, c in enumerate(columns)],
+        )
+
+        insert = (
+            f"INSERT INTO {_ident(name)} VALUES (?, "
+            + "?, " * len(columns)
+            + "?)"
+        )
+        # _row is the sheet row number (header = 1)
+        rows = (
+            (
+                n,
+                *(row.get(c) for c in columns),
+                json.dumps(row[None], ensure_ascii=False) if None in row else None,
+            )
+            for n, row in enumerate(sheet_rows(reader), start=2)
+        )
+        db.executemany(insert, rows)
+
+    # foreign-key lookups the page builders and ad-hoc queries use
+    for col in ("id", "manuscript_id", "spell_id", "category_id", "parent_id"):
+        if col in columns:
+            db.execute(f"CREATE INDEX {_ident(f'{name}_{col}')} ON {_ident(name)} ({_ident(col)})")
+    return db.execute(f"SELECT COUNT(*) FROM {_ident(name)}").fetchone()[0]
+
+def _category_closure(db) -> int:
+    db.execute(
+        "CREATE TABLE category_closure (ancestor TEXT NOT NULL, descendant TEXT NOT NULL, "
+        "depth INTEGER NOT NULL, PRIMARY KEY (ancestor, descendant)) WITHOUT ROWID"
+    )
+    columns = {c for (c,) in db.execute("SELECT name FROM columns WHERE table_name = 'categories'")}
+    if not {"id", "name", "parent_id"} <= columns:
+        return 0
+
+    # same rows the site uses: id and name present, last duplicate wins
+    parent_of = {}
+    for cid, pid in db.execute(
+        "SELECT id, parent_id FROM categories WHERE id <> '' AND name <> '' ORDER BY _row"
+    ):
+        parent_of[cid] = (pid or "").strip() or None
+
+    def pairs():
+        for cid in parent_of:
+            seen = {cid}
+            cur, depth = cid, 0
+            while True:
+                yield cur, cid, depth
+                cur = parent_of.get(cur)
+                # dangling parent or cycle: the path ends here
+                if cur not in parent_of or cur in seen:
+                    break
+                seen.add(cur)
+                depth += 1
+
+    db.executemany("INSERT OR IGNORE INTO category_closure VALUES (?, ?, ?)", pairs())
+    return db.execute("SELECT COUNT(*) FROM category_closure").fetchone()[0]
+
+def write_sqlite(path: Path, tables: dict, force: bool = False, data_dir: Path = DATA_DIR) -> None:
+    """Write all sheets into one SQLite database (rebuilt only when a CSV changed)."""
+    digest = hashlib.sha256(
+        json.dumps([SQLITE_SCHEMA] + [tables[t]["sha256"] for t in TABLES]).encode("ascii")
+    ).hexdigest()
+
+    if not force and path.exists():
+        try:
+            with sqlite3.connect(path) as db:
+                row = db.execute("SELECT value FROM meta WHERE key = 'digest'").fetchone()
+        except sqlite3.Error:
+            row = None
+        if row and row[0] == digest:
+            print(f"• {path.name} unchanged")
+            return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    db = sqlite3.connect(tmp)
+    try:
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        db.execute("CREATE TABLE columns (table_name TEXT, position INTEGER, name TEXT, PRIMARY KEY (table_name, position))")
+        counts = {t: _sqlite_table(db, t, data_dir) for t in TABLES}
+        closure = _category_closure(db)
+        db.execute("CREATE INDEX category_closure_descendant ON category_closure (descendant)")
+        db.executemany("INSERT INTO meta VALUES (?, ?)", [("digest", digest), ("schema", str(SQLITE_SCHEMA))])
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmp, path)
+
+    print(f"✔ {path.name} created ({', '.join(f'{n} {t}' for t, n in counts.items())}; {closure} closure rows)")
+
+def convert(data_dir: Path, out_dir: Path, state_path: Path, sqlite: Path = None, force: bool = False) -> None:
+    """Convert one corpus' CSV exports to JSON (and optionally SQLite)."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    state = load_state(state_path)
+    tables = state.get("tables") or {}
+    for t in TABLES:
+        tables[t] = csv_to_json(
+            t, tables.get(t) or {}, force=force, data_dir=data_dir, out_dir=out_dir, changes_dir=state_path.parent
+        )
+
+    state["tables"] = tables
+    save_state(state, state_path)
+
+    if sqlite:
+        write_sqlite(sqlite, tables, force=force, data_dir=data_dir)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert sheet CSV exports to JSON.")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-read every CSV even if its content hash did not change.",
+    )
+    parser.add_argument(
+        "--sqlite",
+        nargs="?",
+        const="",
+        metavar="DB",
+        help="Also write the corpus into one SQLite database "
+        "(default .build/corpus.sqlite, or corpus.sqlite in each corpus' build_dir).",
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        metavar="CORPORA.json",
+        help="Convert every corpus listed in this file (see build_site.py --config).",
+    )
+    args = parser.parse_args()
+
+    if not args.config:
+        sqlite = None if args.sqlite is None else Path(args.sqlite or SQLITE_PATH)
+        convert(DATA_DIR, OUT_DIR, STATE_PATH, sqlite, force=args.force)
+        return
+
+    try:
+        corpora = load_corpora(args.config)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.sqlite and len(corpora) > 1 and "{name}" not in args.sqlite:
+        parser.error("--sqlite DB with several corpora needs a {name} placeholder")
+    for corpus in corpora:
+        print(f"== {corpus.name}: {corpus.data_dir} -> {corpus.json_dir}")
+        sqlite = None
+        if args.sqlite is not None:
+            sqlite = Path(args.sqlite.replace("{name}", corpus.name)) if args.sqlite else corpus.build_dir / "corpus.sqlite"
+        convert(corpus.data_dir, corpus.json_dir, corpus.build_dir / "ingest.json", sqlite, force=args.force)
+
+if __name__ == "__main__":
+    main()
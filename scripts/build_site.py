@@ -1,124 +1,366 @@
-import argparse
-import shutil
-from pathlib import Path
-
-from templating import make_env
-
-from sitegen.data_loader import load_all
-from sitegen.indexes import build_indexes
-from sitegen.services import build_category_graph, make_total_spell_count
-from sitegen.pages import (
-    build_index,
-    build_manuscripts,
-    build_spells,
-    build_spells_index,
-    build_categories,
-    build_categories_index,
-)
-from sitegen.validate import validate_data
-
-SITE = Path("site")
-ASSETS = Path("assets")
-
-
-def clean_site(site_dir: Path) -> None:
-    for sub in ("manuscripts", "spells", "categories"):
-        shutil.rmtree(site_dir / sub, ignore_errors=True)
-
-    try:
-        (site_dir / "index.html").unlink()
-    except FileNotFoundError:
-        pass
-
-
-def copy_assets(site_dir: Path) -> None:
-    site_dir.mkdir(parents=True, exist_ok=True)
-
-    css = ASSETS / "style.css"
-    if not css.exists():
-        raise SystemExit(f"Missing stylesheet: {css}. Put your CSS there.")
-
-    for p in ASSETS.iterdir():
-        if p.is_file():
-            shutil.copy2(p, site_dir / p.name)
-
-
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Build static site from JSON data.")
-    parser.add_argument(
-        "--clean",
-        action="store_true",
-        help="Remove generated HTML before build (recommended to avoid stale pages).",
-    )
-    parser.add_argument(
-        "--validate",
-        action="store_true",
-        help="Validate data and print issues (does not fail build).",
-    )
-    parser.add_argument(
-        "--strict",
-        action="store_true",
-        help="Fail build if validation errors are found (implies --validate).",
-    )
-    args = parser.parse_args()
-
-    if args.clean:
-        clean_site(SITE)
-    
-    copy_assets(SITE)
-
-    manuscripts, spells, categories, spell_categories = load_all()
-
-    if args.validate or args.strict:
-        errors, warnings = validate_data(manuscripts, spells, categories, spell_categories)
-
-        for w in warnings:
-            print("WARNING:", w)
-        for e in errors:
-            print("ERROR:", e)
-
-        if args.strict and errors:
-            raise SystemExit(1)
-
-    idx = build_indexes(manuscripts, spells, spell_categories)
-
-    category_by_id, children_by_parent, category_ancestors = build_category_graph(categories)
-    total_spell_count = make_total_spell_count(children_by_parent, idx["spell_count_by_category"])
-
-    env = make_env()
-    tpl_index = env.get_template("index.html")
-    tpl_spells_index = env.get_template("spells_index.html")
-    tpl_ms = env.get_template("manuscript.html")
-    tpl_spell = env.get_template("spell.html")
-    tpl_cat = env.get_template("category.html")
-    tpl_cats_index = env.get_template("categories_index.html")
-
-    build_index(SITE, tpl_index, manuscripts)
-    build_manuscripts(SITE, tpl_ms, manuscripts, idx["spells_by_ms_id"])
-    build_spells(
-        SITE,
-        tpl_spell,
-        spells,
-        idx["manuscript_by_id"],
-        idx["cats_by_spell_id"],
-        category_by_id,
-        category_ancestors,
-    )
-    build_spells_index(SITE, tpl_spells_index, spells, idx["manuscript_by_id"])
-    build_categories(
-        SITE,
-        tpl_cat,
-        categories,
-        idx["manuscript_by_id"],
-        children_by_parent,
-        category_by_id,
-        category_ancestors,
-        total_spell_count,
-        idx["spell_ids_by_cat_id"],
-        idx["spell_by_id"],
-    )
-    build_categories_index(SITE, tpl_cats_index, children_by_parent, total_spell_count)
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import argparse
+from pathlib import Path
+
+from templating import make_env, set_corpus
+
+from sitegen.corpora import default_corpus, load_corpora
+from sitegen.data_loader import load_tables
+from sitegen.store import CorpusStore
+from sitegen.pages import (
+    build_index,
+    build_search_page,
+    build_spells_index,
+    build_categories_index,
+)
+from sitegen.parallel import WorkerPool, build_context, render_entity_pages, resolve_jobs
+from sitegen.validate import report_findings
+from sitegen.manifest import BuildManifest
+from sitegen.output import ArchiveOutput, SiteWriter, open_output
+from sitegen.assets import publish_assets
+from sitegen.fragments import FragmentCache, fragment_salt
+from sitegen.minify import MINIFIERS
+from sitegen.precompress import precompress, format_size_report
+from sitegen.search import build_search_index, format_search_report
+from sitegen.api import build_api, format_api_report
+from sitegen.facets import build_facets, format_facets_report
+from sitegen.parallels import DEFAULT_THRESHOLD, build_parallels_export, find_parallels, format_parallels_report
+from sitegen.linkcheck import check_site, format_link_report
+from sitegen.profiling import Profiler, format_profile
+
+SITE = Path("site")
+ASSETS = Path("assets")
+BUILD_CACHE = Path(".build")
+
+
+def copy_assets(out: SiteWriter) -> dict:
+    # returns {name: fingerprinted name} for templating's asset()
+    css = ASSETS / "style.css"
+    if not css.exists():
+        raise SystemExit(f"Missing stylesheet: {css}. Put your CSS there.")
+
+    return publish_assets(out, ASSETS)
+
+
+def build_pages(
+    out, env, ctx, manifest=None, jobs: int = 1, env_kwargs=None, profiler=None, pool=None, corpus: str = ""
+) -> None:
+    """Render every HTML page of the site through ``out``."""
+    stage = (profiler or Profiler()).stage
+    idx = ctx["idx"]
+    manuscripts = ctx["rows"][0]
+
+    with stage("build_index"):
+        build_index(out, env.get_template("index.html"), manuscripts, manifest)
+    render_entity_pages(
+        out, env, ctx, manifest,
+        jobs=jobs, env_kwargs=env_kwargs, profiler=profiler, pool=pool, corpus=corpus,
+    )
+    with stage("build_spells_index"):
+        build_spells_index(out, env.get_template("spells_index.html"), idx["spells_sorted"], idx["manuscript_by_id"], manifest)
+    with stage("build_categories_index"):
+        build_categories_index(out, env.get_template("categories_index.html"), ctx["tree"], manifest)
+    with stage("build_search_page"):
+        build_search_page(out, env.get_template("search.html"), manifest)
+
+
+def _per_corpus(value, corpus) -> Path:
+    return Path(str(value).replace("{name}", corpus.name))
+
+
+def prepare_corpus(corpus, args, prof, pool) -> dict:
+    """Load one corpus, publish its assets and register it with ``pool``."""
+    stage = prof.stage
+
+    corpus.site_dir.mkdir(parents=True, exist_ok=True)
+    fragments = FragmentCache(
+        corpus.build_dir / "fragments.json" if args.fragment_cache else None,
+        salt=fragment_salt(corpus.base_path),
+    )
+    archive = _per_corpus(args.output_archive, corpus) if args.output_archive else None
+    backend = None
+    if archive:
+        backend = ArchiveOutput.create(archive, corpus.site_dir, corpus.build_dir / "spool")
+    out = SiteWriter(
+        corpus.site_dir,
+        filters=MINIFIERS if args.minify else None,
+        profile=prof.pages,
+        fragments=fragments,
+        backend=backend,
+    )
+
+    with stage("copy_assets"):
+        assets = copy_assets(out)
+
+    store = None
+    with stage("load_tables"):
+        if args.sqlite is not None:
+            # only what indexes and listings need; page text is queried per page
+            store = CorpusStore(_per_corpus(args.sqlite, corpus) if args.sqlite else corpus.build_dir / "corpus.sqlite")
+            raw = store.load_index_tables()
+        else:
+            raw = load_tables(corpus.json_dir)
+
+    # indexing and validation are one pass, so --validate costs nothing extra
+    ctx = build_context(*raw, profiler=prof)
+    if store is not None:
+        ctx["store"] = store
+
+    if args.validate or args.strict:
+        report_findings(ctx["findings"], strict=args.strict)
+
+    # spell pages list the parallels, so they are found before rendering
+    parallels = None
+    if args.parallels is not None:
+        with stage("find_parallels"):
+            parallels = find_parallels(ctx, corpus.build_dir / "parallels.json", threshold=args.parallels)
+        ctx["parallels"] = parallels["by_spell"]
+
+    env_kwargs = {"precompiled": args.precompiled_templates, "assets": assets, "base_path": corpus.base_path}
+
+    manifest = None
+    if args.incremental:
+        manifest = BuildManifest(corpus.build_dir / "manifest.json", out.backend, options={"minify": args.minify})
+
+    pool.add(corpus.name, out, ctx, manifest, env_kwargs)
+    return {
+        "corpus": corpus,
+        "out": out,
+        "fragments": fragments,
+        "archive": archive,
+        "ctx": ctx,
+        "env_kwargs": env_kwargs,
+        "manifest": manifest,
+        "parallels": parallels,
+    }
+
+
+def build_corpus(job, env, args, prof, pool, announce: bool = False) -> None:
+    """Render and write one prepared corpus into its own output tree."""
+    stage = prof.stage
+    corpus = job["corpus"]
+    out = job["out"]
+    ctx = job["ctx"]
+    manifest = job["manifest"]
+    fragments = job["fragments"]
+    idx = ctx["idx"]
+    manuscripts, spells = ctx["rows"][:2]
+
+    if announce:
+        print(f"== {corpus.name}: {job['archive'] or corpus.site_dir}, base path {corpus.base_path or '/'}")
+    set_corpus(env, corpus.base_path, job["env_kwargs"]["assets"])
+
+    build_pages(
+        out, env, ctx, manifest,
+        jobs=args.jobs, env_kwargs=job["env_kwargs"], profiler=prof, pool=pool, corpus=corpus.name,
+    )
+
+    store = ctx.get("store")
+    with stage("build_search_index"):
+        search_stats = build_search_index(
+            out, manuscripts, store.spells() if store is not None else spells, idx["manuscript_by_id"]
+        )
+    print(format_search_report(search_stats))
+
+    with stage("build_facets"):
+        facet_stats = build_facets(out, ctx)
+    print(format_facets_report(facet_stats))
+
+    if job["parallels"] is not None:
+        with stage("build_parallels_export"):
+            build_parallels_export(out, ctx, job["parallels"])
+        print(format_parallels_report(job["parallels"]["stats"]))
+
+    if args.api:
+        with stage("build_api"):
+            api_index = build_api(out, ctx, corpus.base_path)
+        print(format_api_report(api_index))
+
+    if args.minify:
+        print(format_size_report("Minified (files written this build):", out.sizes, ("raw", "minified")))
+
+    if args.gzip:
+        with stage("precompress"):
+            gz_sizes = precompress(out, corpus.build_dir / "precompress.json", jobs=resolve_jobs(args.jobs))
+        print(format_size_report("Precompressed:", gz_sizes, ("", "gzip")))
+
+    # every output went through `out`, so anything else is an orphan
+    if args.clean or args.incremental or job["archive"]:
+        with stage("prune"):
+            out.prune()
+
+    with stage("write_output"):
+        location = out.finish()
+
+    if manifest is not None:
+        manifest.save()
+        print(f"Incremental build: {manifest.rendered} rendered, {manifest.skipped} skipped")
+
+    if args.check_links:
+        with stage("check_links"):
+            link_issues, link_stats = check_site(
+                open_output(job["archive"] or corpus.site_dir),
+                jobs=resolve_jobs(args.jobs),
+                base_path=corpus.base_path,
+            )
+        report_findings(link_issues, strict=args.strict)
+        print(format_link_report(link_stats))
+
+    if store is not None:
+        store.close()
+    fragments.save(keep_previous=args.incremental)
+    print(f"Fragments: {fragments.summary()}")
+    print(f"Output: {location}: {out.summary()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build static site from JSON data.")
+    parser.add_argument(
+        "--config",
+        type=Path,
+        metavar="CORPORA.json",
+        help="Build every corpus listed in this file (own data, site and cache trees, base path) in one run.",
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        metavar="NAME",
+        help="With --config, only build this corpus (repeatable).",
+    )
+    parser.add_argument(
+        "--clean",
+        action="store_true",
+        help="Remove generated files the build no longer produces (recommended to avoid stale pages).",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Validate data and print issues (does not fail build).",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Fail build if validation errors (or, with --check-links, broken links) are found (implies --validate).",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="After the build, check every internal link, anchor and asset reference in site/ (uses --jobs).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-render only pages whose inputs changed since the last build and remove pages of deleted records.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Render pages in N worker processes (0 = one per CPU core, 1 = serial).",
+    )
+    parser.add_argument(
+        "--precompiled-templates",
+        action="store_true",
+        help="Load templates precompiled into Python modules (compiled on first use).",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="Minify generated HTML and copied CSS/JS.",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Write max-compression .gz siblings of text outputs for servers that serve them.",
+    )
+    parser.add_argument(
+        "--api",
+        action="store_true",
+        help="Also write the static JSON/NDJSON API under site/api/.",
+    )
+    parser.add_argument(
+        "--parallels",
+        nargs="?",
+        const=DEFAULT_THRESHOLD,
+        type=float,
+        metavar="THRESHOLD",
+        help="Find parallel texts across manuscripts (MinHash/LSH over title_en, title_syr and translation; "
+        f"estimated similarity >= THRESHOLD, default {DEFAULT_THRESHOLD}), list them on spell pages "
+        "and export the clusters to parallels/clusters.json.",
+    )
+    parser.add_argument(
+        "--output-archive",
+        type=Path,
+        metavar="SITE.tar",
+        help="Write the site into one deterministic tar instead of site/ (site/data/ is still read from disk); "
+        "with several corpora the path needs a {name} placeholder.",
+    )
+    parser.add_argument(
+        "--sqlite",
+        nargs="?",
+        const="",
+        metavar="DB",
+        help="Read the corpus from the build_data.py --sqlite database instead of site/data/*.json "
+        "(default .build/corpus.sqlite, or corpus.sqlite in each corpus' build_dir); only the columns "
+        "indexes need stay in memory, page text is queried per page.",
+    )
+    parser.add_argument(
+        "--fragment-cache",
+        action="store_true",
+        help="Persist rendered HTML fragments in .build/fragments.json and reuse them in the next build.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=BUILD_CACHE / "profile.json",
+        type=Path,
+        metavar="REPORT.json",
+        help="Record per-stage/per-template timings and memory (JSON report, default .build/profile.json).",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Number of slowest pages listed in the profile.",
+    )
+    args = parser.parse_args()
+
+    if args.config:
+        try:
+            corpora = load_corpora(args.config, args.corpus)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.corpus:
+        parser.error("--corpus needs --config")
+    else:
+        corpora = [default_corpus()]
+    if args.parallels is not None and not 0 < args.parallels <= 1:
+        parser.error("--parallels THRESHOLD must be in (0, 1]")
+    for opt, value in (("--output-archive", args.output_archive), ("--sqlite", args.sqlite)):
+        if value and len(corpora) > 1 and "{name}" not in str(value):
+            parser.error(f"{opt} with several corpora needs a {{name}} placeholder, e.g. dist/{{name}}.tar")
+
+    prof = Profiler(enabled=args.profile is not None, top=args.profile_top)
+
+    # one environment for all corpora: templates are compiled once
+    with prof.stage("make_env"):
+        env = make_env(precompiled=args.precompiled_templates)
+
+    with WorkerPool(args.jobs) as pool:
+        # every corpus is loaded before the pool's workers start
+        prepared = []
+        for corpus in corpora:
+            prof.prefix = f"{corpus.name}: " if args.config else ""
+            prepared.append(prepare_corpus(corpus, args, prof, pool))
+        for job in prepared:
+            prof.prefix = f"{job['corpus'].name}: " if args.config else ""
+            build_corpus(job, env, args, prof, pool, announce=bool(args.config))
+
+    if prof.enabled:
+        prof.prefix = ""
+        print(format_profile(prof.write(args.profile)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+from pathlib import Path
+
+from templating import BASE_PATH, normalize_base_path
+
+from build_site import SITE
+from sitegen.output import open_output
+from sitegen.linkcheck import check_site, format_link_report
+from sitegen.parallel import resolve_jobs
+from sitegen.validate import report_findings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check internal links, anchors and asset references of a built site.")
+    parser.add_argument("site", nargs="?", type=Path, default=SITE, help="Site directory or --output-archive tar (default: site/).")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Parse pages in N worker processes (0 = one per CPU core, 1 = serial).",
+    )
+    parser.add_argument(
+        "--base-path",
+        default=BASE_PATH,
+        help="BASE_PATH the site was built with (default: the BASE_PATH environment variable).",
+    )
+    parser.add_argument("--strict", action="store_true", help="Exit non-zero on broken links or missing anchors.")
+    args = parser.parse_args()
+
+    if not args.site.exists():
+        raise SystemExit(f"Nothing to check: {args.site} does not exist (build first).")
+
+    issues, stats = check_site(open_output(args.site), jobs=resolve_jobs(args.jobs), base_path=normalize_base_path(args.base_path))
+    report_findings(issues, strict=args.strict)
+    print(format_link_report(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import argparse
+from pathlib import Path
+
+from sitegen.output import diff_outputs, open_output
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare two built sites (directories or --output-archive tars) file by file."
+    )
+    parser.add_argument("first", type=Path)
+    parser.add_argument("second", type=Path)
+    args = parser.parse_args()
+
+    for path in (args.first, args.second):
+        if not path.exists():
+            raise SystemExit(f"Nothing to compare: {path} does not exist.")
+
+    diffs = diff_outputs(open_output(args.first), open_output(args.second))
+    for line in diffs:
+        print(line)
+    if diffs:
+        raise SystemExit(f"{len(diffs)} differences")
+    print("Identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import csv
+import random
+from pathlib import Path
+
+from build_data import DATA_DIR
+
+COLUMNS = {
+    "manuscripts": ["id", "title", "siglum", "location", "date", "format", "N of texts", "bibliography"],
+    "spells": ["id", "manuscript_id", "title_en", "title_syr", "translation", "page", "scribe"],
+    "categories": ["id", "name", "parent_id"],
+    "spell_categories": ["spell_id", "category_id"],
+}
+
+WORDS_EN = (
+    "against evil eye binding lilith fever sea demon night child mother serpent "
+    "scorpion wind sorcery tooth head pain sleep fear angel seal king gate "
+    "blood milk house cattle storm fire water stone door"
+).split()
+WORDS_SYR = "ܚܪܫܐ ܟܬܒܐ ܥܝܢܐ ܒܝܫܬܐ ܫܐܕܐ ܡܠܐܟܐ ܚܬܡܐ ܡܠܟܐ ܐܣܝܘܬܐ ܟܐܒܐ ܪܫܐ ܠܠܝܐ".split()
+LOCATIONS = ("Mosul", "Urmia", "Berlin", "London", "Tur Abdin", "Diyarbakır", "Alqosh", "Vatican")
+FORMATS = ("codex", "scroll", "amulet", "booklet")
+SCRIBES = ("John", "Isaac", "Ephrem", "Hormizd", "Yaqub", "")
+
+
+def _text(rng, words, n):
+    return " ".join(rng.choice(words) for _ in range(n))
+
+
+def _vary(rng, title):
+    # the duplicates the real sheet has: case and whitespace drift
+    choice = rng.randrange(3)
+    if choice == 0:
+        return title
+    if choice == 1:
+        return title.swapcase() if rng.random() < 0.5 else title.title()
+    return title.replace(" ", "  ", 1)
+
+
+def _writer(out_dir: Path, name: str):
+    f = open(out_dir / f"{name}.csv", "w", encoding="utf-8", newline="")
+    w = csv.writer(f, delimiter=";")
+    w.writerow(COLUMNS[name])
+    return f, w
+
+
+def generate(
+    out_dir: Path = DATA_DIR,
+    manuscripts: int = 100,
+    spells: int = 1000,
+    links_per_spell: float = 1.5,
+    category_depth: int = 3,
+    category_fanout: int = 6,
+    dup_title_rate: float = 0.1,
+    seed: int = 0,
+) -> dict:
+    """Write the four sheet CSVs for a synthetic corpus into out_dir.
+
+    Rows are streamed, so 10^6 spells need only the category list in memory.
+    Returns the row count per table.
+    """
+    rng = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    counts = {}
+
+    f, w = _writer(out_dir, "manuscripts")
+    with f:
+        for i in range(manuscripts):
+            w.writerow([
+                f"ms{i}",
+                f"{rng.choice(LOCATIONS)} {rng.choice(WORDS_EN).title()} {i}",
+                f"{chr(65 + i % 26)}{i}",
+                rng.choice(LOCATIONS),
+                f"{rng.randint(15, 20)}th c.",
+                rng.choice(FORMATS),
+                str(rng.randint(1, 60)),
+                _text(rng, WORDS_EN, rng.randint(0, 12)),
+            ])
+    counts["manuscripts"] = manuscripts
+
+    # full tree: category_fanout roots, each node with category_fanout children
+    cat_ids = []
+    f, w = _writer(out_dir, "categories")
+    with f:
+        level = [""]
+        for depth in range(category_depth):
+            next_level = []
+            for parent in level:
+                for _ in range(category_fanout):
+                    cid = f"c{len(cat_ids)}"
+                    w.writerow([cid, f"{rng.choice(WORDS_EN).title()} {len(cat_ids)}", parent])
+                    cat_ids.append(cid)
+                    next_level.append(cid)
+            level = next_level
+    counts["categories"] = len(cat_ids)
+
+    titles = []
+    links = 0
+    f, w = _writer(out_dir, "spells")
+    lf, lw = _writer(out_dir, "spell_categories")
+    with f, lf:
+        for i in range(spells):
+            if titles and rng.random() < dup_title_rate:
+                title = _vary(rng, rng.choice(titles))
+            else:
+                title = f"{_text(rng, WORDS_EN, rng.randint(2, 5)).capitalize()} {i}"
+                if len(titles) < 10000:
+                    titles.append(title)
+            w.writerow([
+                f"sp{i}",
+                f"ms{rng.randrange(manuscripts)}" if manuscripts else "",
+                title,
+                _text(rng, WORDS_SYR, rng.randint(1, 4)),
+                _text(rng, WORDS_EN, rng.randint(5, 40)),
+                f"fol. {rng.randint(1, 250)}{rng.choice('rv')}",
+                rng.choice(SCRIBES),
+            ])
+
+            if cat_ids:
+                n = min(int(links_per_spell) + (rng.random() < links_per_spell % 1), len(cat_ids))
+                for cid in rng.sample(cat_ids, n):
+                    lw.writerow([f"sp{i}", cid])
+                links += n
+    counts["spells"] = spells
+    counts["spell_categories"] = links
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus in the sheet CSV layout.")
+    parser.add_argument("--out", type=Path, default=DATA_DIR, help="Output directory (default: data/).")
+    parser.add_argument("--manuscripts", type=int, default=100)
+    parser.add_argument("--spells", type=int, default=1000)
+    parser.add_argument("--links-per-spell", type=float, default=1.5, help="Average categories per spell.")
+    parser.add_argument("--category-depth", type=int, default=3)
+    parser.add_argument("--category-fanout", type=int, default=6)
+    parser.add_argument("--dup-title-rate", type=float, default=0.1, help="Share of spells reusing an earlier title.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(
+        args.out,
+        manuscripts=args.manuscripts,
+        spells=args.spells,
+        links_per_spell=args.links_per_spell,
+        category_depth=args.category_depth,
+        category_fanout=args.category_fanout,
+        dup_title_rate=args.dup_title_rate,
+        seed=args.seed,
+    )
+    print(", ".join(f"{n} {t}" for t, n in counts.items()), f"→ {args.out}")
+
+
+if __name__ == "__main__":
+    main()
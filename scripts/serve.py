@@ -0,0 +1,315 @@
+import argparse
+import re
+import threading
+import time
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from templating import TEMPLATES, make_env, set_assets
+
+from build_site import ASSETS, build_pages, copy_assets
+from sitegen.corpora import default_corpus, load_corpora
+from sitegen.data_loader import load_tables
+from sitegen.fragments import FragmentCache
+from sitegen.manifest import BuildManifest
+from sitegen.records import reuse_records
+from sitegen.output import DirectoryOutput, SiteWriter
+from sitegen.parallel import build_context
+from sitegen.facets import build_facets
+from sitegen.search import build_search_index
+from sitegen.validate import report_findings
+
+LIVERELOAD = "/__livereload"
+# seconds between file system polls; a change is picked up once two polls agree
+POLL = 0.2
+
+_BODY_END = re.compile(rb"</body\s*>", re.IGNORECASE)
+
+
+def _snapshot(root: Path, pattern: str):
+    snap = {}
+    for p in root.glob(pattern):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        if p.is_file():
+            snap[p] = (st.st_mtime_ns, st.st_size)
+    return snap
+
+
+def watched_files(data_dir: Path):
+    return {
+        "templates": _snapshot(TEMPLATES, "**/*"),
+        "assets": _snapshot(ASSETS, "*"),
+        "data": _snapshot(data_dir, "*.json"),
+    }
+
+
+class DevBuild:
+    """Site build that stays warm between rebuilds.
+
+    Tables, indexes and the Jinja environment live in memory; a data change
+    reloads the tables, a template change is picked up by the environment's
+    auto-reload, and the in-memory manifest limits rendering to pages whose
+    inputs or template chain changed.
+
+    Pages go to dev-site/ in the corpus' build_dir, with their own
+    dev-manifest.json, so pruning never touches a production build in site_dir.
+    """
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.site_dir = corpus.build_dir / "dev-site"
+        self.env = make_env(base_path=corpus.base_path)
+        self.manifest = BuildManifest(
+            corpus.build_dir / "dev-manifest.json", DirectoryOutput(self.site_dir), options={"minify": False}
+        )
+        self.ctx = None
+        self.raw = None
+        self.fragments = FragmentCache()
+        self.search_files = set()
+        self.builds = 0
+
+    def load_data(self) -> None:
+        raw = load_tables(self.corpus.json_dir)
+        if self.raw is not None:
+            # unchanged rows keep their objects, and with them their hashes
+            raw = tuple(reuse_records(old, new) for old, new in zip(self.raw, raw))
+        self.raw = raw
+        self.ctx = build_context(*raw)
+        report_findings(self.ctx["findings"])
+
+    def build(self, changed=("templates", "assets", "data"), on_pages=None) -> SiteWriter:
+        """Rebuild after a change; ``on_pages`` runs once the HTML is on disk."""
+        if "data" in changed or self.ctx is None:
+            self.load_data()
+        if self.builds:
+            self.manifest.advance()
+        self.builds += 1
+        if "templates" in changed:
+            # fragments can come from templates too
+            self.fragments = FragmentCache()
+
+        self.site_dir.mkdir(parents=True, exist_ok=True)
+        out = SiteWriter(self.site_dir, fragments=self.fragments)
+        set_assets(self.env, copy_assets(out))
+        build_pages(out, self.env, self.ctx, self.manifest)
+        if on_pages is not None:
+            on_pages()
+
+        # the search index and facets only depend on the data
+        if "data" in changed or not self.search_files:
+            before = set(out.seen)
+            idx = self.ctx["idx"]
+            manuscripts, spells = self.ctx["rows"][:2]
+            build_search_index(out, manuscripts, spells, idx["manuscript_by_id"])
+            build_facets(out, self.ctx)
+            self.search_files = out.seen - before
+        else:
+            for rel in self.search_files:
+                out.keep(rel)
+
+        out.prune()
+        self.manifest.save()
+        return out
+
+
+class LiveReload:
+    def __init__(self):
+        self.version = 0
+        self._cond = threading.Condition()
+
+    def bump(self) -> None:
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, version: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class DevHandler(SimpleHTTPRequestHandler):
+    """Serves a site tree under base_path, injecting the live-reload client into HTML."""
+
+    reload = None
+    base_path = ""
+
+    def end_headers(self):
+        self.send_header("Cache-Control", "no-store")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+    def translate_path(self, path):
+        base = self.base_path
+        path = path.split("?", 1)[0].split("#", 1)[0]
+        if base:
+            if path != base and not path.startswith(base + "/"):
+                # outside the configured base: 404, like the deployed site
+                return str(Path(self.directory) / "__outside_base_path__")
+            path = path[len(base):] or "/"
+        return super().translate_path(path)
+
+    def do_GET(self):
+        if self.base_path and self.path in ("", "/"):
+            self.send_response(HTTPStatus.FOUND)
+            self.send_header("Location", self.base_path + "/")
+            self.end_headers()
+            return
+        if self.path.split("?", 1)[0] == self.base_path + LIVERELOAD:
+            return self._events()
+
+        path = Path(self.translate_path(self.path))
+        if path.is_dir():
+            if not self.path.split("?", 1)[0].endswith("/"):
+                return super().do_GET()  # redirect to the trailing-slash URL
+            path = path / "index.html"
+        if path.suffix != ".html" or not path.is_file():
+            return super().do_GET()
+
+        body = path.read_bytes()
+        script = (
+            f'<script>new EventSource("{self.base_path}{LIVERELOAD}")'
+            f'.onmessage=function(){{location.reload()}}</script>'
+        ).encode("utf-8")
+        matches = list(_BODY_END.finditer(body))
+        at = matches[-1].start() if matches else len(body)
+        body = body[:at] + script + body[at:]
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _events(self):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        version = self.reload.version
+        try:
+            while True:
+                new = self.reload.wait(version, timeout=15)
+                # comment lines keep idle connections open
+                self.wfile.write(b"data: reload\n\n" if new != version else b": ping\n\n")
+                self.wfile.flush()
+                version = new
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def watch(dev: DevBuild, reload: LiveReload) -> None:
+    data_dir = dev.corpus.json_dir
+    last = watched_files(data_dir)
+    while True:
+        time.sleep(POLL)
+        current = watched_files(data_dir)
+        if current == last:
+            continue
+
+        # wait for editors / build_data.py to finish writing
+        while True:
+            time.sleep(POLL)
+            settled = watched_files(data_dir)
+            if settled == current:
+                break
+            current = settled
+
+        changed = [kind for kind in current if current[kind] != last[kind]]
+        last = current
+
+        t0 = time.perf_counter()
+        try:
+            pages_at = []
+            out = dev.build(changed, on_pages=lambda: (pages_at.append(time.perf_counter()), reload.bump()))
+        except Exception as e:
+            # keep serving the last good build; the next save retries
+            print(f"Rebuild failed ({', '.join(changed)}): {type(e).__name__}: {e}")
+            continue
+        print(
+            f"Rebuilt ({', '.join(changed)}): {dev.manifest.rendered} rendered, "
+            f"{dev.manifest.skipped} skipped, {out.written} written; "
+            f"pages in {(pages_at[0] - t0) * 1000:.0f} ms, total {(time.perf_counter() - t0) * 1000:.0f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve site/ locally, optionally rebuilding on changes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Build into .build/dev-site/, then watch templates/, assets/ and site/data/ "
+        "and re-render affected pages with live reload.",
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        metavar="CORPORA.json",
+        help="Take the corpus (data, site and cache trees, base path) from this file (see build_site.py --config).",
+    )
+    parser.add_argument(
+        "--corpus",
+        metavar="NAME",
+        help="With --config, the corpus to serve (needed when the file lists several).",
+    )
+    args = parser.parse_args()
+
+    if args.config:
+        try:
+            corpora = load_corpora(args.config, [args.corpus] if args.corpus else None)
+        except ValueError as e:
+            parser.error(str(e))
+        if len(corpora) > 1:
+            parser.error(f"{args.config} lists several corpora; pick one with --corpus")
+        corpus = corpora[0]
+    elif args.corpus:
+        parser.error("--corpus needs --config")
+    else:
+        corpus = default_corpus()
+
+    reload = LiveReload()
+    site_dir = corpus.site_dir
+    if args.watch:
+        dev = DevBuild(corpus)
+        t0 = time.perf_counter()
+        dev.build()
+        print(
+            f"Built in {time.perf_counter() - t0:.2f}s "
+            f"({dev.manifest.rendered} rendered, {dev.manifest.skipped} skipped)"
+        )
+        site_dir = dev.site_dir
+    elif not site_dir.is_dir():
+        raise SystemExit(f"Nothing to serve: {site_dir}/ does not exist (build first or use --watch).")
+
+    handler = partial(DevHandler, directory=str(site_dir))
+    DevHandler.reload = reload
+    DevHandler.base_path = corpus.base_path
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(
+        f"Serving {site_dir}/ at http://{args.host}:{args.port}{corpus.base_path}/"
+        + (" (watching for changes)" if args.watch else "")
+    )
+
+    try:
+        if args.watch:
+            watch(dev, reload)
+        else:
+            threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
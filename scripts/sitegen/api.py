@@ -0,0 +1,150 @@
+import hashlib
+import json
+
+from templating import BASE_PATH, root_url
+
+API_VERSION = 1
+# items per collection page
+PAGE_SIZE = 500
+
+TABLES = ("manuscripts", "spells", "categories")
+
+
+def _dump(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _ref(c):
+    return {"id": c["id"], "name": c.get("name")}
+
+
+def _unique(ids):
+    return list(dict.fromkeys(ids))
+
+
+def spell_docs(idx, tree, store=None):
+    ms_by_id = idx["manuscript_by_id"]
+    for sp in idx["spell_by_id"].values():
+        if store is not None:
+            sp = store.spell(sp["id"])  # index records lack the text columns
+        ms = ms_by_id.get(sp["manuscript_id"])
+        categories = []
+        for cid in _unique(idx["cats_by_spell_id"].get(sp["id"], ())):
+            c = tree.category_by_id.get(cid)
+            if c is not None:
+                categories.append({**_ref(c), "path": [_ref(a) for a in tree.ancestors(cid)]})
+        doc = {
+            "spell": dict(sp),
+            "manuscript": dict(ms) if ms is not None else None,
+            "categories": categories,
+        }
+        yield sp["id"], sp.get("title_en") or "Untitled", doc
+
+
+def manuscript_docs(idx):
+    for ms in idx["manuscript_by_id"].values():
+        spells = [
+            {"id": sp["id"], "title_en": sp.get("title_en"), "page": sp.get("page")}
+            for sp in idx["spells_by_ms_id"].get(ms["id"], ())
+        ]
+        yield ms["id"], ms.get("title"), {"manuscript": dict(ms), "spells": spells}
+
+
+def category_docs(idx, tree):
+    for cid, c in tree.category_by_id.items():
+        parent = tree.category_by_id.get(tree.parent_of.get(cid))
+        # a spell linked twice is listed once
+        spells = list({
+            sp["id"]: {"id": sp["id"], "title_en": sp.get("title_en")}
+            for sp in idx["spells_by_cat_id"].get(cid, ())
+        }.values())
+        doc = {
+            "category": dict(c),
+            "parent": _ref(parent) if parent is not None else None,
+            "ancestors": [_ref(a) for a in tree.ancestors(cid)[:-1]],
+            "children": [_ref(k) for k in tree.children_by_parent.get(cid, [])],
+            "spell_count": tree.spell_count(cid),
+            "spells": spells,
+        }
+        yield cid, c.get("name"), doc
+
+
+def _write_table(out, table, docs, root):
+    """One pass over ``docs``: per-entity files plus the NDJSON bulk file.
+
+    Only {id, title, hash} per entity is kept for the collection pages.
+    """
+    items = []
+    bulk = hashlib.sha256()
+    with out.stream(f"api/{table}.ndjson") as f:
+        for eid, title, doc in docs:
+            data = _dump(doc)
+            out.write_bytes(f"api/{table}/{eid}.json", data)
+            line = data + b"\n"
+            f.write(line)
+            bulk.update(line)
+            items.append({
+                "id": eid,
+                "title": title,
+                "hash": content_hash(data),
+                "href": root(f"/api/{table}/{eid}.json"),
+            })
+
+    pages = []
+    count = max(1, -(-len(items) // PAGE_SIZE))
+    for n in range(1, count + 1):
+        data = _dump({
+            "page": n,
+            "pages": count,
+            "total": len(items),
+            "items": items[(n - 1) * PAGE_SIZE:n * PAGE_SIZE],
+            "next": root(f"/api/{table}/pages/{n + 1}.json") if n < count else None,
+        })
+        out.write_bytes(f"api/{table}/pages/{n}.json", data)
+        pages.append(content_hash(data))
+
+    return {
+        "count": len(items),
+        "pages": pages,
+        "page_size": PAGE_SIZE,
+        "ndjson": root(f"/api/{table}.ndjson"),
+        "ndjson_hash": bulk.hexdigest()[:16],
+    }
+
+
+def build_api(out, ctx, base_path: str = BASE_PATH):
+    """Write the static JSON API under api/.
+
+    - api/<table>/<id>.json: one denormalized document per entity
+    - api/<table>/pages/<n>.json: paginated {id, title, hash, href} listings
+    - api/<table>.ndjson: every document of the table, one per line
+    - api/index.json: counts plus the hash of every page and bulk file
+
+    Hashes are the first 16 hex digits of the SHA-256 of the file bytes, so
+    a client only refetches the documents whose hash changed. Documents are
+    encoded and written one at a time. Returns the index.
+    """
+    idx = ctx["idx"]
+    tree = ctx["tree"]
+    root = root_url(base_path)
+    docs = {
+        "manuscripts": manuscript_docs(idx),
+        "spells": spell_docs(idx, tree, ctx.get("store")),
+        "categories": category_docs(idx, tree),
+    }
+
+    index = {"version": API_VERSION, "tables": {}}
+    for table in TABLES:
+        index["tables"][table] = _write_table(out, table, docs[table], root)
+    out.write_bytes("api/index.json", _dump(index))
+    return index
+
+
+def format_api_report(index) -> str:
+    counts = ", ".join(f"{meta['count']} {table}" for table, meta in index["tables"].items())
+    pages = sum(len(meta["pages"]) for meta in index["tables"].values())
+    return f"API: {counts}; {pages} collection pages"
@@ -0,0 +1,33 @@
+import hashlib
+import json
+from pathlib import Path
+
+# maps logical asset names to the fingerprinted files of this build
+ASSET_MANIFEST = "asset-manifest.json"
+HASH_LEN = 10
+
+
+def fingerprinted(name: str, data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LEN]
+    p = Path(name)
+    return f"{p.stem}.{digest}{p.suffix}"
+
+
+def publish_assets(out, assets_dir: Path) -> dict:
+    """Write every file in assets_dir as <stem>.<hash><suffix>.
+
+    The hash is taken over the bytes actually written (after minification),
+    so a file's URL only changes when its content does and browsers can
+    keep it cached indefinitely. Returns {name: fingerprinted name}, also
+    written to site/asset-manifest.json.
+    """
+    mapping = {}
+    for p in sorted(assets_dir.iterdir()):
+        if not p.is_file():
+            continue
+        data = out.encode(p.name, p.read_bytes())
+        mapping[p.name] = fingerprinted(p.name, data)
+        out.write_bytes(mapping[p.name], data)
+
+    out.write(ASSET_MANIFEST, json.dumps(mapping, indent=2, sort_keys=True) + "\n")
+    return mapping
@@ -0,0 +1,78 @@
+import json
+import re
+from pathlib import Path
+from typing import NamedTuple
+
+from templating import BASE_PATH, normalize_base_path
+
+SHEET_NAMES = ("manuscripts", "spells", "categories", "spell_categories")
+
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+
+class Corpus(NamedTuple):
+    name: str
+    spreadsheet_id: str
+    sheet_names: tuple
+    data_dir: Path  # sheet CSV exports (fetch_from_gsheets.py)
+    site_dir: Path  # output tree; build_data.py writes the JSON tables to site_dir/data
+    build_dir: Path  # manifests and caches of this corpus
+    base_path: str  # normalized, see templating.normalize_base_path
+
+    @property
+    def json_dir(self) -> Path:
+        return self.site_dir / "data"
+
+
+def default_corpus() -> Corpus:
+    # the single-corpus layout used without a config file
+    return Corpus("", "", SHEET_NAMES, Path("data"), Path("site"), Path(".build"), BASE_PATH)
+
+
+def load_corpora(path: Path, names=None):
+    """Corpora listed in a JSON config file, in file order.
+
+    {"corpora": [{"name": "mc", "spreadsheet_id": "...", "base_path": "mc"}, ...]}
+
+    ``data_dir``, ``site_dir`` and ``build_dir`` default to data/<name>,
+    site/<name> and .build/<name>, so each corpus gets its own trees;
+    ``sheet_names`` defaults to the four standard sheets. ``names`` limits
+    the result to those corpora. Raises ValueError on a malformed config.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{path}: {e}") from e
+
+    entries = data.get("corpora") if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f'{path}: expected {{"corpora": [...]}} with at least one corpus')
+
+    corpora = []
+    for i, entry in enumerate(entries):
+        name = entry.get("name") if isinstance(entry, dict) else None
+        if not isinstance(name, str) or not _NAME.match(name):
+            raise ValueError(f"{path}: corpus #{i + 1} needs a name of letters, digits, '.', '_' or '-'")
+        if any(c.name == name for c in corpora):
+            raise ValueError(f"{path}: duplicate corpus {name!r}")
+        corpora.append(Corpus(
+            name,
+            entry.get("spreadsheet_id") or "",
+            tuple(entry.get("sheet_names") or SHEET_NAMES),
+            Path(entry.get("data_dir") or f"data/{name}"),
+            Path(entry.get("site_dir") or f"site/{name}"),
+            Path(entry.get("build_dir") or f".build/{name}"),
+            normalize_base_path(entry.get("base_path")),
+        ))
+
+    trees = [d for c in corpora for d in (c.site_dir.resolve(), c.build_dir.resolve())]
+    if len(set(trees)) != len(trees):
+        raise ValueError(f"{path}: corpora must not share site_dir or build_dir")
+
+    if names:
+        unknown = sorted(set(names) - {c.name for c in corpora})
+        if unknown:
+            raise ValueError(f"{path}: unknown corpus {', '.join(unknown)}")
+        corpora = [c for c in corpora if c.name in names]
+    return corpora
@@ -0,0 +1,164 @@
+import base64
+import json
+
+from sitegen.pages import page_label, title_letter
+from sitegen.sortkeys import spell_title
+
+FACETS_VERSION = 1
+# spell documents per chunk (facets/d/<n>.json)
+DOC_CHUNK = 500
+
+FAMILIES = ("manuscript", "category", "location", "scribe", "letter")
+
+
+def _dump(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def to_bitset(ordinals, n: int) -> int:
+    # bit i is spell ordinal i; set operations on ints run at C speed
+    bits = bytearray((n + 7) // 8)
+    for o in ordinals:
+        bits[o >> 3] |= 1 << (o & 7)
+    return int.from_bytes(bits, "little")
+
+
+def encode_bitmap(bitset: int, n: int) -> str:
+    """A bitset as base64, in the smaller of two encodings.
+
+    "b" + the plain bitset (bit i is bit i % 8 of byte i // 8) for dense sets,
+    "d" + LEB128 varints of the gaps between set bits for sparse ones, so a
+    bitmap costs about min(n / 8, count * log(n / count) / 7) bytes.
+    """
+    size = (n + 7) // 8
+    if bitset.bit_count() < size:
+        gaps = bytearray()
+        digits = bin(bitset)[:1:-1]  # least significant bit first
+        prev = -1
+        o = digits.find("1")
+        while o >= 0:
+            gap = o - prev - 1
+            prev = o
+            while gap >= 0x80:
+                gaps.append(gap & 0x7F | 0x80)
+                gap >>= 7
+            gaps.append(gap)
+            o = digits.find("1", o + 1)
+        if len(gaps) < size:
+            return "d" + base64.b64encode(bytes(gaps)).decode("ascii")
+
+    return "b" + base64.b64encode(bitset.to_bytes(size, "little")).decode("ascii")
+
+
+def spell_ordinals(idx):
+    """Distinct spells in spells-index order: [(row, SpellKey, spell), ...].
+
+    ``row`` numbers the title rows of the spells index.
+    """
+    spell_by_id = idx["spell_by_id"]
+    ordered = []
+    row = -1
+    last_title = None
+    for key, sp in idx["spells_sorted"]:
+        if spell_by_id[key.id] is not sp:
+            continue  # shadowed duplicate id
+        if key.title != last_title:
+            row += 1
+            last_title = key.title
+        ordered.append((row, key, sp))
+    return ordered
+
+
+def _category_bitsets(tree, direct):
+    # subtree unions bottom-up over the depth-first order (children have a
+    # later entry time, so they are done before their parent); int bitsets
+    # make each union one C-level OR
+    bits = {}
+    for cid in reversed(tree.order):
+        b = direct.get(cid, 0)
+        for child in tree.children_by_parent.get(cid, ()):
+            ch = child["id"]
+            if ch != cid and tree.is_ancestor(cid, ch):
+                b |= bits.get(ch, 0)
+        bits[cid] = b
+    return bits
+
+
+def build_facets(out, ctx):
+    """Write facets/meta.json, facets/<family>.json and facets/d/<n>.json.
+
+    Spells are numbered in spells-index order; each facet value (manuscript,
+    category subtree, location, scribe, initial letter) becomes a bitmap over
+    those ordinals, which facets.js intersects in the browser. meta.json lists
+    the values with labels and counts, the bitmaps of a family are only
+    fetched once it is filtered on, and the documents of the matching spells
+    come from the chunks. Returns size statistics for the build log.
+    """
+    idx = ctx["idx"]
+    tree = ctx["tree"]
+    ms_by_id = idx["manuscript_by_id"]
+    ordered = spell_ordinals(idx)
+    n = len(ordered)
+
+    members = {family: {} for family in FAMILIES}
+    direct = {}  # category -> ordinals tagged with it
+    docs = []
+    ms_fields = {
+        mid: (ms.get("siglum") or "", (ms.get("location") or "").strip())
+        for mid, ms in ms_by_id.items()
+    }
+    for o, (row, key, sp) in enumerate(ordered):
+        mid = sp["manuscript_id"]
+        siglum, location = ms_fields.get(mid, ("", ""))
+        title = spell_title(sp)
+        docs.append([row, title, key.id, mid, siglum, page_label(sp.get("page"))])
+
+        if mid in ms_fields:
+            members["manuscript"].setdefault(mid, []).append(o)
+        if location:
+            members["location"].setdefault(location, []).append(o)
+        scribe = (sp.get("scribe") or "").strip()
+        if scribe:
+            members["scribe"].setdefault(scribe, []).append(o)
+        members["letter"].setdefault(title_letter(title), []).append(o)
+        for cid in idx["cats_by_spell_id"].get(key.id, ()):
+            direct.setdefault(cid, []).append(o)
+
+    bitsets = {family: {v: to_bitset(ords, n) for v, ords in members[family].items()} for family in FAMILIES}
+    direct = {cid: to_bitset(ords, n) for cid, ords in direct.items()}
+    bitsets["category"] = {cid: b for cid, b in _category_bitsets(tree, direct).items() if b}
+
+    # labels, in the order the filter lists show them
+    values = {
+        "manuscript": [
+            (mid, ms.get("siglum") or ms.get("title") or mid)
+            for mid, ms in ms_by_id.items() if mid in bitsets["manuscript"]
+        ],
+        "category": [
+            (cid, "— " * tree.depth[cid] + tree.category_by_id[cid]["name"])
+            for cid in tree.order if cid in bitsets["category"]
+        ],
+        "location": [(v, v) for v in sorted(members["location"], key=str.lower)],
+        "scribe": [(v, v) for v in sorted(members["scribe"], key=str.lower)],
+        "letter": [(v, v) for v in sorted(members["letter"], key=lambda v: (v == "OTHER", v))],
+    }
+
+    sizes = {}
+    meta = {"version": FACETS_VERSION, "spells": n, "doc_chunk": DOC_CHUNK, "facets": {}}
+    for family in FAMILIES:
+        bitmaps = {v: encode_bitmap(bitsets[family][v], n) for v, _ in values[family]}
+        data = _dump(bitmaps)
+        out.write(f"facets/{family}.json", data)
+        sizes[family] = len(data.encode("utf-8"))
+        meta["facets"][family] = [[v, label, bitsets[family][v].bit_count()] for v, label in values[family]]
+
+    for c, start in enumerate(range(0, n, DOC_CHUNK)):
+        out.write(f"facets/d/{c}.json", _dump(docs[start:start + DOC_CHUNK]))
+
+    out.write("facets/meta.json", _dump(meta))
+    return {"spells": n, "values": sum(len(v) for v in values.values()), "bitmap_bytes": sizes}
+
+
+def format_facets_report(stats) -> str:
+    per_family = ", ".join(f"{family} {size / 1024:.1f}" for family, size in stats["bitmap_bytes"].items())
+    return f"Facets: {stats['values']} values over {stats['spells']} spells; bitmaps (KiB): {per_family}"
@@ -0,0 +1,119 @@
+import hashlib
+import json
+from collections import OrderedDict
+from pathlib import Path
+
+from templating import BASE_PATH, templates_digest
+
+# bump when the Python that renders fragments changes its output
+FRAGMENT_VERSION = 1
+# in-memory LRU entries per process
+CAPACITY = 20000
+
+
+def fragment_salt(base_path: str = BASE_PATH) -> str:
+    # disk entries are only valid for the same fragment code, base path and templates
+    data = json.dumps([FRAGMENT_VERSION, base_path, templates_digest()])
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class FragmentCache:
+    """Rendered HTML snippets keyed by their inputs.
+
+    ``get(kind, inputs, render)`` returns the snippet for ``inputs`` (a
+    hashable tuple), calling ``render()`` only on a miss. The first tier is
+    an in-memory LRU; with ``path`` set, misses fall through to the
+    snippets persisted by the previous build, keyed by a content hash of
+    ``inputs``. Only snippets used by this build are written back.
+
+    Like ``PageStats`` it lives on the SiteWriter: forks share the
+    process-local tiers and hand their new entries and counters back via
+    ``merge``.
+    """
+
+    def __init__(self, path: Path = None, capacity: int = CAPACITY, salt: str = ""):
+        self.path = path
+        self.capacity = capacity
+        self.salt = salt
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.used = {}  # disk key -> html, persisted by save()
+        self._tiers = {"lru": OrderedDict(), "disk": None}
+
+    def __getstate__(self):
+        # the receiving process starts with empty tiers (and loads the disk one lazily)
+        state = self.__dict__.copy()
+        state["_tiers"] = {"lru": OrderedDict(), "disk": None}
+        return state
+
+    def fork(self):
+        other = FragmentCache(self.path, self.capacity, self.salt)
+        other._tiers = self._tiers
+        return other
+
+    def merge(self, other) -> None:
+        self.hits += other.hits
+        self.disk_hits += other.disk_hits
+        self.misses += other.misses
+        self.used.update(other.used)
+
+    def _disk(self) -> dict:
+        disk = self._tiers["disk"]
+        if disk is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                data = None
+            ok = isinstance(data, dict) and data.get("salt") == self.salt
+            disk = self._tiers["disk"] = (data.get("entries") or {}) if ok else {}
+        return disk
+
+    def get(self, kind: str, inputs, render) -> str:
+        lru = self._tiers["lru"]
+        key = (kind, inputs)
+        html = lru.get(key)
+        if html is not None:
+            lru.move_to_end(key)
+            self.hits += 1
+            return html
+
+        disk_key = None
+        if self.path is not None:
+            data = json.dumps(inputs, ensure_ascii=False, separators=(",", ":"))
+            disk_key = kind + ":" + hashlib.sha1(data.encode("utf-8")).hexdigest()
+            html = self._disk().get(disk_key)
+
+        if html is None:
+            html = render()
+            self.misses += 1
+        else:
+            self.disk_hits += 1
+
+        if disk_key is not None:
+            self.used[disk_key] = html
+        lru[key] = html
+        if len(lru) > self.capacity:
+            lru.popitem(last=False)
+        return html
+
+    def save(self, keep_previous: bool = False) -> None:
+        # a full build uses every live fragment, so only those are kept;
+        # incremental builds skip pages and must carry the rest over
+        if self.path is None:
+            return
+        entries = {**self._disk(), **self.used} if keep_previous else self.used
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"salt": self.salt, "entries": entries}, ensure_ascii=False, sort_keys=True))
+        tmp.replace(self.path)
+
+    def summary(self) -> str:
+        total = self.hits + self.disk_hits + self.misses
+        rate = (self.hits + self.disk_hits) / total * 100 if total else 0.0
+        return (
+            f"{self.hits} memory hits, {self.disk_hits} disk hits, "
+            f"{self.misses} misses ({rate:.1f}% reused)"
+        )
@@ -1,33 +1,162 @@
 from collections import defaultdict
+from collections.abc import Mapping
+from typing import NamedTuple, Optional
 
-def build_indexes(manuscripts, spells, spell_categories):
+from sitegen.services import CategoryTree
+from sitegen.sortkeys import name_key, spell_keys
+
+# data rows start on sheet row 2 (row 1 is the header)
+FIRST_ROW = 2
+
+
+class Finding(NamedTuple):
+    level: str  # "error" or "warning"
+    table: str
+    row: Optional[int]  # sheet row number
+    message: str
+
+    def __str__(self):
+        where = f"{self.table}.csv row {self.row}" if self.row else f"{self.table}.csv"
+        return f"{where}: {self.message}"
+
+
+def index_tables(manuscripts, spells, categories, spell_categories):
+    """Single pass over the loaded rows.
+
+    Drops unusable rows, builds the lookup indexes and the category tree,
+    and collects validation findings with the sheet row they come from.
+    Returns {"tables": (manuscripts, spells, categories, spell_categories),
+    "idx": ..., "tree": CategoryTree, "findings": [Finding, ...]}.
+    """
+    findings = []
+
+    def warn(table, i, msg):
+        findings.append(Finding("warning", table, i + FIRST_ROW, msg))
+
+    def error(table, i, msg):
+        findings.append(Finding("error", table, i + FIRST_ROW, msg))
+
+    def usable(table, i, row, required):
+        if not isinstance(row, Mapping):
+            warn(table, i, "row is not an object, skipped")
+            return False
+        if not any(row.values()):
+            return False  # blank sheet row
+        missing = [k for k in required if not row.get(k)]
+        if missing:
+            warn(table, i, f"row without {' / '.join(missing)}, skipped")
+            return False
+        return True
+
+    # --- manuscripts ---
+    kept = []
+    ms_row = {}
+    for i, ms in enumerate(manuscripts):
+        if not usable("manuscripts", i, ms, ("id", "title")):
+            continue
+        mid = ms["id"]
+        if mid in ms_row:
+            warn("manuscripts", i, f"Duplicate manuscript id {mid} (first on row {ms_row[mid] + FIRST_ROW})")
+        else:
+            ms_row[mid] = i
+        kept.append(ms)
+    manuscripts = kept
+
+    # --- UX: sort manuscripts (stable navigation) ---
+    manuscripts.sort(key=lambda m: name_key(m, "title"))
     manuscript_by_id = {ms["id"]: ms for ms in manuscripts}
 
-    spell_by_id = {sp["id"]: sp for sp in spells if sp.get("id")}
+    # --- spells ---
+    kept = []
+    spell_by_id = {}
+    sp_row = {}
+    for i, sp in enumerate(spells):
+        if not usable("spells", i, sp, ("id", "manuscript_id")):
+            continue
+        sid = sp["id"]
+        mid = sp["manuscript_id"]
+        if sid in sp_row:
+            warn("spells", i, f"Duplicate spell id {sid} (first on row {sp_row[sid] + FIRST_ROW})")
+        else:
+            sp_row[sid] = i
+        if mid not in manuscript_by_id:
+            error("spells", i, f"Spell {sid} references missing manuscript_id={mid}")
+        kept.append(sp)
+        spell_by_id[sid] = sp
+    spells = kept
+
+    # sort keys are computed once per spell; every ordered view below reuses them
+    keyed = spell_keys(spells, manuscript_by_id)
+    spells_sorted = sorted(keyed, key=lambda ks: ks[0])
 
+    # manuscript contents in folio order
     spells_by_ms_id = defaultdict(list)
-    for sp in spells:
-        mid = sp.get("manuscript_id")
-        if mid:
-            spells_by_ms_id[mid].append(sp)
+    for k, sp in sorted(keyed, key=lambda ks: (ks[0].page, ks[0].id)):
+        spells_by_ms_id[sp["manuscript_id"]].append(sp)
+    del keyed
 
+    # --- categories ---
+    kept = []
+    cat_row = {}
+    for i, c in enumerate(categories):
+        if not usable("categories", i, c, ("id", "name")):
+            continue
+        cid = c["id"]
+        if cid in cat_row:
+            warn("categories", i, f"Duplicate category id {cid} (first on row {cat_row[cid] + FIRST_ROW})")
+        else:
+            cat_row[cid] = i
+        kept.append(c)
+    categories = kept
+
+    # --- spell_categories ---
+    kept = []
     cats_by_spell_id = defaultdict(list)
     spell_ids_by_cat_id = defaultdict(list)
-    for sc in spell_categories:
-        sid = sc.get("spell_id")
-        cid = sc.get("category_id")
-        if sid and cid:
-            cats_by_spell_id[sid].append(cid)
-            spell_ids_by_cat_id[cid].append(sid)
+    for i, sc in enumerate(spell_categories):
+        if not usable("spell_categories", i, sc, ("spell_id", "category_id")):
+            continue
+        sid = sc["spell_id"]
+        cid = sc["category_id"]
+        if sid not in sp_row:
+            error("spell_categories", i, f"Link references missing spell_id={sid}")
+        if cid not in cat_row:
+            error("spell_categories", i, f"Link references missing category_id={cid}")
+        kept.append(sc)
+        cats_by_spell_id[sid].append(cid)
+        spell_ids_by_cat_id[cid].append(sid)
+    spell_categories = kept
+
+    # category contents in spells-index order: one pass over the sorted
+    # spells instead of a sort per category
+    spells_by_cat_id = defaultdict(list)
+    for k, sp in spells_sorted:
+        if spell_by_id[k.id] is sp:
+            for cid in cats_by_spell_id.get(k.id, ()):
+                spells_by_cat_id[cid].append(sp)
+
+    # --- category graph ---
+    tree = CategoryTree(categories, spell_ids_by_cat_id)
+
+    for cid, pid in tree.parent_of.items():
+        if pid and pid not in cat_row:
+            warn("categories", cat_row[cid], f"Category {cid} has parent_id={pid} which does not exist")
 
-    # count spells per category (dedupe защитит от случайных дублей связей)
-    spell_count_by_category = {cid: len(set(sids)) for cid, sids in spell_ids_by_cat_id.items()}
+    for cycle in tree.cycles:
+        error("categories", cat_row[cycle[0]], "Category cycle detected: " + " -> ".join(cycle))
 
     return {
-        "manuscript_by_id": manuscript_by_id,
-        "spell_by_id": spell_by_id,
-        "spells_by_ms_id": spells_by_ms_id,
-        "cats_by_spell_id": cats_by_spell_id,
-        "spell_ids_by_cat_id": spell_ids_by_cat_id,
-        "spell_count_by_category": spell_count_by_category,
-    }
\ No newline at end of file
+        "tables": (manuscripts, spells, categories, spell_categories),
+        "idx": {
+            "manuscript_by_id": manuscript_by_id,
+            "spell_by_id": spell_by_id,
+            "spells_by_ms_id": spells_by_ms_id,
+            "cats_by_spell_id": cats_by_spell_id,
+            "spell_ids_by_cat_id": spell_ids_by_cat_id,
+            # (SpellKey, spell) by title, siglum, folio, id
+            "spells_sorted": spells_sorted,
+            "spells_by_cat_id": spells_by_cat_id,
+        },
+        "tree": tree,
+        "findings": findings,
+    }
@@ -0,0 +1,204 @@
+import html
+import posixpath
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+from urllib.parse import unquote
+
+from templating import BASE_PATH
+
+# pages per pool task
+CHUNK = 500
+
+# script/style bodies and comments can contain anything that looks like markup
+_SKIP = re.compile(rb"<(?:!--.*?-->|(script\b[^>]*>).*?</script\s*>|(style\b[^>]*>).*?</style\s*>)", re.S | re.I)
+# only tags that carry one of the attributes below
+_TAG = re.compile(rb"<[a-zA-Z][^>]*?(?<![\w-])(?:href|src|id|name)\s*=[^>]*>", re.I)
+# not data-src / data-href
+_ATTR = re.compile(
+    rb"""(?<![\w-])(href|src|id|name)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""",
+    re.I,
+)
+_SCHEME = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+class LinkIssue(NamedTuple):
+    level: str  # "error" or "warning"
+    page: str  # site-relative path of the page the issue was found on
+    message: str
+
+    def __str__(self):
+        return f"{self.page}: {self.message}"
+
+
+def parse_page(data: bytes):
+    """(links, anchors) of one HTML page: href/src values and id/name values."""
+    data = _SKIP.sub(lambda m: b"<" + (m.group(1) or m.group(2) or b">"), data)
+    links = []
+    anchors = set()
+    for tag in _TAG.findall(data):
+        for m in _ATTR.finditer(tag):
+            raw = m.group(2) if m.group(2) is not None else m.group(3) if m.group(3) is not None else m.group(4)
+            value = html.unescape(raw.decode("utf-8", "replace")).strip()
+            if m.group(1).lower() in (b"href", b"src"):
+                links.append(value)
+            else:
+                anchors.add(value)
+    return links, anchors
+
+
+def resolve(page: str, url: str, base_path: str = BASE_PATH):
+    """Site-relative target of ``url`` found on ``page``.
+
+    Returns (target, fragment, error); target is None for external and
+    placeholder ("#") links, and "" for a fragment on the same page.
+    """
+    if not url or url == "#" or url.startswith("//") or _SCHEME.match(url):
+        return None, None, None
+
+    url, _, fragment = url.partition("#")
+    url = url.split("?", 1)[0]
+    if not url:
+        return "", unquote(fragment) or None, None
+
+    path = unquote(url)
+    if path.startswith("/"):
+        if base_path and path != base_path and not path.startswith(base_path + "/"):
+            return None, None, f"link outside BASE_PATH {base_path}: {url}"
+        path = path[len(base_path):].lstrip("/")
+        directory = path.endswith("/") or not path
+    else:
+        directory = path.endswith("/")
+        path = posixpath.join(posixpath.dirname(page), path)
+
+    target = posixpath.normpath(path) if path else "."
+    if target == ".." or target.startswith("../"):
+        return None, None, f"link leaves the site: {url}"
+    if target == ".":
+        target = ""
+    if directory:
+        target = posixpath.join(target, "index.html")
+    return target, unquote(fragment) or None, None
+
+
+# --- worker side ---
+_output = None
+_files = frozenset()
+
+
+def _init_worker(output, files):
+    global _output, _files
+    _output = output
+    _files = files
+
+
+def _check_chunk(pages, base_path):
+    """Check the links of ``pages``; anchors are looked up later, across chunks."""
+    issues = []
+    linked = set()  # html pages linked from another page
+    wanted = []  # (page, target, fragment, url) to check against target's anchors
+    anchors = {}
+    n_links = 0
+    resolved = {}  # (page directory, url) -> resolve() result; most links repeat
+
+    for page in pages:
+        links, ids = parse_page(_output.read(page))
+        if ids:
+            anchors[page] = ids
+        page_dir = posixpath.dirname(page)
+        for url in dict.fromkeys(links):
+            n_links += 1
+            key = (page_dir, url)
+            r = resolved.get(key)
+            if r is None:
+                r = resolved[key] = resolve(page, url, base_path)
+            target, fragment, error = r
+            if error:
+                issues.append(LinkIssue("error", page, error))
+                continue
+            if target is None:
+                continue
+            if target == "":
+                target = page
+            elif target not in _files:
+                if target + "/index.html" in _files:
+                    target += "/index.html"
+                else:
+                    issues.append(LinkIssue("error", page, f"broken link: {url}"))
+                    continue
+
+            if target != page and target.endswith(".html"):
+                linked.add(target)
+            if fragment:
+                wanted.append((page, target, fragment, url))
+
+    return issues, linked, wanted, anchors, n_links
+
+
+def check_site(output, jobs: int = 1, base_path: str = BASE_PATH):
+    """Verify every internal link and asset reference of the generated site.
+
+    ``output`` is a sitegen.output backend (site directory or archive).
+
+    HTML pages are parsed in ``jobs`` processes; each href/src is resolved
+    like a browser would (BASE_PATH prefix, relative paths, directory
+    index.html) against the files actually present. Reports broken links,
+    links outside BASE_PATH, fragments without a matching id/name on the
+    target page, and pages no other page links to (orphans, as warnings).
+    Returns (issues, stats).
+    """
+    files = frozenset(output.files())
+    pages = sorted(f for f in files if f.endswith(".html"))
+    chunks = [pages[i:i + CHUNK] for i in range(0, len(pages), CHUNK)]
+
+    results = None
+    if jobs > 1 and len(chunks) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(output, files)) as pool:
+                futures = [pool.submit(_check_chunk, chunk, base_path) for chunk in chunks]
+                results = [fut.result() for fut in futures]
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"WARNING: parallel link check unavailable ({e}), falling back to serial")
+
+    if results is None:
+        _init_worker(output, files)
+        results = [_check_chunk(chunk, base_path) for chunk in chunks]
+
+    issues = []
+    linked = set()
+    anchors = {}
+    wanted = []
+    n_links = 0
+    for chunk_issues, chunk_linked, chunk_wanted, chunk_anchors, chunk_links in results:
+        issues += chunk_issues
+        linked |= chunk_linked
+        wanted += chunk_wanted
+        anchors.update(chunk_anchors)
+        n_links += chunk_links
+
+    missing_anchors = 0
+    for page, target, fragment, url in wanted:
+        if target.endswith(".html") and fragment not in anchors.get(target, ()):
+            issues.append(LinkIssue("error", page, f"missing anchor: {url}"))
+            missing_anchors += 1
+
+    orphans = [p for p in pages if p not in linked and p != "index.html"]
+    issues += [LinkIssue("warning", p, "orphan page (no other page links to it)") for p in orphans]
+
+    stats = {
+        "pages": len(pages),
+        "links": n_links,
+        "broken": sum(1 for i in issues if i.level == "error") - missing_anchors,
+        "missing_anchors": missing_anchors,
+        "orphans": len(orphans),
+    }
+    return issues, stats
+
+
+def format_link_report(stats) -> str:
+    return (
+        f"Links: {stats['pages']} pages, {stats['links']} links checked; "
+        f"{stats['broken']} broken, {stats['missing_anchors']} missing anchors, "
+        f"{stats['orphans']} orphan pages"
+    )
@@ -0,0 +1,131 @@
+import hashlib
+import json
+from collections.abc import Mapping
+from pathlib import Path
+
+from jinja2 import FileSystemLoader, meta
+
+from templating import TEMPLATES
+from sitegen.records import Record
+
+# bump when page builders change what they render from the same inputs
+# (or when input hashing changes)
+MANIFEST_VERSION = 2
+
+
+def _jsonable(obj):
+    # loaded rows are immutable records that cache their own content hash
+    if isinstance(obj, Record):
+        return obj.digest()
+    return dict(obj) if isinstance(obj, Mapping) else str(obj)
+
+
+def content_hash(obj) -> str:
+    data = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_jsonable)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class BuildManifest:
+    """Per-page record of input hashes used by incremental builds.
+
+    Every page builder asks ``stale(rel, tpl, **inputs)`` before rendering;
+    pages whose inputs (and template chain) hash the same as last time and
+    whose file still exists are skipped.
+    """
+
+    def __init__(self, path: Path, output, options=None):
+        self.path = path
+        # sitegen.output backend holding the previous build's pages
+        self.output = output
+        # build flags that change page bytes (e.g. minification)
+        self.options = options or {}
+        self.previous = {}
+        self.pages = {}
+        self.rendered = 0
+        self.skipped = 0
+        self._template_digests = {}
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            data = None
+
+        if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+            self.previous = data.get("pages") or {}
+
+    def template_digest(self, tpl) -> str:
+        name = tpl.name
+        if name in self._template_digests:
+            return self._template_digests[name]
+
+        env = tpl.environment
+        # precompiled (module) loaders have no source; hash the files instead
+        loader = env.loader if env.loader.has_source_access else FileSystemLoader(str(TEMPLATES))
+        h = hashlib.sha256()
+        h.update(content_hash({
+            "base_path": env.globals.get("base_path"),
+            # fingerprinted asset names end up in every page
+            "assets": env.globals.get("assets"),
+            "options": self.options,
+        }).encode("ascii"))
+
+        # template itself + everything it extends/includes
+        todo = [name]
+        seen = set()
+        while todo:
+            tname = todo.pop()
+            if tname in seen:
+                continue
+            seen.add(tname)
+            source, _, _ = loader.get_source(env, tname)
+            h.update(tname.encode("utf-8"))
+            h.update(source.encode("utf-8"))
+            todo.extend(t for t in meta.find_referenced_templates(env.parse(source)) if t)
+
+        digest = h.hexdigest()
+        self._template_digests[name] = digest
+        return digest
+
+    def stale(self, rel: str, tpl, **inputs) -> bool:
+        deps = {k: content_hash(v) for k, v in inputs.items()}
+        deps["template"] = self.template_digest(tpl)
+        self.pages[rel] = deps
+
+        if self.previous.get(rel) == deps and self.output.exists(rel):
+            self.skipped += 1
+            return False
+
+        self.rendered += 1
+        return True
+
+    def advance(self) -> None:
+        # next build in the same process (serve --watch): this build becomes
+        # the previous one and templates are re-hashed
+        self.previous = self.pages
+        self.pages = {}
+        self.rendered = 0
+        self.skipped = 0
+        self._template_digests = {}
+
+    def fork(self):
+        # empty copy for a worker process; sees the same previous build
+        other = BuildManifest.__new__(BuildManifest)
+        other.__dict__.update(self.__dict__)
+        other.pages = {}
+        other.rendered = 0
+        other.skipped = 0
+        return other
+
+    def merge(self, pages, rendered, skipped) -> None:
+        self.pages.update(pages)
+        self.rendered += rendered
+        self.skipped += skipped
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            # dumps (not dump) so the C encoder is used
+            f.write(json.dumps({"version": MANIFEST_VERSION, "pages": self.pages}, ensure_ascii=False, sort_keys=True))
+        tmp.replace(self.path)
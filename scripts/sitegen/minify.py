@@ -0,0 +1,169 @@
+import re
+
+# Conservative, dependency-free minifiers: they only drop comments and
+# collapse whitespace where the browser would collapse it anyway.
+
+_HTML_RAW = re.compile(r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.S | re.I)
+_WS = re.compile(r"\s+")
+
+# strings, comments and unquoted url(...) bodies are copied (or dropped) whole
+_CSS_TOKEN = re.compile(
+    r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/|url\(\s*[^\s)"\']*\s*\)',
+    re.S | re.I,
+)
+_CSS_PUNCT = re.compile(r"\s*([{};,>])\s*")
+# "prop: value" right after { or ; (selectors and at-rule preludes keep their spaces)
+_CSS_DECL_COLON = re.compile(r"([{;][-\w]+):\s+")
+
+# after one of these (or a keyword below) a "/" starts a regex literal, not a division
+_JS_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+_JS_REGEX_KEYWORDS = {
+    "return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw", "instanceof",
+    "yield", "await",
+}
+_JS_SPACES = re.compile(r"[ \t\f\v\u00a0\ufeff]+")
+_JS_NEWLINES = re.compile(r"\s*\n\s*")
+
+
+def minify_html(text: str) -> str:
+    parts = _HTML_RAW.split(text)
+    out = []
+    # split() yields: text, raw block, tag name, text, raw block, tag name, ...
+    for i in range(0, len(parts), 3):
+        out.append(_WS.sub(" ", parts[i]))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out).strip()
+
+
+def _css_code(chunk: str) -> str:
+    chunk = _CSS_PUNCT.sub(r"\1", _WS.sub(" ", chunk))
+    return _CSS_DECL_COLON.sub(r"\1:", chunk).replace(";}", "}")
+
+
+def minify_css(text: str) -> str:
+    # comments first, so the whitespace they leave is collapsed with their neighbours
+    text = _CSS_TOKEN.sub(lambda m: " " if m.group(0).startswith("/*") else m.group(0), text)
+    out = []
+    pos = 0
+    for m in _CSS_TOKEN.finditer(text):
+        out.append(_css_code(text[pos:m.start()]))
+        out.append(m.group(0))
+        pos = m.end()
+    out.append(_css_code(text[pos:]))
+    return "".join(out).strip()
+
+
+def _word_end(text: str, i: int) -> int:
+    while i < len(text) and (text[i].isalnum() or text[i] in "_$"):
+        i += 1
+    return i
+
+
+def _js_tokens(text: str):
+    """Split JS into ("code", text) and ("raw", text) pieces; comments become whitespace.
+
+    Raw pieces are string, template and regex literals, copied verbatim.
+    """
+    n = len(text)
+    i = start = 0
+    last = ""  # last significant code character or word, for "/" disambiguation
+    braces = []  # per open "{": True when it is a template ${ substitution
+
+    def template(k):
+        # from inside a template literal to its end or the next ${
+        while k < n:
+            if text[k] == "\\":
+                k += 2
+            elif text[k] == "`":
+                return k + 1, False
+            elif text.startswith("${", k):
+                return k + 2, True
+            else:
+                k += 1
+        return n, False
+
+    while i < n:
+        c = text[i]
+        if c in "\"'":
+            yield "code", text[start:i]
+            j = i + 1
+            while j < n and text[j] != c and text[j] != "\n":
+                j += 2 if text[j] == "\\" else 1
+            yield "raw", text[i:j + 1]
+            i = start = j + 1
+            last = c
+        elif c == "`" or (c == "}" and braces and braces[-1]):
+            if c == "}":
+                braces.pop()
+            yield "code", text[start:i]
+            j, opened = template(i + 1)
+            if opened:
+                braces.append(True)
+            yield "raw", text[i:j]
+            i = start = j
+            last = "{" if opened else "`"
+        elif text.startswith("//", i):
+            yield "code", text[start:i]
+            j = text.find("\n", i)
+            i = start = n if j < 0 else j
+        elif text.startswith("/*", i):
+            yield "code", text[start:i]
+            j = text.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            yield "code", "\n" if "\n" in text[i:j] else " "
+            i = start = j
+        elif c == "/" and (not last or last in _JS_REGEX_AFTER or last in _JS_REGEX_KEYWORDS):
+            yield "code", text[start:i]
+            j = i + 1
+            in_class = False
+            while j < n and text[j] != "\n":
+                if text[j] == "\\":
+                    j += 2
+                    continue
+                if text[j] == "[":
+                    in_class = True
+                elif text[j] == "]":
+                    in_class = False
+                elif text[j] == "/" and not in_class:
+                    break
+                j += 1
+            j = _word_end(text, j + 1)  # flags
+            yield "raw", text[i:j]
+            i = start = j
+            last = "/"
+        elif c.isalnum() or c in "_$":
+            j = _word_end(text, i)
+            last = text[i:j]
+            i = j
+        else:
+            if c == "{":
+                braces.append(False)
+            elif c == "}" and braces:
+                braces.pop()
+            if not c.isspace():
+                last = c
+            i += 1
+    yield "code", text[start:]
+
+
+def minify_js(text: str) -> str:
+    # line breaks are kept (one per run) so automatic semicolon insertion is unaffected
+    out = []
+    code = []
+    for kind, piece in _js_tokens(text):
+        if kind == "code":
+            code.append(piece)
+            continue
+        out.append(_JS_NEWLINES.sub("\n", _JS_SPACES.sub(" ", "".join(code))))
+        out.append(piece)
+        code = []
+    out.append(_JS_NEWLINES.sub("\n", _JS_SPACES.sub(" ", "".join(code))))
+    return "".join(out).strip()
+
+
+MINIFIERS = {
+    ".html": minify_html,
+    ".css": minify_css,
+    ".js": minify_js,
+}
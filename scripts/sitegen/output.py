@@ -0,0 +1,488 @@
+import filecmp
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# owned by build_data.py, never pruned by the site build
+PRESERVED_DIRS = ("data",)
+
+
+def _walk(root: Path):
+    # site-relative paths of every file under root
+    for dirpath, _, filenames in os.walk(root):
+        rel_dir = Path(dirpath).relative_to(root).as_posix()
+        for name in filenames:
+            yield name if rel_dir == "." else f"{rel_dir}/{name}"
+
+
+class DirectoryOutput:
+    """Backend writing each output as a file under site_dir (the default)."""
+
+    def __init__(self, site_dir: Path):
+        self.site_dir = Path(site_dir)
+
+    def exists(self, rel: str) -> bool:
+        return (self.site_dir / rel).exists()
+
+    def read(self, rel: str) -> bytes:
+        return (self.site_dir / rel).read_bytes()
+
+    def size(self, rel: str) -> int:
+        return (self.site_dir / rel).stat().st_size
+
+    def files(self):
+        return _walk(self.site_dir)
+
+    def write(self, rel: str, data: bytes) -> bool:
+        path = self.site_dir / rel
+        try:
+            if path.stat().st_size == len(data) and path.read_bytes() == data:
+                return False
+        except FileNotFoundError:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return True
+
+    @contextmanager
+    def stream(self, rel: str, done):
+        path = self.site_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                yield f
+            if path.exists() and filecmp.cmp(tmp, path, shallow=False):
+                tmp.unlink()
+                done(False)
+                return
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        done(True)
+
+    def keep(self, rel: str) -> None:
+        pass  # already on disk
+
+    def prune(self, seen) -> list:
+        removed = []
+        for dirpath, dirnames, filenames in os.walk(self.site_dir, topdown=False):
+            rel_dir = Path(dirpath).relative_to(self.site_dir)
+            if rel_dir.parts and rel_dir.parts[0] in PRESERVED_DIRS:
+                continue
+
+            for name in filenames:
+                rel = (rel_dir / name).as_posix()
+                if rel not in seen:
+                    os.unlink(os.path.join(dirpath, name))
+                    removed.append(rel)
+
+            if rel_dir.parts and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+        return removed
+
+    def fork(self):
+        return self
+
+    def state(self):
+        return None
+
+    def merge(self, state) -> None:
+        pass
+
+    def finish(self) -> str:
+        return f"{self.site_dir}/"
+
+
+# (spool directory, pid) -> (name, append-only spool file); keyed by pid
+# because forked workers inherit the dict
+_spools = {}
+# per process: archive path -> {name: (data offset, size)} of the archive on disk
+_previous = {}
+
+
+def _archive_index(path: Path) -> dict:
+    key = str(path)
+    if key not in _previous:
+        index = {}
+        try:
+            with tarfile.open(path, "r:") as tar:
+                for m in tar:
+                    if m.isfile():
+                        index[m.name] = (m.offset_data, m.size)
+        except (FileNotFoundError, tarfile.TarError):
+            pass
+        _previous[key] = index
+    return _previous[key]
+
+
+def _flush_spools():
+    for _, f in _spools.values():
+        f.flush()
+
+
+class ArchiveOutput:
+    """Backend streaming every output into one deterministic tar (``--output-archive``).
+
+    Outputs are appended to a spool file per process (no per-page files),
+    and ``finish`` writes the tar in one sequential pass: entries sorted by
+    path, fixed mtime (SOURCE_DATE_EPOCH, default 0), root ownership and
+    fixed modes, so the same site always gives the same bytes. Pages an
+    incremental build keeps are copied from the previous archive at the
+    same path; the preserved data/ files come from site_dir.
+    """
+
+    def __init__(self, path: Path, site_dir: Path, spool_dir: Path, inherited=None):
+        self.path = Path(path)
+        self.site_dir = Path(site_dir) if site_dir is not None else None
+        self.spool_dir = Path(spool_dir) if spool_dir is not None else None
+        # rel -> (file, offset, size); file is a spool file or the previous archive
+        self.entries = {}
+        # a fork's view of what its parent wrote so far (read-only, not merged back)
+        self.inherited = inherited or {}
+
+    @classmethod
+    def create(cls, path: Path, site_dir: Path, spool_dir: Path):
+        # new build: drop spools a crashed build left behind
+        shutil.rmtree(spool_dir, ignore_errors=True)
+        return cls(path, site_dir, spool_dir)
+
+    @classmethod
+    def open(cls, path: Path):
+        """Read-only view of an existing archive (link check, comparisons)."""
+        out = cls(path, None, None)
+        _previous.pop(str(out.path), None)  # another process may have rewritten it
+        for rel, (offset, size) in _archive_index(out.path).items():
+            out.entries[rel] = (str(out.path), offset, size)
+        return out
+
+    def _old(self):
+        return _archive_index(self.path)
+
+    def _preserved(self):
+        if self.site_dir is None:
+            return {}
+        found = {}
+        for d in PRESERVED_DIRS:
+            if (self.site_dir / d).is_dir():
+                for rel in _walk(self.site_dir / d):
+                    found[f"{d}/{rel}"] = self.site_dir / d / rel
+        return found
+
+    def _entry(self, rel: str):
+        entry = self.entries.get(rel)
+        return entry if entry is not None else self.inherited.get(rel)
+
+    def exists(self, rel: str) -> bool:
+        return rel in self.entries or rel in self.inherited or rel in self._old()
+
+    def read(self, rel: str) -> bytes:
+        entry = self._entry(rel)
+        if entry is None:
+            old = self._old().get(rel)
+            if old is None:
+                return (self.site_dir / rel).read_bytes()  # preserved file
+            entry = (str(self.path), *old)
+        name, offset, size = entry
+        _flush_spools()
+        with open(name, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def _read_old(self, old) -> bytes:
+        offset, size = old
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def size(self, rel: str) -> int:
+        entry = self._entry(rel)
+        return entry[2] if entry is not None else self._old()[rel][1]
+
+    def files(self):
+        return list(self.entries) + [rel for rel in self._preserved() if rel not in self.entries]
+
+    def _spool(self):
+        key = (str(self.spool_dir), os.getpid())
+        spool = _spools.get(key)
+        if spool is None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            name = str(self.spool_dir / f"spool-{os.getpid()}.bin")
+            spool = _spools[key] = (name, open(name, "ab"))
+        return spool
+
+    def write(self, rel: str, data: bytes) -> bool:
+        old = self._old().get(rel)
+        if old is not None and old[1] == len(data) and self._read_old(old) == data:
+            # same bytes as last time: copy from the previous archive
+            self.entries[rel] = (str(self.path), *old)
+            return False
+        name, f = self._spool()
+        offset = f.tell()
+        f.write(data)
+        self.entries[rel] = (name, offset, len(data))
+        return True
+
+    @contextmanager
+    def stream(self, rel: str, done):
+        # own spool file: other outputs may be written while it is open
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(prefix="stream-", suffix=".bin", dir=self.spool_dir)
+        with open(fd, "wb") as f:
+            yield f
+            size = f.tell()
+        old = self._old().get(rel)
+        if old is not None and old[1] == size and self._same_as_old(name, old):
+            # same bytes as last time: copy from the previous archive
+            os.unlink(name)
+            self.entries[rel] = (str(self.path), *old)
+            done(False)
+            return
+        self.entries[rel] = (name, 0, size)
+        done(True)
+
+    def _same_as_old(self, name: str, old) -> bool:
+        # chunked, so large streamed outputs are never held in memory
+        offset, size = old
+        with open(name, "rb") as new, open(self.path, "rb") as prev:
+            prev.seek(offset)
+            while size > 0:
+                n = min(size, 1 << 16)
+                if new.read(n) != prev.read(n):
+                    return False
+                size -= n
+        return True
+
+    def keep(self, rel: str) -> None:
+        old = self._old().get(rel)
+        if old is None:
+            raise FileNotFoundError(f"{rel} is not in the previous archive {self.path}")
+        self.entries[rel] = (str(self.path), *old)
+
+    def prune(self, seen) -> list:
+        # nothing is on disk; report what the previous archive had and this one drops
+        preserved = self._preserved()
+        return sorted(rel for rel in self._old() if rel not in self.entries and rel not in preserved)
+
+    def fork(self):
+        _flush_spools()  # before a pool forks this process
+        return ArchiveOutput(self.path, self.site_dir, self.spool_dir, {**self.inherited, **self.entries})
+
+    def state(self):
+        _flush_spools()
+        return self.entries
+
+    def merge(self, state) -> None:
+        self.entries.update(state)
+
+    def finish(self) -> str:
+        """Write the tar and remove the spools; returns a summary."""
+        _flush_spools()
+
+        sources = {rel: path for rel, path in self._preserved().items() if rel not in self.entries}
+        names = set(self.entries) | set(sources)
+        dirs = {str(p) for rel in names for p in Path(rel).parents if str(p) != "."}
+        mtime = int(os.environ.get("SOURCE_DATE_EPOCH", "0"))
+
+        def info(name, kind, mode, size=0):
+            ti = tarfile.TarInfo(name)
+            ti.type = kind
+            ti.mode = mode
+            ti.size = size
+            ti.mtime = mtime
+            ti.uid = ti.gid = 0
+            ti.uname = ti.gname = ""
+            return ti
+
+        total = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        handles = {}
+        try:
+            with tarfile.open(tmp, "w", format=tarfile.GNU_FORMAT, encoding="utf-8") as tar:
+                for name in sorted(names | dirs):
+                    if name in dirs:
+                        tar.addfile(info(name, tarfile.DIRTYPE, 0o755))
+                        continue
+                    if name in self.entries:
+                        src, offset, size = self.entries[name]
+                        f = handles.get(src)
+                        if f is None:
+                            f = handles[src] = open(src, "rb")
+                        f.seek(offset)
+                        data = f.read(size)
+                    else:
+                        data = sources[name].read_bytes()
+                    tar.addfile(info(name, tarfile.REGTYPE, 0o644, len(data)), io.BytesIO(data))
+                    total += len(data)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            for f in handles.values():
+                f.close()
+        # the previous archive was read up to here
+        os.replace(tmp, self.path)
+        _previous.pop(str(self.path), None)
+
+        for key in [k for k in _spools if k[0] == str(self.spool_dir)]:
+            _spools.pop(key)[1].close()
+        if self.spool_dir is not None:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+        return f"{self.path} ({len(names)} files, {total / 1024 / 1024:.1f} MiB)"
+
+
+def diff_outputs(a, b) -> list:
+    """Paths whose presence or bytes differ between two backends (empty = identical)."""
+    a_files = set(a.files())
+    b_files = set(b.files())
+    diffs = sorted(f"only in {'first' if rel in a_files else 'second'}: {rel}" for rel in a_files ^ b_files)
+    diffs += [f"differs: {rel}" for rel in sorted(a_files & b_files) if a.read(rel) != b.read(rel)]
+    return diffs
+
+
+def open_output(path: Path):
+    # an existing site: directory or archive
+    path = Path(path)
+    return DirectoryOutput(path) if path.is_dir() else ArchiveOutput.open(path)
+
+
+class SiteWriter:
+    """Single write path for everything the build puts into site/.
+
+    Writes are skipped when the bytes on disk are already identical (so
+    mtimes of unchanged pages survive) and otherwise go through a temp
+    file + rename, so a page is never observed half-written. Every path
+    written or kept is remembered, which lets ``prune`` remove exactly the
+    files the current build no longer produces.
+
+    ``filters`` maps a file suffix to a text transform (e.g. a minifier)
+    applied before comparing with the file on disk. ``backend`` decides
+    where outputs go: a ``DirectoryOutput`` for site_dir by default, or an
+    ``ArchiveOutput`` for a single tar.
+    """
+
+    def __init__(self, site_dir: Path, filters=None, profile=None, fragments=None, backend=None):
+        self.site_dir = site_dir
+        self.backend = backend if backend is not None else DirectoryOutput(site_dir)
+        self.filters = filters or {}
+        # sitegen.profiling.PageStats when --profile is on
+        self.profile = profile
+        # sitegen.fragments.FragmentCache shared by the page builders
+        self.fragments = fragments
+        self.seen = set()
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+        # suffix -> [files, bytes before filter, bytes after filter]
+        self.sizes = {}
+
+    def encode(self, rel: str, content) -> bytes:
+        # the exact bytes write() would store for rel
+        suffix = Path(rel).suffix
+        filt = self.filters.get(suffix)
+        if filt is not None:
+            text = content.decode("utf-8") if isinstance(content, bytes) else content
+            raw_len = len(text.encode("utf-8"))
+            content = filt(text)
+
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        if filt is not None:
+            stat = self.sizes.setdefault(suffix, [0, 0, 0])
+            stat[0] += 1
+            stat[1] += raw_len
+            stat[2] += len(data)
+        return data
+
+    def write(self, rel: str, content) -> bool:
+        return self.write_bytes(rel, self.encode(rel, content))
+
+    def write_bytes(self, rel: str, data: bytes) -> bool:
+        # no filters: data is final
+        self.seen.add(rel)
+        changed = self.backend.write(rel, data)
+        self._count(changed)
+        return changed
+
+    def _count(self, changed: bool) -> None:
+        if changed:
+            self.written += 1
+        else:
+            self.unchanged += 1
+
+    @contextmanager
+    def stream(self, rel: str):
+        """Binary file for outputs too large to build in memory (no filters).
+
+        It is written to a temp file that replaces ``rel`` (or, in an
+        archive, the previous build's entry) only if the bytes differ.
+        """
+        self.seen.add(rel)
+        with self.backend.stream(rel, self._count) as f:
+            yield f
+
+    def read(self, rel: str) -> bytes:
+        return self.backend.read(rel)
+
+    def exists(self, rel: str) -> bool:
+        return self.backend.exists(rel)
+
+    def copy(self, src: Path, rel: str) -> bool:
+        return self.write(rel, src.read_bytes())
+
+    def keep(self, rel: str) -> None:
+        # file produced by an earlier build and still valid (incremental skip)
+        self.backend.keep(rel)
+        self.seen.add(rel)
+        self.unchanged += 1
+
+    def fork(self):
+        profile = self.profile.fork() if self.profile is not None else None
+        fragments = self.fragments.fork() if self.fragments is not None else None
+        return SiteWriter(self.site_dir, self.filters, profile, fragments, self.backend.fork())
+
+    def merge(self, seen, written, unchanged, sizes, profile=None, fragments=None, backend=None) -> None:
+        self.seen.update(seen)
+        self.written += written
+        self.unchanged += unchanged
+        for suffix, (n, raw, final) in sizes.items():
+            stat = self.sizes.setdefault(suffix, [0, 0, 0])
+            stat[0] += n
+            stat[1] += raw
+            stat[2] += final
+        if profile is not None and self.profile is not None:
+            self.profile.merge(profile)
+        if fragments is not None and self.fragments is not None:
+            self.fragments.merge(fragments)
+        if backend is not None:
+            self.backend.merge(backend)
+
+    def state(self):
+        return (
+            self.seen, self.written, self.unchanged, self.sizes,
+            self.profile, self.fragments, self.backend.state(),
+        )
+
+    def prune(self) -> list:
+        removed = self.backend.prune(self.seen)
+        self.removed += len(removed)
+        return sorted(removed)
+
+    def finish(self) -> str:
+        # write out anything the backend holds back (the archive); returns where the site is
+        return self.backend.finish()
+
+    def summary(self) -> str:
+        return f"{self.written} written, {self.unchanged} unchanged, {self.removed} removed"
@@ -1,94 +1,158 @@
-from pathlib import Path
-from templating import root
+import json
+import string
+import time
+
 from sitegen.services import render_breadcrumbs
+from sitegen.sortkeys import spell_title
+
+# spells index: rows rendered statically (no-JS first page) and rows per
+# JSON chunk the client pages through (>= the largest "per" option)
+SPELLS_FIRST_PAGE = 20
+SPELLS_CHUNK = 100
+
+
+def _stale(out, manifest, rel, tpl, **inputs):
+    # without a manifest (full build) every page is rendered
+    if manifest is None or manifest.stale(rel, tpl, **inputs):
+        return True
+    out.keep(rel)
+    return False
 
-def build_index(site_dir: Path, tpl_index, manuscripts):
-    html = tpl_index.render(
+
+def _fragment(out, kind, inputs, render):
+    if out.fragments is None:
+        return render()
+    return out.fragments.get(kind, inputs, render)
+
+
+def _category_links(categories, root):
+    return "".join(
+        f'<li><a href="{root("/categories/" + cid + ".html")}">{name}</a></li>'
+        for cid, name in categories
+    )
+
+
+def _emit(out, tpl, rel, **context):
+    if out.profile is None:
+        out.write(rel, tpl.render(**context))
+        return
+
+    t0 = time.perf_counter()
+    html = tpl.render(**context)
+    out.profile.record(tpl.name, rel, time.perf_counter() - t0, len(html.encode("utf-8")))
+    out.write(rel, html)
+
+
+def build_index(out, tpl_index, manuscripts, manifest=None):
+    if not _stale(out, manifest, "index.html", tpl_index, manuscripts=manuscripts):
+        return
+
+    _emit(
+        out,
+        tpl_index,
+        "index.html",
         title="Manuscript Corpus",
         manuscripts=manuscripts,
     )
-    (site_dir / "index.html").write_text(html, encoding="utf-8")
 
 
-def build_manuscripts(site_dir: Path, tpl_ms, manuscripts, spells_by_ms_id):
-    out_dir = site_dir / "manuscripts"
-    out_dir.mkdir(exist_ok=True)
+def build_search_page(out, tpl_search, manifest=None):
+    if not _stale(out, manifest, "search.html", tpl_search):
+        return
+
+    _emit(out, tpl_search, "search.html", title="Search")
 
+
+def build_manuscripts(out, tpl_ms, manuscripts, spells_by_ms_id, manifest=None):
+    root = tpl_ms.environment.globals["root"]
     for ms in manuscripts:
+        related_spells = spells_by_ms_id.get(ms["id"], [])
+
+        rel = f'manuscripts/{ms["id"]}.html'
+        if not _stale(out, manifest, rel, tpl_ms, record=ms, spells=related_spells):
+            continue
+
         breadcrumbs = render_breadcrumbs([
             ("Home", "/index.html"),
             ("Manuscripts", "/index.html"),
             (ms.get("title", ""), None),
-        ])
+        ], root, out.fragments)
 
-        related_spells = spells_by_ms_id.get(ms["id"], [])
-
-        html = tpl_ms.render(
+        _emit(
+            out,
+            tpl_ms,
+            rel,
             title=ms.get("title", "Manuscript"),
             ms=ms,
             related_spells=related_spells,
             breadcrumbs=breadcrumbs,
         )
-        (out_dir / f'{ms["id"]}.html').write_text(html, encoding="utf-8")
 
 
-def build_spells(site_dir: Path, tpl_spell, spells, manuscript_by_id, cats_by_spell_id, category_by_id, category_ancestors):
-    out_dir = site_dir / "spells"
-    out_dir.mkdir(exist_ok=True)
+def build_spells(
+    out, tpl_spell, spells, manuscript_by_id, cats_by_spell_id, tree, manifest=None, parallels=None, store=None
+):
+    # parallels: {spell id: (rows, total)} from sitegen.parallels, or None when not computed;
+    # store: CorpusStore when spells are index records without their text (--sqlite)
+    # the category list is a fragment: spells with the same categories share it
+    tpl_cats = tpl_spell.environment.get_template("_spell_categories.html")
+    root = tpl_spell.environment.globals["root"]
 
     for sp in spells:
+        if store is not None:
+            sp = store.spell(sp["id"])
         ms = manuscript_by_id.get(sp.get("manuscript_id"), {})
         cat_ids = cats_by_spell_id.get(sp["id"], [])
+        par_rows, par_total = parallels.get(sp["id"], ((), 0)) if parallels is not None else ((), 0)
+
+        rel = f"spells/{sp['id']}.html"
+        if manifest is not None:
+            cat_chains = [tree.ancestors(cid) for cid in cat_ids]
+            extra = {"parallels": [par_rows, par_total]} if parallels is not None else {}
+            if not _stale(
+                out, manifest, rel, tpl_spell, record=sp, manuscript=ms, categories=cat_chains,
+                fragment=manifest.template_digest(tpl_cats), **extra,
+            ):
+                continue
 
         crumbs = [
             ("Home", "/index.html"),
             ("Spells", "/spells/index.html"),
             (sp.get("title_en", ""), None),
         ]
-        breadcrumbs = render_breadcrumbs(crumbs)
+        breadcrumbs = render_breadcrumbs(crumbs, root, out.fragments)
 
-        categories_list = []
-        for cid in cat_ids:
-            c = category_by_id.get(cid)
-            if c:
-                categories_list.append({"id": cid, "name": c["name"]})
+        categories_list = tuple(
+            (cid, tree.category_by_id[cid]["name"]) for cid in cat_ids if cid in tree.category_by_id
+        )
+        categories_html = _fragment(
+            out, "spell_categories", categories_list,
+            lambda: tpl_cats.render(categories=[{"id": cid, "name": name} for cid, name in categories_list]),
+        )
 
-        html = tpl_spell.render(
+        _emit(
+            out,
+            tpl_spell,
+            rel,
             title=sp.get("title_en", "Spell"),
             sp=sp,
             ms=ms,
             breadcrumbs=breadcrumbs,
-            categories=categories_list,
+            categories_html=categories_html,
+            parallels=par_rows,
+            parallels_more=par_total - len(par_rows),
         )
-        (out_dir / f"{sp['id']}.html").write_text(html, encoding="utf-8")
-
-
-def build_spells_index(site_dir: Path, tpl_spells_index, spells, manuscript_by_id):
-    out_dir = site_dir / "spells"
-    out_dir.mkdir(exist_ok=True)
-
-    def display_title(sp):
-        return (sp.get("title_en") or "Untitled").strip() or "Untitled"
-
-    def norm_title(t: str) -> str:
-        return " ".join(t.split()).lower()
 
 
-    def sort_key(sp):
-        ms = manuscript_by_id.get(sp.get("manuscript_id"), {})
-        return (
-            norm_title(display_title(sp)),
-            (ms.get("siglum") or "").lower(),
-            str(sp.get("page") or ""),
-            sp.get("id") or "",
-        )
-
+def build_spells_index(out, tpl_spells_index, spells_sorted, manuscript_by_id, manifest=None):
+    # spells_sorted: (SpellKey, spell) pairs by title, siglum, folio, id
+    # (idx["spells_sorted"]), so each title's refs are already in order
     grouped = {}
-    order = [] 
+    order = []
 
-    for sp in sorted(spells, key=sort_key):
-        t = display_title(sp)
-        nt = norm_title(t)
+    for key, sp in spells_sorted:
+        t = spell_title(sp)
+        nt = key.title
 
         if nt not in grouped:
             grouped[nt] = {"title": t, "refs": []}
@@ -117,43 +181,106 @@ def build_spells_index(site_dir: Path, tpl_spells_index, spells, manuscript_by_i
             seen.add(key)
             refs.append(r)
 
-        refs.sort(key=lambda r: (
-            (r.get("siglum") or "").lower(),
-            str(r.get("page") or ""),
-            r.get("spell_id") or "",
-        ))
+        for r in refs:
+            r["page_label"] = page_label(r["page"])
 
         rows.append({
             "title_en": title,
+            "letter": title_letter(title),
             "refs": refs,
         })
 
-    html = tpl_spells_index.render(
+    counts = write_spells_index_data(out, rows)
+
+    if not _stale(out, manifest, "spells/index.html", tpl_spells_index, rows=rows[:SPELLS_FIRST_PAGE], counts=counts):
+        return
+
+    _emit(
+        out,
+        tpl_spells_index,
+        "spells/index.html",
         title="Spells",
-        spells=rows,
+        spells=rows[:SPELLS_FIRST_PAGE],
+        counts=counts,
+        counts_json=json.dumps(counts, sort_keys=True, separators=(",", ":")),
+        chunk=SPELLS_CHUNK,
     )
-    (out_dir / "index.html").write_text(html, encoding="utf-8")
+
+
+def title_letter(title: str) -> str:
+    first = title[:1].upper()
+    return first if first and first in string.ascii_uppercase else "OTHER"
+
+
+def page_label(page) -> str:
+    p = str(page or "?").strip()
+    if p != "?" and not p.lower().startswith("fol"):
+        p = "fol. " + p
+    return p
+
+
+def write_spells_index_data(out, rows):
+    """Write spells/data/<LETTER>-<n>.json chunks (ALL = every row).
+
+    Each row is [title, [[spell_id, manuscript_id, siglum, page_label], ...]].
+    Returns {letter: row count}.
+    """
+    by_letter = {"ALL": []}
+    for row in rows:
+        compact = [
+            row["title_en"],
+            [[r["spell_id"], r["manuscript_id"], r["siglum"], r["page_label"]] for r in row["refs"]],
+        ]
+        by_letter["ALL"].append(compact)
+        by_letter.setdefault(row["letter"], []).append(compact)
+
+    for letter, items in by_letter.items():
+        for n, start in enumerate(range(0, len(items), SPELLS_CHUNK)):
+            data = json.dumps(items[start:start + SPELLS_CHUNK], ensure_ascii=False, separators=(",", ":"))
+            out.write(f"spells/data/{letter}-{n}.json", data)
+
+    return {letter: len(items) for letter, items in by_letter.items()}
+
 
 def build_categories(
-    site_dir: Path,
+    out,
     tpl_cat,
     categories,
     manuscript_by_id,
-    children_by_parent,
-    category_by_id,
-    category_ancestors,
-    total_spell_count,
-    spell_ids_by_cat_id,
-    spell_by_id,
+    tree,
+    spells_by_cat_id,
+    manifest=None,
 ):
-    out_dir = site_dir / "categories"
-    out_dir.mkdir(exist_ok=True)
-
+    # spells_by_cat_id: idx["spells_by_cat_id"], already in spells-index order
+    root = tpl_cat.environment.globals["root"]
     for cat in categories:
         cat_id = cat["id"]
-        count = total_spell_count(cat_id)
+        count = tree.spell_count(cat_id)
+
+        ancestors = tree.ancestors(cat_id)
+        pid = (cat.get("parent_id") or "").strip() or None
+        parent = tree.category_by_id.get(pid)
+        children = tree.children_by_parent.get(cat_id, [])
+        related_spells = spells_by_cat_id.get(cat_id, [])
+
+        rel = f"categories/{cat_id}.html"
+        if manifest is not None:
+            related_ms = [manuscript_by_id.get(sp["manuscript_id"], {}) for sp in related_spells]
+            if not _stale(
+                out,
+                manifest,
+                rel,
+                tpl_cat,
+                record=cat,
+                ancestors=ancestors,
+                parent=parent,
+                children=children,
+                count=count,
+                spells=related_spells,
+                manuscripts=related_ms,
+            ):
+                continue
 
-        ancestors = category_ancestors(cat_id)
         crumbs = [
             ("Home", "/index.html"),
             ("Categories", "/categories/index.html"),
@@ -161,30 +288,29 @@ def build_categories(
         for c in ancestors[:-1]:
             crumbs.append((c["name"], f'/categories/{c["id"]}.html'))
         crumbs.append((ancestors[-1]["name"], None))
-        breadcrumbs = render_breadcrumbs(crumbs)
+        breadcrumbs = render_breadcrumbs(crumbs, root, out.fragments)
 
-        pid = (cat.get("parent_id") or "").strip() or None
-        parent = category_by_id.get(pid)
         if parent:
-            parent_html = (
-                f'<p><strong>Parent category:</strong> '
-                f'<a href="{root("/categories/" + parent["id"] + ".html")}">{parent["name"]}</a></p>'
+            # the same for every sibling
+            parent_html = _fragment(
+                out, "category_parent", (parent["id"], parent["name"]),
+                lambda: (
+                    f'<p><strong>Parent category:</strong> '
+                    f'<a href="{root("/categories/" + parent["id"] + ".html")}">{parent["name"]}</a></p>'
+                ),
             )
         else:
             parent_html = ""
 
-        children = children_by_parent.get(cat_id, [])
         if children:
-            sub_html = "<ul>" + "".join(
-                f'<li><a href="{root("/categories/" + c["id"] + ".html")}">{c["name"]}</a></li>'
-                for c in children
-            ) + "</ul>"
+            child_links = tuple((c["id"], c["name"]) for c in children)
+            sub_html = _fragment(
+                out, "category_children", child_links,
+                lambda: "<ul>" + _category_links(child_links, root) + "</ul>",
+            )
         else:
             sub_html = "<p>No subcategories.</p>"
 
-        spell_ids = spell_ids_by_cat_id.get(cat_id, [])
-        related_spells = [spell_by_id[sid] for sid in spell_ids if sid in spell_by_id]
-
         spells_by_title = {}
         for sp in related_spells:
             title = sp.get("title_en", "Untitled")
@@ -192,8 +318,7 @@ def build_categories(
 
         if spells_by_title:
             blocks = []
-            for title in sorted(spells_by_title.keys(), key=lambda s: s.lower()):
-                entries = spells_by_title[title]
+            for title, entries in spells_by_title.items():
                 refs = []
                 for sp in entries:
                     ms = manuscript_by_id.get(sp["manuscript_id"], {})
@@ -207,7 +332,10 @@ def build_categories(
         else:
             spells_html = "<p>No spells in this category.</p>"
 
-        html = tpl_cat.render(
+        _emit(
+            out,
+            tpl_cat,
+            rel,
             title=cat.get("name", "Category"),
             breadcrumbs=breadcrumbs,
             category_name=f'{cat["name"]} ({count})',
@@ -215,25 +343,16 @@ def build_categories(
             subcategories=sub_html,
             spells=spells_html,
         )
-        (out_dir / f"{cat_id}.html").write_text(html, encoding="utf-8")
 
 
-def build_categories_index(site_dir: Path, tpl_cats_index, children_by_parent, total_spell_count):
-    categories_dir = site_dir / "categories"
-    categories_dir.mkdir(exist_ok=True)
+def build_categories_index(out, tpl_cats_index, tree, manifest=None):
+    root = tpl_cats_index.environment.globals["root"]
     tree_blocks = []
 
-    root_categories = sorted(
-        children_by_parent.get(None, []),
-        key=lambda c: (
-            (c.get("name") or "").lower(),
-            c.get("id") or "",
-        ),
-    )
-
-    for root_cat in root_categories:
+    # children_by_parent is already sorted by name
+    for root_cat in tree.children_by_parent.get(None, []):
         root_id = root_cat["id"]
-        count = total_spell_count(root_id)
+        count = tree.spell_count(root_id)
 
         block = (
             f'<h2><a href="{root("/categories/" + root_id + ".html")}">'
@@ -241,21 +360,25 @@ def build_categories_index(site_dir: Path, tpl_cats_index, children_by_parent, t
             f'</a></h2>'
         )
 
-        children = children_by_parent.get(root_id, [])
+        children = tree.children_by_parent.get(root_id, [])
         if children:
-            block += "<ul>" + "".join(
-                f'<li><a href="{root("/categories/" + c["id"] + ".html")}">'
-                f'{c["name"]} ({total_spell_count(c["id"])})'
-                f'</a></li>'
-                for c in children
-            ) + "</ul>"
+            child_links = tuple((c["id"], f'{c["name"]} ({tree.spell_count(c["id"])})') for c in children)
+            block += _fragment(
+                out, "category_children", child_links,
+                lambda: "<ul>" + _category_links(child_links, root) + "</ul>",
+            )
 
         tree_blocks.append(block)
 
     tree_html = "\n".join(tree_blocks)
 
-    html = tpl_cats_index.render(
+    if not _stale(out, manifest, "categories/index.html", tpl_cats_index, tree=tree_html):
+        return
+
+    _emit(
+        out,
+        tpl_cats_index,
+        "categories/index.html",
         title="Categories",
         tree=tree_html,
-    )
-    (site_dir / "categories" / "index.html").write_text(html, encoding="utf-8")
\ No newline at end of file
+    )
\ No newline at end of file
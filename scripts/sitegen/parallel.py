@@ -0,0 +1,206 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from templating import BASE_PATH, make_env, set_corpus
+
+from sitegen.indexes import index_tables
+from sitegen.pages import build_manuscripts, build_spells, build_categories
+from sitegen.profiling import Profiler
+
+ENTITY_KINDS = ("manuscripts", "spells", "categories")
+# ctx entries set by the parent after build_context; workers get them as is
+PARENT_CTX = ("parallels", "store")
+
+# chunks per worker: small enough to balance uneven pages, large enough
+# that per-task overhead stays negligible
+CHUNKS_PER_JOB = 4
+
+
+def build_context(manuscripts, spells, categories, spell_categories, profiler=None):
+    # accepts raw or already cleaned tables; ctx["rows"] holds the cleaned ones
+    profiler = profiler or Profiler()
+    with profiler.stage("index_tables"):
+        indexed = index_tables(manuscripts, spells, categories, spell_categories)
+    manuscripts, spells, categories, spell_categories = indexed["tables"]
+    return {
+        "tables": {
+            "manuscripts": manuscripts,
+            "spells": spells,
+            "categories": categories,
+        },
+        "rows": indexed["tables"],
+        "idx": indexed["idx"],
+        "tree": indexed["tree"],
+        "findings": indexed["findings"],
+    }
+
+
+def build_entity_pages(kind, out, env, ctx, records, manifest=None):
+    idx = ctx["idx"]
+
+    if kind == "manuscripts":
+        build_manuscripts(out, env.get_template("manuscript.html"), records, idx["spells_by_ms_id"], manifest)
+    elif kind == "spells":
+        build_spells(
+            out,
+            env.get_template("spell.html"),
+            records,
+            idx["manuscript_by_id"],
+            idx["cats_by_spell_id"],
+            ctx["tree"],
+            manifest,
+            ctx.get("parallels"),
+            ctx.get("store"),
+        )
+    elif kind == "categories":
+        build_categories(
+            out,
+            env.get_template("category.html"),
+            records,
+            idx["manuscript_by_id"],
+            ctx["tree"],
+            idx["spells_by_cat_id"],
+            manifest,
+        )
+    else:
+        raise ValueError(f"Unknown page kind: {kind}")
+
+
+# --- worker side: one Jinja env per process, one corpus context at a time ---
+_setups = {}
+_worker = {}
+
+
+def _init_worker(setups):
+    global _setups
+    # corpus name -> (out, tables, extra ctx, manifest, env_kwargs)
+    _setups = setups
+
+
+def _use_corpus(name):
+    if _worker.get("corpus") == name:
+        return
+    out, tables, extra, manifest, env_kwargs = _setups[name]
+    _worker.pop("ctx", None)  # previous corpus' context can go first
+    if "env" in _worker:
+        # same compiled templates, other base path and assets
+        set_corpus(_worker["env"], env_kwargs.get("base_path", BASE_PATH), env_kwargs.get("assets") or {})
+    else:
+        _worker["env"] = make_env(**env_kwargs)
+    _worker.update(corpus=name, out=out, ctx={**build_context(*tables), **extra}, manifest=manifest)
+
+
+def _render_chunk(corpus, kind, start, stop):
+    _use_corpus(corpus)
+    ctx = _worker["ctx"]
+    records = ctx["tables"][kind][start:stop]
+    out = _worker["out"].fork()
+    manifest = _worker["manifest"].fork() if _worker["manifest"] is not None else None
+
+    build_entity_pages(kind, out, _worker["env"], ctx, records, manifest)
+    if manifest is None:
+        return out.state(), None
+    return out.state(), (manifest.pages, manifest.rendered, manifest.skipped)
+
+
+def _chunks(ctx, jobs):
+    for kind in ENTITY_KINDS:
+        n = len(ctx["tables"][kind])
+        size = max(1, -(-n // (jobs * CHUNKS_PER_JOB)))
+        for start in range(0, n, size):
+            yield kind, start, min(n, start + size)
+
+
+def resolve_jobs(jobs: int) -> int:
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+class WorkerPool:
+    """Render processes shared by the builds of one or more corpora.
+
+    Every corpus is registered with ``add`` before the first ``render``
+    starts the processes. Workers build a corpus' context on its first
+    chunk and keep one at a time; their Jinja environment (and the
+    templates it compiled) is reused for every corpus.
+    """
+
+    def __init__(self, jobs: int):
+        self.jobs = resolve_jobs(jobs)
+        self.setups = {}
+        self._pool = None
+        self._broken = False
+
+    def add(self, corpus: str, out, ctx, manifest=None, env_kwargs=None) -> None:
+        if self._pool is not None:
+            raise RuntimeError(f"corpus {corpus!r} added after the worker pool started")
+        extra = {k: ctx[k] for k in PARENT_CTX if k in ctx}
+        self.setups[corpus] = (out.fork(), ctx["rows"], extra, manifest, env_kwargs or {})
+
+    def render(self, corpus: str, ctx):
+        """Per-chunk (out state, manifest state), or None to render serially."""
+        if self.jobs <= 1 or self._broken:
+            return None
+        try:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.jobs, initializer=_init_worker, initargs=(self.setups,)
+                )
+            futures = [self._pool.submit(_render_chunk, corpus, *chunk) for chunk in _chunks(ctx, self.jobs)]
+            return [fut.result() for fut in futures]
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            # no usable multiprocessing here (sandbox, missing sem_open, ...)
+            print(f"WARNING: parallel rendering unavailable ({e}), falling back to serial")
+            self._broken = True
+            self.close()
+            return None
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def render_entity_pages(
+    out, env, ctx, manifest=None, jobs: int = 1, env_kwargs=None, profiler=None, pool=None, corpus: str = ""
+):
+    """Render manuscript, spell and category pages, in a process pool if jobs > 1.
+
+    Workers build their own context and Jinja environment from the raw
+    tables, so the output is identical to the serial path. ``pool`` is a
+    WorkerPool shared with other corpora (``corpus`` must be registered in
+    it); without one a pool is started for this call.
+    """
+    profiler = profiler or Profiler()
+    own_pool = pool is None
+    if own_pool:
+        pool = WorkerPool(jobs)
+        pool.add(corpus, out, ctx, manifest, env_kwargs)
+
+    try:
+        parts = None
+        if pool.jobs > 1:
+            with profiler.stage(f"build_{'+'.join(ENTITY_KINDS)} (x{pool.jobs})"):
+                parts = pool.render(corpus, ctx)
+    finally:
+        if own_pool:
+            pool.close()
+
+    if parts is not None:
+        for out_state, manifest_state in parts:
+            out.merge(*out_state)
+            if manifest is not None:
+                manifest.merge(*manifest_state)
+        return
+
+    for kind in ENTITY_KINDS:
+        with profiler.stage(f"build_{kind}"):
+            build_entity_pages(kind, out, env, ctx, ctx["tables"][kind], manifest)
@@ -0,0 +1,327 @@
+import base64
+import json
+import operator
+import re
+import zlib
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+from sitegen.search import normalize
+from sitegen.sortkeys import spell_title
+
+# bump when shingling or hashing changes (invalidates cached signatures)
+PARALLELS_VERSION = 2
+FIELDS = ("title_en", "title_syr", "translation")
+# signature length; a power of two (bins are picked by the top hash bits)
+NUM_PERM = 128
+# characters per shingle: short enough for spelling variants to share most
+SHINGLE = 5
+DEFAULT_THRESHOLD = 0.5
+# parallels listed on one spell page
+MAX_PARALLELS = 20
+
+_BIN_SHIFT = 64 - (NUM_PERM.bit_length() - 1)
+_MASK64 = (1 << 64) - 1
+_EMPTY = 1 << 64
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def shingles(sp) -> set:
+    """Character shingles of the normalized text fields, tagged by field."""
+    found = set()
+    for tag, field in enumerate(FIELDS):
+        text = " ".join(_SEPARATORS.sub(" ", normalize(sp.get(field) or "")).split())
+        if not text:
+            continue
+        if len(text) <= SHINGLE:
+            found.add(f"{tag}{text}")
+        else:
+            found.update(f"{tag}{text[i:i + SHINGLE]}" for i in range(len(text) - SHINGLE + 1))
+    return found
+
+
+def _hash64(shingle: str) -> int:
+    # crc32 is deterministic across processes (unlike hash()); the
+    # splitmix64 finalizer spreads it over 64 bits
+    x = zlib.crc32(shingle.encode("utf-8")) * 0x9E3779B97F4A7C15 & _MASK64
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & _MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & _MASK64
+    return x ^ (x >> 31)
+
+
+def signature(shingle_set):
+    """MinHash signature of a shingle set (array of NUM_PERM uint32), or None if empty.
+
+    One-permutation hashing: each shingle is hashed once, its top bits pick
+    a bin and the bin keeps the minimum. Empty bins borrow from the next
+    non-empty bin (rotation densification), so P(bin i agrees) is the
+    Jaccard similarity as with NUM_PERM independent permutations, at the
+    cost of one hash per shingle.
+    """
+    if not shingle_set:
+        return None
+    bins = [_EMPTY] * NUM_PERM
+    for s in shingle_set:
+        h = _hash64(s)
+        b = h >> _BIN_SHIFT
+        if h < bins[b]:
+            bins[b] = h
+
+    sig = array("I", bytes(4 * NUM_PERM))
+    for i in range(NUM_PERM):
+        t = 0
+        while bins[(i + t) % NUM_PERM] == _EMPTY:
+            t += 1
+        # the offset keeps a borrowed value distinct from the original bin's
+        sig[i] = (bins[(i + t) % NUM_PERM] + t * 0x9E3779B1) & 0xFFFFFFFF
+    return sig
+
+
+def similarity(a, b) -> float:
+    # estimated Jaccard similarity: share of agreeing bins
+    return sum(map(operator.eq, a, b)) / NUM_PERM
+
+
+@lru_cache(maxsize=None)
+def lsh_params(threshold: float, num_perm: int = NUM_PERM):
+    """(bands, rows) whose S-curve 1 - (1 - s^rows)^bands best separates at threshold.
+
+    Minimizes the area of false positives below the threshold plus false
+    negatives above it, like the datasketch heuristic.
+    """
+    def area(f, lo, hi, steps=100):
+        step = (hi - lo) / steps
+        return sum(f(lo + (i + 0.5) * step) for i in range(steps)) * step
+
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            fp = area(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+            fn = area(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+            if best is None or fp + fn < best[0]:
+                best = (fp + fn, bands, rows)
+    return best[1], best[2]
+
+
+def _load_cache(path) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (TypeError, FileNotFoundError, ValueError):
+        return {}
+    params = [PARALLELS_VERSION, NUM_PERM, SHINGLE, list(FIELDS)]
+    if not isinstance(data, dict) or data.get("params") != params:
+        return {}
+    return data.get("signatures") or {}
+
+
+def _save_cache(path, signatures) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {"params": [PARALLELS_VERSION, NUM_PERM, SHINGLE, list(FIELDS)], "signatures": signatures},
+            f, sort_keys=True, separators=(",", ":"),
+        )
+    tmp.replace(path)
+
+
+def _signatures(spells, cache_path, store=None):
+    # spell id -> signature; unchanged records (same digest) reuse the cached one
+    cached = _load_cache(cache_path) if cache_path is not None else {}
+    sigs = {}
+    entries = {}
+    signed = 0
+    for sp in spells:
+        if store is not None:
+            sp = store.spell(sp["id"])  # index records lack the text columns
+        digest = sp.digest()
+        hit = cached.get(sp["id"])
+        if hit is not None and hit[0] == digest:
+            encoded = hit[1]
+            sig = array("I", base64.b64decode(encoded)) if encoded else None
+        else:
+            sig = signature(shingles(sp))
+            encoded = base64.b64encode(sig.tobytes()).decode("ascii") if sig is not None else ""
+            signed += 1
+        entries[sp["id"]] = [digest, encoded]
+        if sig is not None:
+            sigs[sp["id"]] = sig
+    if cache_path is not None:
+        _save_cache(cache_path, entries)
+    return sigs, signed
+
+
+def find_parallels(ctx, cache_path=None, threshold: float = DEFAULT_THRESHOLD):
+    """Near-duplicate spells across manuscripts, by MinHash + LSH banding.
+
+    Spells with the same signature form one node; signatures are cut into
+    bands and nodes sharing any band become candidates, which are kept if
+    their estimated similarity reaches ``threshold``. Work is linear in
+    the number of spells plus the candidates, instead of all pairs.
+    Signatures are cached in ``cache_path`` by record digest, so only
+    changed spells are re-signed.
+
+    Returns {"by_spell": {spell id: (rows, total)}, "clusters": [[spell id,
+    ...], ...], "stats": {...}}; rows are the parallels shown on the spell
+    page, in other manuscripts only.
+    """
+    idx = ctx["idx"]
+    spell_by_id = idx["spell_by_id"]
+    ms_by_id = idx["manuscript_by_id"]
+    # canonical records in spells-index order, for stable output
+    spells = [sp for key, sp in idx["spells_sorted"] if spell_by_id[key.id] is sp]
+    rank = {sp["id"]: i for i, sp in enumerate(spells)}
+
+    sigs, signed = _signatures(spells, cache_path, ctx.get("store"))
+
+    node_of = {}  # signature bytes -> node
+    members = []  # node -> spell ids, in rank order
+    node_sigs = []
+    for sid, sig in sigs.items():
+        key = sig.tobytes()
+        n = node_of.get(key)
+        if n is None:
+            n = node_of[key] = len(members)
+            members.append([])
+            # tuples compare faster than arrays (no int boxing per element)
+            node_sigs.append(tuple(sig))
+        members[n].append(sid)
+
+    bands, rows = lsh_params(threshold)
+    width = 4 * rows
+    candidates = set()
+    for band in range(bands):
+        buckets = {}
+        for key, n in node_of.items():
+            buckets.setdefault(key[band * width:(band + 1) * width], []).append(n)
+        for nodes in buckets.values():
+            for i, a in enumerate(nodes):
+                for b in nodes[i + 1:]:
+                    candidates.add((a, b) if a < b else (b, a))
+
+    neighbors = {}
+    for a, b in candidates:
+        s = similarity(node_sigs[a], node_sigs[b])
+        if s >= threshold:
+            neighbors.setdefault(a, []).append((b, s))
+            neighbors.setdefault(b, []).append((a, s))
+
+    def ms_of(sid):
+        return spell_by_id[sid].get("manuscript_id")
+
+    def row(sid, s):
+        sp = spell_by_id[sid]
+        mid = ms_of(sid)
+        return {
+            "spell_id": sid,
+            "title": spell_title(sp),
+            "manuscript_id": mid,
+            "siglum": (ms_by_id.get(mid) or {}).get("siglum") or "",
+            "page": sp.get("page") or "",
+            "similarity": round(s * 100),
+        }
+
+    # per node and manuscript, so large groups of identical texts stay linear
+    ms_counts = [Counter(ms_of(sid) for sid in ids) for ids in members]
+
+    by_spell = {}
+    for n, ids in enumerate(members):
+        near = [(1.0, n)] + sorted(
+            ((s, m) for m, s in neighbors.get(n, ())), key=lambda e: (-e[0], rank[members[e[1]][0]])
+        )
+        for sid in ids:
+            mid = ms_of(sid)
+            shown = []
+            total = 0
+            for s, m in near:
+                total += len(members[m]) - ms_counts[m][mid]
+                for other in members[m]:
+                    if len(shown) == MAX_PARALLELS:
+                        break
+                    if ms_of(other) != mid:
+                        shown.append(row(other, s))
+            if total:
+                by_spell[sid] = (shown, total)
+
+    # connected components over identical signatures and verified pairs
+    parent = list(range(len(members)))
+
+    def find(n):
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    for a, near in neighbors.items():
+        for b, _ in near:
+            parent[find(a)] = find(b)
+
+    components = {}
+    for n, ids in enumerate(members):
+        components.setdefault(find(n), []).extend(ids)
+    clusters = []
+    for ids in components.values():
+        if len({ms_of(sid) for sid in ids}) > 1:
+            clusters.append(sorted(ids, key=rank.__getitem__))
+    clusters.sort(key=lambda ids: (-len(ids), rank[ids[0]]))
+
+    stats = {
+        "spells": len(spells),
+        "signed": signed,
+        "bands": bands,
+        "rows": rows,
+        "candidates": len(candidates),
+        "pairs": sum(len(v) for v in neighbors.values()) // 2,
+        "clusters": len(clusters),
+        "with_parallels": len(by_spell),
+    }
+    return {"by_spell": by_spell, "clusters": clusters, "threshold": threshold, "stats": stats}
+
+
+def build_parallels_export(out, ctx, parallels) -> None:
+    """Write parallels/clusters.json: every cluster of parallel texts spanning manuscripts."""
+    idx = ctx["idx"]
+    spell_by_id = idx["spell_by_id"]
+    ms_by_id = idx["manuscript_by_id"]
+    stats = parallels["stats"]
+
+    clusters = []
+    for n, ids in enumerate(parallels["clusters"]):
+        spells = []
+        for sid in ids:
+            sp = spell_by_id[sid]
+            mid = sp.get("manuscript_id")
+            spells.append({
+                "id": sid,
+                "title": spell_title(sp),
+                "manuscript_id": mid,
+                "siglum": (ms_by_id.get(mid) or {}).get("siglum") or "",
+                "page": sp.get("page") or "",
+            })
+        clusters.append({
+            "id": n + 1,
+            "size": len(spells),
+            "manuscripts": len({s["manuscript_id"] for s in spells}),
+            "spells": spells,
+        })
+
+    out.write("parallels/clusters.json", json.dumps({
+        "version": PARALLELS_VERSION,
+        "threshold": parallels["threshold"],
+        "num_perm": NUM_PERM,
+        "shingle": SHINGLE,
+        "fields": list(FIELDS),
+        "bands": stats["bands"],
+        "rows": stats["rows"],
+        "clusters": clusters,
+    }, ensure_ascii=False, separators=(",", ":")))
+
+
+def format_parallels_report(stats) -> str:
+    return (
+        f"Parallels: {stats['signed']} of {stats['spells']} spells signed; "
+        f"LSH {stats['bands']}x{stats['rows']}, {stats['candidates']} candidates, {stats['pairs']} pairs; "
+        f"{stats['with_parallels']} spells with parallels in {stats['clusters']} clusters"
+    )
@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".svg", ".xml", ".txt")
+
+# files per pool task
+CHUNK = 256
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    # mtime=0 keeps the .gz byte-identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _compress_chunk(out, rels, previous):
+    hashes = {}
+    sizes = {}
+    for rel in rels:
+        data = out.backend.read(rel)
+        digest = hashlib.sha256(data).hexdigest()
+        hashes[rel] = digest
+
+        gz_rel = rel + ".gz"
+        if previous.get(rel) == digest and out.backend.exists(gz_rel):
+            out.keep(gz_rel)
+            gz_len = out.backend.size(gz_rel)
+        else:
+            gz = gzip_bytes(data)
+            out.write(gz_rel, gz)
+            gz_len = len(gz)
+
+        stat = sizes.setdefault(Path(rel).suffix, [0, 0, 0])
+        stat[0] += 1
+        stat[1] += len(data)
+        stat[2] += gz_len
+
+    return out.state(), hashes, sizes
+
+
+def precompress(out, state_path: Path, jobs: int = 1):
+    """Write a max-compression .gz sibling for every compressible output.
+
+    Files whose content hash matches the previous build (and whose .gz still
+    exists) are not recompressed. Returns {suffix: [files, bytes, gz bytes]}.
+    """
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    rels = sorted(r for r in out.seen if r.endswith(COMPRESSIBLE))
+    chunks = [rels[i:i + CHUNK] for i in range(0, len(rels), CHUNK)]
+
+    def prev_of(chunk):
+        return {r: previous[r] for r in chunk if r in previous}
+
+    results = None
+    if jobs > 1 and len(chunks) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(_compress_chunk, out.fork(), chunk, prev_of(chunk)) for chunk in chunks]
+                results = [fut.result() for fut in futures]
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"WARNING: parallel compression unavailable ({e}), falling back to serial")
+
+    if results is None:
+        results = [_compress_chunk(out.fork(), chunk, prev_of(chunk)) for chunk in chunks]
+
+    hashes = {}
+    sizes = {}
+    for out_state, chunk_hashes, chunk_sizes in results:
+        out.merge(*out_state)
+        hashes.update(chunk_hashes)
+        for suffix, (n, raw, gz) in chunk_sizes.items():
+            stat = sizes.setdefault(suffix, [0, 0, 0])
+            stat[0] += n
+            stat[1] += raw
+            stat[2] += gz
+
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump(hashes, f, sort_keys=True)
+
+    return sizes
+
+
+def format_size_report(title, sizes, labels):
+    lines = [title]
+    for suffix in sorted(sizes):
+        n, before, after = sizes[suffix]
+        saved = (1 - after / before) * 100 if before else 0.0
+        lines.append(
+            f"  {suffix:<6} {n:>6} files  {before / 1024:>10.1f} KiB {labels[0]}"
+            f"  -> {after / 1024:>10.1f} KiB {labels[1]}  (-{saved:.1f}%)"
+        )
+    return "\n".join(lines)
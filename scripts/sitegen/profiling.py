@@ -0,0 +1,161 @@
+import heapq
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class PageStats:
+    """Per-template render time/bytes plus the N slowest pages.
+
+    Lives on the SiteWriter (``out.profile``) so it follows the writer into
+    worker processes and is merged back with it.
+    """
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.templates = {}  # name -> [pages, seconds, bytes]
+        self.slowest = []    # min-heap of (seconds, rel, template, bytes)
+
+    def record(self, template, rel, seconds, nbytes):
+        stat = self.templates.setdefault(template, [0, 0.0, 0])
+        stat[0] += 1
+        stat[1] += seconds
+        stat[2] += nbytes
+
+        item = (seconds, rel, template, nbytes)
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, item)
+        elif self.slowest and item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def fork(self):
+        return PageStats(self.top)
+
+    def merge(self, other) -> None:
+        for name, (n, secs, nbytes) in other.templates.items():
+            stat = self.templates.setdefault(name, [0, 0.0, 0])
+            stat[0] += n
+            stat[1] += secs
+            stat[2] += nbytes
+        self.slowest = heapq.nlargest(self.top, self.slowest + other.slowest)
+        heapq.heapify(self.slowest)
+
+
+def _max_rss_bytes():
+    # peak RSS of the whole process so far (None where getrusage is missing)
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _cpu_seconds() -> float:
+    # includes reaped worker processes (process pools, --jobs)
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class Profiler:
+    """Wall time, CPU time and peak memory per build stage.
+
+    ``peak_py_bytes`` is the stage's own tracemalloc peak. RSS can only be
+    read as the process high-water mark: ``max_rss_bytes`` is that mark at
+    the end of the stage, ``rss_growth_bytes`` how much the stage raised it.
+
+    Disabled profilers hand out ``nullcontext`` so the instrumented build
+    pays for one attribute check per stage.
+    """
+
+    def __init__(self, enabled: bool = False, top: int = 10):
+        self.enabled = enabled
+        # prepended to stage names (the corpus of a multi-corpus build)
+        self.prefix = ""
+        self.stages = []
+        self.pages = PageStats(top) if enabled else None
+        self._t0 = time.perf_counter()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name):
+        name = self.prefix + name
+        tracemalloc.reset_peak()
+        wall0 = time.perf_counter()
+        cpu0 = _cpu_seconds()
+        rss0 = _max_rss_bytes()
+        try:
+            yield
+        finally:
+            rss = _max_rss_bytes()
+            self.stages.append({
+                "stage": name,
+                "wall_s": round(time.perf_counter() - wall0, 6),
+                "cpu_s": round(_cpu_seconds() - cpu0, 6),
+                "peak_py_bytes": tracemalloc.get_traced_memory()[1],
+                "max_rss_bytes": rss,
+                "rss_growth_bytes": None if rss is None else rss - rss0,
+            })
+
+    def report(self) -> dict:
+        templates = {
+            name: {"pages": n, "render_s": round(secs, 6), "bytes": nbytes}
+            for name, (n, secs, nbytes) in sorted(self.pages.templates.items())
+        }
+        slowest = [
+            {"page": rel, "template": tpl, "render_s": round(secs, 6), "bytes": nbytes}
+            for secs, rel, tpl, nbytes in sorted(self.pages.slowest, reverse=True)
+        ]
+        return {
+            "total_wall_s": round(time.perf_counter() - self._t0, 6),
+            "stages": self.stages,
+            "templates": templates,
+            "slowest_pages": slowest,
+        }
+
+    def write(self, path: Path) -> dict:
+        data = self.report()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return data
+
+
+def _mib(value) -> str:
+    return "-" if value is None else f"{value / 2**20:.1f}"
+
+
+def format_profile(data) -> str:
+    lines = [f"Profile (total {data['total_wall_s']:.2f}s wall)"]
+    lines.append(
+        f"  {'stage':<34} {'wall s':>9} {'cpu s':>9} {'peak py MiB':>12} {'rss +MiB':>9} {'proc peak MiB':>14}"
+    )
+    for s in data["stages"]:
+        lines.append(
+            f"  {s['stage']:<34} {s['wall_s']:>9.3f} {s['cpu_s']:>9.3f} {_mib(s['peak_py_bytes']):>12} "
+            f"{_mib(s.get('rss_growth_bytes')):>9} {_mib(s['max_rss_bytes']):>14}"
+        )
+
+    lines.append(f"  {'template':<34} {'pages':>9} {'render s':>9} {'KiB out':>12}")
+    for name, t in data["templates"].items():
+        lines.append(f"  {name:<34} {t['pages']:>9} {t['render_s']:>9.3f} {t['bytes'] / 1024:>12.1f}")
+
+    if data["slowest_pages"]:
+        lines.append("  slowest pages:")
+        for p in data["slowest_pages"]:
+            lines.append(f"    {p['render_s'] * 1000:8.2f} ms  {p['bytes'] / 1024:8.1f} KiB  {p['page']}")
+    return "\n".join(lines)
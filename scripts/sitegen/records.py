@@ -0,0 +1,149 @@
+import hashlib
+import json
+import sys
+from collections.abc import Mapping
+
+# values that repeat across rows (foreign keys, controlled vocabularies);
+# interned so every row points at one string object
+INTERNED = {
+    "manuscripts": ("id", "location", "date", "format"),
+    "spells": ("id", "manuscript_id", "scribe", "page"),
+    "categories": ("id", "parent_id"),
+    "spell_categories": ("spell_id", "category_id"),
+}
+
+
+class Record(Mapping):
+    """Read-only row: a shared key layout plus a tuple of values.
+
+    Behaves like the dict it was built from (``row["id"]``, ``row.get``,
+    iteration, ``dict(row)``) and Jinja's ``row.field`` lookup falls back to
+    item access, so templates do not need to know the difference. Rows with
+    the same columns share one ``_shape``; a row costs one small object and
+    one tuple instead of a dict.
+    """
+
+    __slots__ = ("_shape", "_values", "_digest")
+
+    def __init__(self, shape, values):
+        self._shape = shape  # (keys tuple, {key: position})
+        self._values = values
+        self._digest = None
+
+    def __getitem__(self, key):
+        return self._values[self._shape[1][key]]
+
+    def get(self, key, default=None):
+        pos = self._shape[1].get(key)
+        return default if pos is None else self._values[pos]
+
+    def __contains__(self, key):
+        return key in self._shape[1]
+
+    def __iter__(self):
+        return iter(self._shape[0])
+
+    def __len__(self):
+        return len(self._values)
+
+    def as_dict(self) -> dict:
+        # C-speed equivalent of dict(record)
+        return dict(zip(self._shape[0], self._values))
+
+    def digest(self) -> str:
+        # content hash, computed once per record (used by the build manifest)
+        if self._digest is None:
+            data = json.dumps(self.as_dict(), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+            self._digest = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        return self._digest
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+    def __reduce__(self):
+        # shapes and interned strings stay shared within one pickle
+        return type(self), (self._shape, self._values)
+
+
+class Manuscript(Record):
+    __slots__ = ()
+
+
+class Spell(Record):
+    __slots__ = ()
+
+
+class Category(Record):
+    __slots__ = ()
+
+
+class SpellCategory(Record):
+    __slots__ = ()
+
+
+RECORD_TYPES = {
+    "manuscripts": Manuscript,
+    "spells": Spell,
+    "categories": Category,
+    "spell_categories": SpellCategory,
+}
+
+
+def _layout(keys, interned):
+    keys = tuple(sys.intern(k) if type(k) is str else k for k in keys)
+    shape = (keys, {k: i for i, k in enumerate(keys)})
+    return shape, [i for i, k in enumerate(keys) if k in interned]
+
+
+def _make(cls, shape, positions, values):
+    intern = sys.intern
+    values = list(values)
+    for i in positions:
+        v = values[i]
+        if type(v) is str:
+            values[i] = intern(v)
+    return cls(shape, tuple(values))
+
+
+def record_hook(table: str):
+    """json ``object_hook`` turning each row into a compact record as it is parsed."""
+    cls = RECORD_TYPES[table]
+    interned = frozenset(INTERNED[table])
+    layouts = {}
+    intern = sys.intern
+
+    def hook(obj):
+        # inlined _make: this runs once per row of every table
+        keys = tuple(obj)
+        layout = layouts.get(keys)
+        if layout is None:
+            layout = layouts[keys] = _layout(keys, interned)
+        shape, positions = layout
+
+        values = list(obj.values())
+        for i in positions:
+            v = values[i]
+            if type(v) is str:
+                values[i] = intern(v)
+        return cls(shape, tuple(values))
+
+    return hook
+
+
+def reuse_records(old_rows, new_rows):
+    """new_rows with every record equal to one in old_rows replaced by the old object.
+
+    Keeps cached digests (and the memory) of unchanged rows across reloads.
+    """
+    pool = {(r._shape[0], r._values): r for r in old_rows if isinstance(r, Record)}
+    return [
+        pool.get((r._shape[0], r._values), r) if isinstance(r, Record) else r
+        for r in new_rows
+    ]
+
+
+def record_factory(table: str, keys):
+    """Record constructor for rows that all have the columns ``keys`` (query results)."""
+    cls = RECORD_TYPES[table]
+    shape, positions = _layout(keys, frozenset(INTERNED[table]))
+    return lambda values: _make(cls, shape, positions, values)
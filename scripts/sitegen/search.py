@@ -0,0 +1,111 @@
+import json
+import re
+import unicodedata
+
+# tokens are grouped into shards by their first PREFIX_LEN characters;
+# the client fetches only the shards its query tokens fall into
+PREFIX_LEN = 2
+# documents are shipped in fixed-size chunks by ordinal
+DOC_CHUNK = 500
+
+SPELL_FIELDS = ("title_en", "title_syr", "translation")
+MANUSCRIPT_FIELDS = ("title", "siglum", "location")
+
+_TOKEN = re.compile(r"\w+")
+# Syriac punctuation/abbreviation mark and the Arabic tatweel used as a
+# letter stretcher in Syriac text
+_SYRIAC_STRIP = dict.fromkeys(map(ord, "܏ـ"), None)
+
+
+def normalize(text: str) -> str:
+    # drop vowel points / diacritics (Syriac U+0730..U+074A are all Mn)
+    text = unicodedata.normalize("NFD", text or "")
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    # lower(), not casefold(): search.js folds queries with toLowerCase()
+    return unicodedata.normalize("NFC", text).translate(_SYRIAC_STRIP).lower()
+
+
+def tokenize(text: str):
+    return [t for t in _TOKEN.findall(normalize(text)) if t != "_"]
+
+
+def shard_key(token: str) -> str:
+    # filename-safe and trivially reproducible in JS (codePointAt)
+    return "-".join(format(ord(ch), "x") for ch in token[:PREFIX_LEN])
+
+
+def _dump(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def build_search_index(out, manuscripts, spells, manuscript_by_id):
+    """Write search/meta.json, search/s/<prefix>.json and search/d/<n>.json.
+
+    Returns a dict with size statistics for the build log.
+    """
+    docs = []
+    postings = {}
+
+    def add(doc, texts):
+        ordinal = len(docs)
+        docs.append(doc)
+        for tok in {t for text in texts for t in tokenize(text) if len(t) >= PREFIX_LEN}:
+            postings.setdefault(tok, []).append(ordinal)
+
+    for ms in manuscripts:
+        add(["m", ms["id"], ms.get("title") or "", ms.get("siglum") or ""],
+            [ms.get(f) for f in MANUSCRIPT_FIELDS])
+
+    for sp in spells:
+        ms = manuscript_by_id.get(sp.get("manuscript_id"), {})
+        where = " ".join(x for x in (ms.get("siglum"), sp.get("page")) if x)
+        add(["s", sp["id"], sp.get("title_en") or "Untitled", where],
+            [sp.get(f) for f in SPELL_FIELDS])
+
+    shards = {}
+    for tok, ords in postings.items():
+        shards.setdefault(shard_key(tok), {})[tok] = ords
+
+    shard_sizes = []
+    for key in sorted(shards):
+        data = _dump(shards[key])
+        out.write(f"search/s/{key}.json", data)
+        shard_sizes.append(len(data.encode("utf-8")))
+
+    chunk_sizes = []
+    for n, start in enumerate(range(0, len(docs), DOC_CHUNK)):
+        data = _dump(docs[start:start + DOC_CHUNK])
+        out.write(f"search/d/{n}.json", data)
+        chunk_sizes.append(len(data.encode("utf-8")))
+
+    meta = _dump({
+        "prefix_len": PREFIX_LEN,
+        "doc_chunk": DOC_CHUNK,
+        "docs": len(docs),
+        "shards": sorted(shards),
+    })
+    out.write("search/meta.json", meta)
+    meta_size = len(meta.encode("utf-8"))
+
+    shard_sizes.sort()
+    avg_shard = sum(shard_sizes) / len(shard_sizes) if shard_sizes else 0
+    max_shard = shard_sizes[-1] if shard_sizes else 0
+    max_chunk = max(chunk_sizes, default=0)
+
+    return {
+        "docs": len(docs),
+        "tokens": len(postings),
+        "shards": len(shard_sizes),
+        "total_bytes": meta_size + sum(shard_sizes) + sum(chunk_sizes),
+        # one-word query: meta + one shard + one doc chunk for the first results
+        "query_bytes_avg": int(meta_size + avg_shard + max_chunk),
+        "query_bytes_max": meta_size + max_shard + max_chunk,
+    }
+
+
+def format_search_report(stats) -> str:
+    return (
+        f"Search index: {stats['docs']} docs, {stats['tokens']} tokens in {stats['shards']} shards, "
+        f"{stats['total_bytes'] / 1024:.1f} KiB total; per-query fetch "
+        f"~{stats['query_bytes_avg'] / 1024:.1f} KiB avg, {stats['query_bytes_max'] / 1024:.1f} KiB max"
+    )
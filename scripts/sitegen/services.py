@@ -1,25 +1,66 @@
 import html
-from functools import lru_cache
-from templating import root
-
-def build_category_graph(categories):
-    category_by_id = {c["id"]: c for c in categories}
-
-    children_by_parent = {}
-    for c in categories:
-        parent = (c.get("parent_id") or "").strip() or None
-        children_by_parent.setdefault(parent, []).append(c)
-
-    # --- UX: sort category children by name ---
-    for pid, kids in children_by_parent.items():
-        kids.sort(key=lambda c: (
-            (c.get("name") or "").lower(),
-            c.get("id") or "",
-        ))
-
-    def category_ancestors(cat_id):
+from sitegen.sortkeys import name_key
+
+def _parent_id(c):
+    return (c.get("parent_id") or "").strip() or None
+
+
+class CategoryTree:
+    """Category taxonomy, precomputed once per build.
+
+    - ``children_by_parent``: children sorted by name (None = roots)
+    - ``ancestors(cid)``: root-to-category path along the precomputed
+      depth-first tree (no cycle guards needed at query time)
+    - ``is_ancestor(a, b)``: O(1) via depth-first enter/exit intervals
+    - ``spell_count(cid)``: distinct spells in the whole subtree (a spell
+      tagged in both a parent and a child is counted once)
+    - ``cycles``: parent_id cycles, each as a list of ids
+    """
+
+    def __init__(self, categories, spell_ids_by_cat_id=None):
+        self.category_by_id = {c["id"]: c for c in categories}
+        self.parent_of = {c["id"]: _parent_id(c) for c in categories}
+
+        self.children_by_parent = {}
+        for c in categories:
+            self.children_by_parent.setdefault(_parent_id(c), []).append(c)
+
+        # --- UX: sort category children by name ---
+        for kids in self.children_by_parent.values():
+            kids.sort(key=lambda c: name_key(c, "name"))
+
+        self.cycles = self._find_cycles()
+        self._index(spell_ids_by_cat_id or {})
+
+    def _find_cycles(self):
+        cycles = []
+        done = set()
+        for start in self.parent_of:
+            if start in done:
+                continue
+
+            path = []
+            pos = {}  # cat_id -> index in path
+            cur = start
+
+            while cur:
+                if cur in pos:
+                    cycles.append(path[pos[cur]:] + [cur])
+                    break
+                if cur in done:
+                    break
+
+                pos[cur] = len(path)
+                path.append(cur)
+                cur = self.parent_of.get(cur)
+
+            done.update(path)
+        return cycles
+
+    def _walk_ancestors(self, cat_id):
+        # plain parent walk; only used for categories hanging off a cycle
         chain = []
-        current = category_by_id.get(cat_id)
+        current = self.category_by_id.get(cat_id)
         seen = set()
 
         while current:
@@ -29,30 +70,96 @@ def build_category_graph(categories):
             seen.add(cid)
 
             chain.append(current)
-            pid = (current.get("parent_id") or "").strip() or None
-            current = category_by_id.get(pid)
-
-        return list(reversed(chain))
+            current = self.category_by_id.get(_parent_id(current))
+
+        return tuple(reversed(chain))
+
+    def _index(self, spell_ids_by_cat_id):
+        self.order = []
+        self.tin = {}
+        self.tout = {}
+        self.depth = {}
+        self._up = {}            # DFS-tree parent, None for roots
+        self._cycle_paths = {}   # categories only reachable through a cycle
+        self._counts = {}
+
+        # true roots first (no parent / missing parent), then whatever is
+        # only reachable through a cycle
+        starts = [c["id"] for c in self.children_by_parent.get(None, [])]
+        starts += [
+            cid for cid, pid in self.parent_of.items()
+            if pid is not None and pid not in self.category_by_id
+        ]
+        starts += list(self.category_by_id)
+
+        for start in starts:
+            if start in self.tin:
+                continue
+            via_cycle = self.parent_of.get(start) in self.category_by_id
+
+            # iterative DFS: deep taxonomies must not hit the recursion limit.
+            # Distinct spells per subtree are merged small-to-large, so the
+            # whole pass is O(links * log links) however deep or wide.
+            subtree_spells = {}
+            stack = [(start, None, False)]
+            while stack:
+                cid, parent, leaving = stack.pop()
+                if leaving:
+                    self.tout[cid] = len(self.order)
+                    spells = subtree_spells.pop(cid)
+                    self._counts[cid] = len(spells)
+                    if parent is not None:
+                        into = subtree_spells[parent]
+                        if len(into) < len(spells):
+                            into, spells = spells, into
+                            subtree_spells[parent] = into
+                        into |= spells
+                    continue
+                if cid in self.tin:
+                    continue
+
+                self.tin[cid] = len(self.order)
+                self.order.append(cid)
+                self._up[cid] = parent
+                self.depth[cid] = 0 if parent is None else self.depth[parent] + 1
+                subtree_spells[cid] = set(spell_ids_by_cat_id.get(cid, ()))
+                if via_cycle:
+                    self._cycle_paths[cid] = self._walk_ancestors(cid)
+
+                stack.append((cid, parent, True))
+                for child in reversed(self.children_by_parent.get(cid, [])):
+                    if child["id"] not in self.tin:
+                        stack.append((child["id"], cid, False))
+
+    def ancestors(self, cat_id):
+        # root-to-category path; cost is the length of the answer
+        if cat_id in self._cycle_paths:
+            return list(self._cycle_paths[cat_id])
 
-    return category_by_id, children_by_parent, category_ancestors
+        chain = []
+        while cat_id is not None and cat_id in self._up:
+            chain.append(self.category_by_id[cat_id])
+            cat_id = self._up[cat_id]
+        chain.reverse()
+        return chain
 
+    def is_ancestor(self, a, b) -> bool:
+        # True if a == b or a is above b
+        if a not in self.tin or b not in self.tin:
+            return False
+        return self.tin[a] <= self.tin[b] < self.tout[a]
 
-def make_total_spell_count(children_by_parent, spell_count_by_category):
-    @lru_cache(None)
-    def total_spell_count(cat_id):
-        total = spell_count_by_category.get(cat_id, 0)
-        for child in children_by_parent.get(cat_id, []):
-            total += total_spell_count(child["id"])
-        return total
+    def subtree(self, cat_id):
+        if cat_id not in self.tin:
+            return []
+        return self.order[self.tin[cat_id]:self.tout[cat_id]]
 
-    return total_spell_count
+    def spell_count(self, cat_id) -> int:
+        return self._counts.get(cat_id, 0)
 
 
-def render_breadcrumbs(items):
-    # items: list[tuple[label, href_or_None]]
+def _crumbs(items, last_i, root):
     parts = []
-    last_i = len(items) - 1
-
     for i, (label, href) in enumerate(items):
         label_esc = html.escape(str(label or ""))
 
@@ -60,10 +167,21 @@ def render_breadcrumbs(items):
             parts.append(f'<li class="bc-item"><a class="bc-link" href="{root(href)}">{label_esc}</a></li>')
         else:
             parts.append(f'<li class="bc-item bc-current" aria-current="page">{label_esc}</li>')
+    return "".join(parts)
+
+
+def render_breadcrumbs(items, root, fragments=None):
+    # items: list[tuple[label, href_or_None]]; root: the env's root() (templating.root_url)
+    # the shared prefix (Home / Spells / parent categories) is a cached fragment
+    head = tuple(items[:-1])
+    if fragments is not None:
+        prefix = fragments.get("crumbs", head, lambda: _crumbs(head, len(items) - 1, root))
+    else:
+        prefix = _crumbs(head, len(items) - 1, root)
 
     return (
         '<nav class="breadcrumbs" aria-label="Breadcrumb">'
         '<ol class="bc-list">'
-        + "".join(parts) +
+        + prefix + _crumbs(items[-1:], 0, root) +
         '</ol></nav>'
     )
\ No newline at end of file
@@ -0,0 +1,66 @@
+import re
+from typing import NamedTuple
+
+# first folio number in a page reference, with its side and column:
+# "fol. 12v", "12 r", "ff. 3rb-4v", "p. 7"
+_FOLIO = re.compile(r"(\d+)\s*([rv])?\s*([ab])?(?![a-z])")
+# unsided folio/page number, then recto, then verso
+_SIDES = {"": 0, "r": 1, "v": 2}
+
+
+def text_key(value) -> str:
+    # case- and whitespace-insensitive
+    return " ".join(str(value or "").split()).lower()
+
+
+def page_key(page):
+    """Folio-aware key: "fol. 2v" < "fol. 10r" < "fol. 10v" < "fol. 11r".
+
+    References without a number ("?", "flyleaf") sort after numbered ones.
+    """
+    text = text_key(page)
+    m = _FOLIO.search(text)
+    if m is None:
+        return (1, 0, 0, "", text)
+    return (0, int(m.group(1)), _SIDES[m.group(2) or ""], m.group(3) or "", text)
+
+
+def spell_title(sp) -> str:
+    return (sp.get("title_en") or "Untitled").strip() or "Untitled"
+
+
+class SpellKey(NamedTuple):
+    title: str  # text_key of the displayed title
+    siglum: str
+    page: tuple  # page_key
+    id: str
+
+
+def spell_keys(spells, manuscript_by_id):
+    """[(SpellKey, spell), ...] in the order of ``spells``.
+
+    Siglum and page keys are computed once per distinct value: both repeat
+    across thousands of spells in a large corpus.
+    """
+    sigla = {}
+    pages = {}
+    keyed = []
+    for sp in spells:
+        mid = sp.get("manuscript_id")
+        siglum = sigla.get(mid)
+        if siglum is None:
+            ms = manuscript_by_id.get(mid) or {}
+            siglum = sigla[mid] = text_key(ms.get("siglum"))
+
+        page = str(sp.get("page") or "")
+        pk = pages.get(page)
+        if pk is None:
+            pk = pages[page] = page_key(page)
+
+        keyed.append((SpellKey(text_key(spell_title(sp)), siglum, pk, sp.get("id") or ""), sp))
+    return keyed
+
+
+def name_key(row, field: str):
+    # manuscripts by title, categories by name; the id breaks ties
+    return (text_key(row.get(field)), row.get("id") or "")
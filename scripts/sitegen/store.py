@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+from sitegen.records import record_factory
+
+TABLES = ("manuscripts", "spells", "categories", "spell_categories")
+
+# rows fetched per round trip while streaming
+BATCH = 1000
+# long text left in the database by load_index_tables; nothing that lists,
+# sorts or indexes records needs it
+TEXT_COLUMNS = {"spells": ("title_syr", "translation")}
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class CorpusStore:
+    """Read-only query layer over the database written by ``build_data.py --sqlite``.
+
+    Rows come back as the same compact records ``data_loader`` produces,
+    in sheet order, and are streamed from the cursor, so callers that only
+    need part of the corpus never load the rest. ``load_index_tables`` is
+    what ``build_site.py --sqlite`` keeps in memory: every table except the
+    long text columns (``TEXT_COLUMNS``), which the pages that show them
+    fetch per record (``spell``) or stream (``spells``). A store pickles as
+    its path, and every process opens its own connection.
+    """
+
+    def __init__(self, path: Path):
+        if not Path(path).exists():
+            raise FileNotFoundError(f"No corpus database at {path} (run build_data.py --sqlite)")
+        self.path = Path(path)
+        self._db = None
+        self._pid = None
+        self._columns = {}
+        for table, name in self.db.execute("SELECT table_name, name FROM columns ORDER BY table_name, position"):
+            self._columns.setdefault(table, []).append(name)
+        self._factories = {}
+
+    @property
+    def db(self):
+        # connections must not cross a fork: a worker opens its own
+        if self._pid != os.getpid():
+            self._db = sqlite3.connect(f"file:{self.path.resolve().as_posix()}?mode=ro", uri=True)
+            self._pid = os.getpid()
+        return self._db
+
+    def __reduce__(self):
+        return type(self), (self.path,)
+
+    def close(self) -> None:
+        if self._db is not None and self._pid == os.getpid():
+            self._db.close()
+        self._db = None
+        self._pid = None
+
+    def columns(self, table: str):
+        return list(self._columns.get(table, ()))
+
+    def query(self, sql: str, params=()):
+        """Ad-hoc SQL; yields plain tuples."""
+        cur = self.db.execute(sql, params)
+        while True:
+            batch = cur.fetchmany(BATCH)
+            if not batch:
+                return
+            yield from batch
+
+    def rows(self, table: str, where: str = "", params=(), order: str = "_row", columns=None):
+        """Stream records of one table (``where``/``order`` are SQL fragments).
+
+        ``columns`` limits the records to those columns (in table order);
+        by default they have every column, as in the JSON export.
+        """
+        all_columns = self._columns.get(table)
+        if all_columns is None:
+            raise KeyError(f"Unknown table: {table}")
+        if columns is not None:
+            columns = tuple(c for c in all_columns if c in columns)
+        else:
+            columns = tuple(all_columns)
+
+        make = self._factories.get((table, columns))
+        if make is None:
+            make = self._factories[(table, columns)] = record_factory(table, columns)
+
+        extra = "_extra" if columns == tuple(all_columns) else "NULL"
+        sql = f"SELECT {', '.join(map(_ident, columns))}{', ' if columns else ''}{extra} FROM {_ident(table)}"
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}"
+
+        for row in self.query(sql, params):
+            if row[-1] is None:
+                yield make(row[:-1])
+            else:
+                # cells beyond the header row (stored under a null key in the JSON)
+                yield record_factory(table, [*columns, "null"])((*row[:-1], json.loads(row[-1])))
+
+    def load_tables(self):
+        # same shape as data_loader.load_tables, without parsing JSON text
+        return tuple(list(self.rows(t)) for t in TABLES)
+
+    def load_index_tables(self):
+        # load_tables without TEXT_COLUMNS (and cells beyond the header)
+        return tuple(
+            list(self.rows(t, columns=[c for c in self.columns(t) if c not in TEXT_COLUMNS.get(t, ())]))
+            for t in TABLES
+        )
+
+    def spell(self, spell_id: str):
+        # full record; with duplicate ids the last row, as in index_tables
+        return next(self.rows("spells", "id = ?", (spell_id,), order="_row DESC"), None)
+
+    def spells(self):
+        """Full spell records index_tables keeps (id and manuscript_id set), in sheet order."""
+        required = ("id", "manuscript_id")
+        if not set(required) <= set(self.columns("spells")):
+            return iter(())
+        return self.rows("spells", " AND ".join(f"COALESCE({_ident(c)}, '') <> ''" for c in required))
+
@@ -1,22 +1,164 @@
 import os
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+import hashlib
+import shutil
+import time
+from pathlib import Path
 
-BASE_PATH = os.environ.get("BASE_PATH", "").strip()
-if BASE_PATH:
-    BASE_PATH = "/" + BASE_PATH.strip("/")
-else:
-    BASE_PATH = ""
-CACHE_BUST = os.environ.get("CACHE_BUST", "").strip()
+import jinja2
+from jinja2 import Environment, FileSystemLoader, ModuleLoader, FileSystemBytecodeCache, select_autoescape
 
-def root(path: str) -> str:
-    return f"{BASE_PATH}{path}"
 
-def make_env():
+def normalize_base_path(value) -> str:
+    # "mc", "/mc/" -> "/mc"; empty -> "" (site at the server root)
+    value = (value or "").strip().strip("/")
+    return "/" + value if value else ""
+
+
+# default corpus; sitegen.corpora gives every configured corpus its own
+BASE_PATH = normalize_base_path(os.environ.get("BASE_PATH"))
+
+TEMPLATES = Path("templates")
+# bytecode is only valid for the Jinja version that produced it
+JINJA_CACHE = Path(".build/jinja") / jinja2.__version__
+COMPILED = Path(".build/templates_compiled") / jinja2.__version__
+
+
+def root_url(base_path: str = BASE_PATH):
+    # site-absolute URL of a path under one corpus' base path
+    def root(path: str) -> str:
+        return f"{base_path}{path}"
+    return root
+
+
+def asset_url(assets, base_path: str = BASE_PATH):
+    # assets: {name: fingerprinted name} from sitegen.assets.publish_assets
+    def asset(name: str) -> str:
+        return f"{base_path}/{assets.get(name, name)}"
+    return asset
+
+
+class CountingBytecodeCache(FileSystemBytecodeCache):
+    # Jinja checks the source checksum itself; this only records whether
+    # compiled code was actually reused
+    def __init__(self, directory):
+        super().__init__(str(directory))
+        self.hits = 0
+        self.misses = 0
+
+    def load_bytecode(self, bucket):
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+
+def templates_digest() -> str:
+    h = hashlib.sha256(jinja2.__version__.encode("ascii"))
+    for p in sorted(TEMPLATES.rglob("*")):
+        if p.is_file():
+            h.update(p.relative_to(TEMPLATES).as_posix().encode("utf-8"))
+            h.update(p.read_bytes())
+    return h.hexdigest()
+
+
+def precompile_templates(target: Path = COMPILED) -> Path:
+    """Compile templates/ into Python modules under target (if stale)."""
+    digest = templates_digest()
+    stamp = target / "SOURCE_DIGEST"
+    if stamp.exists() and stamp.read_text(encoding="ascii") == digest:
+        return target
+
+    tmp = target.with_name(target.name + f".{os.getpid()}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    _configure(Environment(loader=FileSystemLoader(str(TEMPLATES)))).compile_templates(
+        str(tmp), zip=None, ignore_errors=False
+    )
+    (tmp / "SOURCE_DIGEST").write_text(digest, encoding="ascii")
+
+    shutil.rmtree(target, ignore_errors=True)
+    try:
+        tmp.rename(target)
+    except OSError:
+        # another process finished first; its output is equivalent
+        shutil.rmtree(tmp, ignore_errors=True)
+    return target
+
+
+def _configure(env, assets=None, base_path: str = BASE_PATH):
+    env.autoescape = select_autoescape(["html", "xml"])
+    set_corpus(env, base_path, assets or {})
+    return env
+
+
+def set_assets(env, assets) -> None:
+    env.globals["assets"] = dict(assets)
+    env.globals["asset"] = asset_url(env.globals["assets"], env.globals["base_path"])
+
+
+def set_corpus(env, base_path: str, assets) -> None:
+    """Point ``env`` at another corpus' base path and assets.
+
+    Loaded templates read globals through the environment, so one env (and
+    its compiled templates) serves every corpus of a multi-corpus build.
+    The HTML built in Python (sitegen.pages, services) takes ``root`` from
+    the same globals, so it can only follow this env, never another one.
+    """
+    env.globals["base_path"] = base_path
+    env.globals["root"] = root_url(base_path)
+    set_assets(env, assets)
+
+
+def make_env(precompiled: bool = False, assets=None, base_path: str = BASE_PATH):
+    if precompiled:
+        # templates are imported as Python modules: no parsing or codegen
+        loader = ModuleLoader(str(precompile_templates()))
+        return _configure(Environment(loader=loader), assets, base_path)
+
     env = Environment(
-        loader=FileSystemLoader("templates"),
-        autoescape=select_autoescape(["html", "xml"]),
+        loader=FileSystemLoader(str(TEMPLATES)),
+        bytecode_cache=CountingBytecodeCache(_cache_dir()),
     )
-    env.globals["base_path"] = BASE_PATH
-    env.globals["cache_bust"] = CACHE_BUST
-    env.globals["root"] = root
-    return env
\ No newline at end of file
+    return _configure(env, assets, base_path)
+
+
+def _cache_dir() -> Path:
+    JINJA_CACHE.mkdir(parents=True, exist_ok=True)
+    return JINJA_CACHE
+
+
+def check_template_cache() -> bool:
+    """Load every template cold, then warm, and report timings + cache hits."""
+    names = sorted(
+        p.relative_to(TEMPLATES).as_posix()
+        for p in TEMPLATES.rglob("*.html")
+    )
+    shutil.rmtree(JINJA_CACHE, ignore_errors=True)
+
+    def load_all(**kwargs):
+        t0 = time.perf_counter()
+        env = make_env(**kwargs)
+        for name in names:
+            env.get_template(name)
+        return env, time.perf_counter() - t0
+
+    cold, cold_t = load_all()
+    warm, warm_t = load_all()
+    shutil.rmtree(COMPILED, ignore_errors=True)
+    _, compile_t = load_all(precompiled=True)
+    _, module_t = load_all(precompiled=True)
+
+    n = len(names)
+    print(f"{n} templates")
+    print(f"  cold  (parse + compile):   {cold_t * 1000:8.1f} ms  ({cold.bytecode_cache.misses} cache misses)")
+    print(f"  warm  (bytecode cache):    {warm_t * 1000:8.1f} ms  ({warm.bytecode_cache.hits} cache hits)")
+    print(f"  precompile to modules:     {compile_t * 1000:8.1f} ms")
+    print(f"  precompiled module load:   {module_t * 1000:8.1f} ms")
+
+    ok = warm.bytecode_cache.hits == n and warm.bytecode_cache.misses == 0
+    print("bytecode cache OK" if ok else "bytecode cache NOT hit")
+    return ok
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if check_template_cache() else 1)
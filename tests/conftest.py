@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = ROOT / "scripts"
+
+# the build scripts import each other as top-level modules from scripts/;
+# fetch_from_gsheets.py lives at the repository root
+sys.path.insert(0, str(SCRIPTS))
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def run():
+    """Run a pipeline script in a work directory; returns its stdout."""
+    def run(workdir, script, *args, env=None):
+        base = {k: v for k, v in os.environ.items() if k not in ("BASE_PATH", "SOURCE_DATE_EPOCH")}
+        proc = subprocess.run(
+            [sys.executable, str(SCRIPTS / script), *map(str, args)],
+            cwd=workdir, env={**base, **(env or {})}, capture_output=True, text=True,
+        )
+        assert proc.returncode == 0, proc.stdout + proc.stderr
+        return proc.stdout
+    return run
+
+
+@pytest.fixture
+def corpus(tmp_path, run):
+    """Work directory with a small generated corpus converted to site/data."""
+    from gen_corpus import generate
+
+    generate(tmp_path / "data", manuscripts=12, spells=300, seed=1)
+    for name in ("templates", "assets"):
+        os.symlink(ROOT / name, tmp_path / name, target_is_directory=True)
+    run(tmp_path, "build_data.py")
+    return tmp_path
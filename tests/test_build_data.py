@@ -0,0 +1,55 @@
+import json
+
+from build_data import csv_to_json, row_hash
+
+
+def test_row_hash_ragged_row():
+    # a row with more cells than the header has its extra cells under None
+    assert row_hash({"id": "1", None: ["x"]}) != row_hash({"id": "1"})
+
+
+def test_csv_to_json_ragged_row(tmp_path):
+    data_dir = tmp_path / "data"
+    out_dir = tmp_path / "out"
+    data_dir.mkdir()
+    out_dir.mkdir()
+    (data_dir / "spells.csv").write_text("id;title_en\nsp1;Binding;extra;cells\nsp2;Fever\n", encoding="utf-8")
+
+    state = csv_to_json("spells", {}, data_dir=data_dir, out_dir=out_dir, changes_dir=tmp_path)
+
+    assert sorted(state["rows"]) == ["sp1", "sp2"]
+    rows = json.loads((out_dir / "spells.json").read_text(encoding="utf-8"))
+    assert rows[0]["null"] == ["extra", "cells"]
+    changes = json.loads((tmp_path / "spells.changes.json").read_text(encoding="utf-8"))
+    assert changes["added"] == ["sp1", "sp2"]
+
+    # the extra cells count as content: changing them marks the row modified
+    (data_dir / "spells.csv").write_text("id;title_en\nsp1;Binding;other\nsp2;Fever\n", encoding="utf-8")
+    csv_to_json("spells", state, data_dir=data_dir, out_dir=out_dir, changes_dir=tmp_path)
+    changes = json.loads((tmp_path / "spells.changes.json").read_text(encoding="utf-8"))
+    assert changes["modified"] == ["sp1"]
+
+
+def _changes(tmp_path, csv, prev):
+    (tmp_path / "spells.csv").write_text(csv, encoding="utf-8")
+    state = csv_to_json("spells", prev, data_dir=tmp_path, out_dir=tmp_path, changes_dir=tmp_path / "build")
+    return state, json.loads((tmp_path / "build" / "spells.changes.json").read_text(encoding="utf-8"))
+
+
+def test_changeset_duplicate_keys(tmp_path):
+    state, changes = _changes(tmp_path, "id;title_en\nsp1;A\nsp2;B\nsp1;C\n", {})
+    assert changes == {"added": ["sp1", "sp2"], "removed": [], "modified": []}
+    assert not (tmp_path / "spells.changes.json").exists()
+
+    # either copy of a duplicated key changing marks it modified, once
+    state, changes = _changes(tmp_path, "id;title_en\nsp1;A2\nsp2;B\nsp1;C\n", state)
+    assert changes == {"added": [], "removed": [], "modified": ["sp1"]}
+    state, changes = _changes(tmp_path, "id;title_en\nsp1;A2\nsp2;B\nsp1;C2\n", state)
+    assert changes == {"added": [], "removed": [], "modified": ["sp1"]}
+
+    # a key that becomes duplicated is modified; a new duplicated key is added once
+    state, changes = _changes(tmp_path, "id;title_en\nsp1;A2\nsp2;B\nsp1;C2\nsp2;B\nsp3;D\nsp3;E\n", state)
+    assert changes == {"added": ["sp3"], "removed": [], "modified": ["sp2"]}
+
+    state, changes = _changes(tmp_path, "id;title_en\nsp1;A2\nsp1;C2\n", state)
+    assert changes == {"added": [], "removed": ["sp2", "sp3"], "modified": []}
@@ -0,0 +1,53 @@
+from sitegen.services import CategoryTree
+
+
+def _cat(cid, parent=""):
+    return {"id": cid, "name": cid.title(), "parent_id": parent}
+
+
+def test_spell_count_is_distinct_over_the_subtree():
+    tree = CategoryTree(
+        [_cat("root"), _cat("child", "root"), _cat("leaf", "child"), _cat("side", "root")],
+        {"root": ["s1"], "child": ["s1", "s2"], "leaf": ["s2", "s3"], "side": ["s1"]},
+    )
+    # s1 is tagged on root, child and side, s2 on child and leaf
+    assert tree.spell_count("root") == 3
+    assert tree.spell_count("child") == 3
+    assert tree.spell_count("leaf") == 2
+    assert tree.spell_count("side") == 1
+    assert tree.spell_count("missing") == 0
+
+
+def test_cycles_are_reported_and_still_indexed():
+    tree = CategoryTree(
+        [_cat("a", "c"), _cat("b", "a"), _cat("c", "b"), _cat("tail", "a"), _cat("ok")],
+        {"tail": ["s1"], "b": ["s2"]},
+    )
+    assert len(tree.cycles) == 1
+    cycle = tree.cycles[0]
+    assert cycle[0] == cycle[-1] and set(cycle) == {"a", "b", "c"}
+
+    # every category gets a finite path and is placed in the depth-first order
+    assert sorted(tree.order) == ["a", "b", "c", "ok", "tail"]
+    assert [c["id"] for c in tree.ancestors("tail")][-2:] == ["a", "tail"]
+    assert len(tree.ancestors("c")) == 3
+    assert tree.spell_count("ok") == 0
+
+
+def test_is_ancestor_uses_the_depth_first_intervals():
+    tree = CategoryTree(
+        [_cat("r"), _cat("x", "r"), _cat("x1", "x"), _cat("x2", "x"), _cat("y", "r"), _cat("other")],
+    )
+    pairs = [
+        ("r", "r", True), ("r", "x1", True), ("x", "x2", True), ("r", "y", True),
+        ("x", "y", False), ("x1", "x", False), ("x1", "x2", False), ("other", "r", False),
+        ("r", "missing", False), ("missing", "r", False),
+    ]
+    for a, b, expected in pairs:
+        assert tree.is_ancestor(a, b) is expected, (a, b)
+
+    for cid in tree.order:
+        # tin/tout bracket exactly the subtree
+        assert tree.subtree(cid) == [d for d in tree.order if tree.is_ancestor(cid, d)]
+    assert tree.subtree("x") == ["x", "x1", "x2"]
+    assert [c["id"] for c in tree.ancestors("x2")] == ["r", "x", "x2"]
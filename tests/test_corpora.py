@@ -0,0 +1,74 @@
+import json
+import os
+import re
+
+from conftest import ROOT
+
+LINK = re.compile(r'(?:href|src|data-src|data-root)="([^"]*)"')
+
+
+def test_each_corpus_links_under_its_base_path(tmp_path, run):
+    from gen_corpus import generate
+
+    for name in ("templates", "assets"):
+        os.symlink(ROOT / name, tmp_path / name, target_is_directory=True)
+    config = {"corpora": [{"name": "a", "base_path": "alpha"}, {"name": "b", "base_path": "/beta/"}]}
+    (tmp_path / "corpora.json").write_text(json.dumps(config), encoding="utf-8")
+    for seed, name in enumerate(("a", "b"), start=1):
+        generate(tmp_path / "data" / name, manuscripts=4, spells=40, seed=seed)
+
+    run(tmp_path, "build_data.py", "--config", "corpora.json")
+    run(
+        tmp_path, "build_site.py", "--config", "corpora.json",
+        "--precompiled-templates", "--jobs", "2", "--api", "--check-links", "--strict",
+    )
+
+    for name, base in (("a", "/alpha"), ("b", "/beta")):
+        site = tmp_path / "site" / name
+        links = [
+            link
+            for page in site.rglob("*.html")
+            for link in LINK.findall(page.read_text(encoding="utf-8"))
+        ]
+        api_page = (site / "api" / "spells" / "pages" / "1.json").read_text(encoding="utf-8")
+        links += re.findall(r'"(?:href|next|ndjson)":"([^"]*)"', api_page)
+        site_links = [link for link in links if link.startswith("/")]
+        assert site_links
+        assert all(link == base or link.startswith(base + "/") for link in site_links), (
+            name, sorted({link for link in site_links if not link.startswith(base)})[:5]
+        )
+
+
+class MemoryOutput:
+    fragments = None
+    profile = None
+
+    def __init__(self):
+        self.files = {}
+
+    def write(self, rel, data):
+        self.files[rel] = data
+
+
+def test_python_built_links_follow_their_env(tmp_path, monkeypatch):
+    from sitegen.pages import build_categories_index
+    from sitegen.services import CategoryTree
+    from templating import make_env, precompile_templates
+
+    os.symlink(ROOT / "templates", tmp_path / "templates", target_is_directory=True)
+    monkeypatch.chdir(tmp_path)
+    tree = CategoryTree(
+        [{"id": "c1", "name": "Charms", "parent_id": ""}, {"id": "c2", "name": "Fever", "parent_id": "c1"}],
+        {"c2": ["s1"]},
+    )
+
+    alpha = make_env(base_path="/alpha")
+    # neither another corpus' env nor a template precompile may move alpha's links
+    make_env(base_path="/beta")
+    precompile_templates(tmp_path / "compiled")
+
+    out = MemoryOutput()
+    build_categories_index(out, alpha.get_template("categories_index.html"), tree)
+    links = LINK.findall(out.files["categories/index.html"])
+    assert "/alpha/categories/c1.html" in links
+    assert "/alpha/categories/c2.html" in links
@@ -0,0 +1,86 @@
+import base64
+import json
+
+import pytest
+
+from sitegen.facets import build_facets, encode_bitmap, to_bitset
+from sitegen.parallel import build_context
+
+
+def decode_bitmap(text: str, n: int):
+    # what facets.js does with a bitmap from facets/<family>.json
+    data = base64.b64decode(text[1:])
+    if text[0] == "b":
+        return [o for o in range(n) if data[o >> 3] >> (o & 7) & 1]
+    ordinals, o, gap, shift = [], -1, 0, 0
+    for byte in data:
+        gap |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            o += gap + 1
+            ordinals.append(o)
+            gap = shift = 0
+    return ordinals
+
+
+@pytest.mark.parametrize("ordinals, n, kind", [
+    ([], 10, "d"),
+    ([0], 1, "b"),
+    ([3, 200, 201, 5000], 6000, "d"),  # gaps above 127 take two varint bytes
+    (list(range(0, 1000, 2)), 1000, "b"),
+    (list(range(17)), 17, "b"),
+])
+def test_bitmap_round_trip(ordinals, n, kind):
+    text = encode_bitmap(to_bitset(ordinals, n), n)
+    assert text[0] == kind
+    assert decode_bitmap(text, n) == ordinals
+
+
+class MemoryOutput:
+    def __init__(self):
+        self.files = {}
+
+    def write(self, rel, data):
+        self.files[rel] = data
+
+
+def test_category_facets_cover_the_subtree():
+    ctx = build_context(
+        [{"id": "m1", "title": "Codex", "siglum": "A"}],
+        [{"id": sid, "manuscript_id": "m1", "title_en": title, "page": "1r"}
+         for sid, title in (("s1", "Alpha"), ("s2", "Beta"), ("s3", "Gamma"))],
+        [
+            {"id": "root", "name": "Root", "parent_id": ""},
+            {"id": "child", "name": "Child", "parent_id": "root"},
+            {"id": "leaf", "name": "Leaf", "parent_id": "child"},
+            {"id": "other", "name": "Other", "parent_id": ""},
+        ],
+        [
+            {"spell_id": "s1", "category_id": "root"},
+            {"spell_id": "s1", "category_id": "child"},
+            {"spell_id": "s2", "category_id": "leaf"},
+            {"spell_id": "s3", "category_id": "other"},
+        ],
+    )
+    out = MemoryOutput()
+    build_facets(out, ctx)
+
+    meta = json.loads(out.files["facets/meta.json"])
+    n = meta["spells"]
+    bitmaps = json.loads(out.files["facets/category.json"])
+    docs = json.loads(out.files["facets/d/0.json"])
+    spells = {cid: sorted(docs[o][2] for o in decode_bitmap(b, n)) for cid, b in bitmaps.items()}
+
+    tree = ctx["tree"]
+    assert tree.subtree("root") == ["root", "child", "leaf"]
+    assert spells["root"] == ["s1", "s2"]
+    assert spells["child"] == ["s1", "s2"]
+    assert spells["leaf"] == ["s2"]
+    assert spells["other"] == ["s3"]
+    for cid, ids in spells.items():
+        # the bitmap is the union over the subtree
+        tagged = {link["spell_id"] for link in ctx["rows"][3] if link["category_id"] in tree.subtree(cid)}
+        assert ids == sorted(tagged)
+        assert tree.spell_count(cid) == len(ids)
+    # counts in meta are distinct spells (s1 is tagged twice under root)
+    assert {v: count for v, _, count in meta["facets"]["category"]}["root"] == 2
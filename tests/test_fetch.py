@@ -0,0 +1,53 @@
+import gspread
+import pytest
+
+import fetch_from_gsheets as fetch
+from fetch_from_gsheets import FakeSheetsSession, RateLimited, fetch_all, gspread_transport
+
+SHEETS = {
+    "manuscripts": [["id", "name"], ["ms1", "Vat. syr. 1"]],
+    "spells": [["id", "title_en", "page"], ["sp1", "Binding", ""], ["sp2"]],
+}
+
+
+def _client(failures=(), modified="2024-01-01T00:00:00.000Z"):
+    session = FakeSheetsSession({"modifiedTime": modified, "sheets": SHEETS}, failures, retry_after=0.5)
+    return gspread.Client(None, session=session), session
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fetch.time, "sleep", calls.append)
+    return calls
+
+
+def test_fetch_retries_and_fills_gaps(tmp_path, sleeps):
+    gc, session = _client(failures=[429, 503])
+    state = tmp_path / "fetch.json"
+
+    assert fetch_all(gspread_transport(gc, "sheet"), list(SHEETS), data_dir=tmp_path, state_path=state)
+    assert sleeps == [0.5, 0.5]
+    # one batchGet for all sheets, with quoted A1 ranges
+    batches = [params for url, params in session.requests if url.endswith("/values:batchGet")]
+    assert batches == [{"ranges": ["'manuscripts'", "'spells'"]}]
+    # batchGet drops empty trailing cells; the CSV keeps the full width
+    assert (tmp_path / "spells.csv").read_text(encoding="utf-8").splitlines() == ["id;title_en;page", "sp1;Binding;", "sp2;;"]
+
+    # same modifiedTime: nothing is downloaded
+    gc, session = _client()
+    assert not fetch_all(gspread_transport(gc, "sheet"), list(SHEETS), data_dir=tmp_path, state_path=state)
+    assert not any(url.endswith("/values:batchGet") for url, _ in session.requests)
+
+    # same modifiedTime, but the CSV on disk is not the one that was fetched
+    (tmp_path / "spells.csv").write_text("id;title_en;page\nsp1;Stale;\n", encoding="utf-8")
+    gc, session = _client()
+    assert fetch_all(gspread_transport(gc, "sheet"), list(SHEETS), data_dir=tmp_path, state_path=state)
+    assert (tmp_path / "spells.csv").read_text(encoding="utf-8").splitlines()[1] == "sp1;Binding;"
+
+
+def test_fetch_gives_up_after_max_retries(tmp_path, sleeps):
+    gc, _ = _client(failures=[429] * (fetch.MAX_RETRIES + 1))
+    with pytest.raises(RateLimited):
+        gspread_transport(gc, "sheet")
+    assert len(sleeps) == fetch.MAX_RETRIES
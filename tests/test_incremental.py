@@ -0,0 +1,45 @@
+import csv
+import json
+
+from build_data import detect_delimiter
+
+
+def _site(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in root.rglob("*") if p.is_file()}
+
+
+def _pages(corpus):
+    return json.loads((corpus / ".build" / "manifest.json").read_text(encoding="utf-8"))["pages"]
+
+
+def test_incremental_build_renders_only_dependent_pages(corpus, run):
+    run(corpus, "build_site.py", "--incremental")
+    before = _pages(corpus)
+
+    path = corpus / "data" / "spells.csv"
+    text = path.read_text(encoding="utf-8")
+    delimiter = detect_delimiter(text[:4096])
+    rows = list(csv.DictReader(text.splitlines(), delimiter=delimiter))
+    links = json.loads((corpus / "site" / "data" / "spell_categories.json").read_text(encoding="utf-8"))
+    tagged = {link["spell_id"] for link in links}
+    sp = next(r for r in rows if r["id"] in tagged)
+    sp["translation"] = (sp["translation"] or "") + " (revised)"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]), delimiter=delimiter)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    run(corpus, "build_data.py")
+    log = run(corpus, "build_site.py", "--incremental")
+    after = _pages(corpus)
+
+    rerendered = {rel for rel, deps in after.items() if before.get(rel) != deps}
+    # the spell's own page plus the pages that list its record
+    expected = {f"spells/{sp['id']}.html", f"manuscripts/{sp['manuscript_id']}.html"}
+    expected |= {f"categories/{link['category_id']}.html" for link in links if link["spell_id"] == sp["id"]}
+    assert rerendered == expected
+    assert f"Incremental build: {len(expected)} rendered" in log
+
+    incremental = _site(corpus / "site")
+    run(corpus, "build_site.py", "--clean")
+    assert _site(corpus / "site") == incremental
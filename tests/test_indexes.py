@@ -0,0 +1,34 @@
+import sqlite3
+
+from build_data import convert
+from sitegen.data_loader import load_tables
+from sitegen.indexes import index_tables
+
+CSV = {
+    "manuscripts": "id;title;siglum\nm1;Codex;A\n",
+    # blank lines (as a hand-edited export has them) must not shift later rows
+    "spells": "id;manuscript_id;title_en\ns1;m1;Binding\n\n\ns2;m9;Fever\n;m1;Nameless\n\ns1;m1;Again\n",
+    "categories": "id;name;parent_id\nc1;Charms;\n\nc2;Fevers;c9\n",
+    "spell_categories": "spell_id;category_id\ns1;c1\n\ns2;c7\n",
+}
+
+
+def test_findings_report_sheet_rows(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name, text in CSV.items():
+        (data_dir / f"{name}.csv").write_text(text, encoding="utf-8")
+    sqlite = tmp_path / "corpus.sqlite"
+    convert(data_dir, tmp_path / "json", tmp_path / "ingest.json", sqlite)
+
+    findings = index_tables(*load_tables(tmp_path / "json"))["findings"]
+    assert sorted((f.table, f.row, f.message) for f in findings) == [
+        ("categories", 4, "Category c2 has parent_id=c9 which does not exist"),
+        ("spell_categories", 4, "Link references missing category_id=c7"),
+        ("spells", 5, "Spell s2 references missing manuscript_id=m9"),
+        ("spells", 6, "row without id, skipped"),
+        ("spells", 8, "Duplicate spell id s1 (first on row 2)"),
+    ]
+
+    with sqlite3.connect(sqlite) as db:
+        assert db.execute("SELECT _row FROM spells WHERE id = 's2'").fetchone() == (5,)
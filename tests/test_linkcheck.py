@@ -0,0 +1,40 @@
+import pytest
+
+from sitegen import linkcheck
+from sitegen.linkcheck import check_site
+from sitegen.output import open_output
+
+PAGES = {
+    "index.html": (
+        '<a href="/mc/a.html#top">ok</a> <a href="/mc/a.html#nowhere">anchor</a> '
+        '<a href="/mc/missing.html">missing</a> <a href="sub/">dir</a> <a href="/elsewhere/x.html">out</a> '
+        '<link href="/mc/style.css" rel="stylesheet"><img src="img/gone.png"> <a href="https://example.org/">ext</a>'
+        '<script>var s = \'<a href="/mc/not-a-link.html">\';</script>'
+    ),
+    "a.html": '<h1 id="top">A</h1><a href="#local">same page</a><a name="local"></a><a href="index.html">home</a>',
+    "sub/index.html": '<a href="../a.html#top">a</a>',
+    "orphan.html": "<p>nobody links here</p>",
+    "style.css": "body{}",
+}
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_broken_links_and_anchors(tmp_path, monkeypatch, jobs):
+    for rel, text in PAGES.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    monkeypatch.setattr(linkcheck, "CHUNK", 1)  # one pool task per page
+
+    issues, stats = check_site(open_output(tmp_path), jobs=jobs, base_path="/mc")
+
+    assert sorted((i.level, i.page, i.message) for i in issues) == [
+        ("error", "index.html", "broken link: /mc/missing.html"),
+        ("error", "index.html", "broken link: img/gone.png"),
+        ("error", "index.html", "link outside BASE_PATH /mc: /elsewhere/x.html"),
+        ("error", "index.html", "missing anchor: /mc/a.html#nowhere"),
+        ("warning", "orphan.html", "orphan page (no other page links to it)"),
+    ]
+    assert stats["broken"] == 3
+    assert stats["missing_anchors"] == 1
+    assert stats["orphans"] == 1
@@ -0,0 +1,62 @@
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import ROOT
+from sitegen.minify import minify_css, minify_js
+
+ASSETS = ROOT / "assets"
+
+
+@pytest.mark.parametrize("path", sorted(ASSETS.glob("*.js")), ids=lambda p: p.name)
+def test_shipped_js_still_parses(path, tmp_path):
+    if shutil.which("node") is None:
+        pytest.skip("node is not installed")
+    out = tmp_path / path.name
+    out.write_text(minify_js(path.read_text(encoding="utf-8")), encoding="utf-8")
+    proc = subprocess.run(["node", "--check", str(out)], capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+
+
+@pytest.mark.parametrize("path", sorted(ASSETS.glob("*.*")), ids=lambda p: p.name)
+def test_shipped_assets_are_stable(path):
+    minify = {".js": minify_js, ".css": minify_css}[path.suffix]
+    once = minify(path.read_text(encoding="utf-8"))
+    assert minify(once) == once
+
+
+def test_js_literals_are_copied():
+    src = (
+        "const url = `https://example.org/${id}`; // the page\n"
+        "const s = 'a // b', t = \"c /* d */\";\n"
+        "const re = /\\/\\/+/g, half = n / 2 / 1;\n"
+        "const nested = `${a ? `x // ${b}` : '}'}`;\n"
+    )
+    assert minify_js(src) == (
+        "const url = `https://example.org/${id}`;\n"
+        "const s = 'a // b', t = \"c /* d */\";\n"
+        "const re = /\\/\\/+/g, half = n / 2 / 1;\n"
+        "const nested = `${a ? `x // ${b}` : '}'}`;"
+    )
+
+
+def test_js_comments_are_dropped():
+    src = "/* header\n   comment */\nfoo(); /* inline */ bar();\n\n\n  // note\nreturn /x*/.test(s);\n"
+    assert minify_js(src) == "foo(); bar();\nreturn /x*/.test(s);"
+
+
+def test_css_values_and_selectors():
+    src = (
+        "/* theme */\n"
+        "a:not(.x) :hover , p > b {\n"
+        "  content: \"a: b\";\n"
+        "  background: url(data:image/svg+xml;utf8,<svg>a: b</svg>) ;\n"
+        "}\n"
+        "@media (min-width: 600px) {\n  .nav { color: red; }\n}\n"
+    )
+    assert minify_css(src) == (
+        'a:not(.x) :hover,p>b{content:"a: b";'
+        "background:url(data:image/svg+xml;utf8,<svg>a: b</svg>)}"
+        "@media (min-width: 600px){.nav{color:red}}"
+    )
@@ -0,0 +1,52 @@
+import gzip
+
+from sitegen.output import ArchiveOutput, SiteWriter, open_output
+
+
+def _build(tmp_path, ndjson: bytes):
+    backend = ArchiveOutput.create(tmp_path / "site.tar", tmp_path / "site", tmp_path / "spool")
+    out = SiteWriter(tmp_path / "site", filters=None, profile=None, fragments=None, backend=backend)
+    out.write("index.html", "<p>index</p>")
+    with out.stream("api/spells.ndjson") as f:
+        f.write(ndjson)
+    out.finish()
+    return out
+
+
+def test_archive_stream_counts_unchanged_output(tmp_path):
+    first = _build(tmp_path, b'{"id":"sp1"}\n')
+    assert (first.written, first.unchanged) == (2, 0)
+
+    again = _build(tmp_path, b'{"id":"sp1"}\n')
+    assert (again.written, again.unchanged) == (0, 2)
+
+    changed = _build(tmp_path, b'{"id":"sp2"}\n')
+    assert (changed.written, changed.unchanged) == (1, 1)
+    assert open_output(tmp_path / "site.tar").read("api/spells.ndjson") == b'{"id":"sp2"}\n'
+
+
+def _gz_mismatches(archive):
+    out = open_output(archive)
+    return [
+        rel for rel in out.files()
+        if rel.endswith(".gz") and gzip.decompress(out.read(rel)) != out.read(rel[:-3])
+    ]
+
+
+def test_archive_gzip_follows_changed_data(corpus, run):
+    args = ("--gzip", "--incremental", "--output-archive", "site.tar")
+    run(corpus, "build_site.py", *args)
+    assert _gz_mismatches(corpus / "site.tar") == []
+
+    spells = corpus / "data" / "spells.csv"
+    lines = spells.read_text(encoding="utf-8").splitlines(keepends=True)
+    cells = lines[1].split(";")
+    cells[2] = "Renamed charm"
+    lines[1] = ";".join(cells)
+    spells.write_text("".join(lines), encoding="utf-8")
+    run(corpus, "build_data.py")
+    run(corpus, "build_site.py", *args)
+
+    assert _gz_mismatches(corpus / "site.tar") == []
+    page = gzip.decompress(open_output(corpus / "site.tar").read(f"spells/{cells[0]}.html.gz"))
+    assert b"Renamed charm" in page
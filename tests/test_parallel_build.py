@@ -0,0 +1,9 @@
+from sitegen.output import diff_outputs, open_output
+
+
+def test_jobs_output_matches_serial(corpus, run):
+    options = ("--api", "--parallels", "--minify")
+    run(corpus, "build_site.py", *options, "--output-archive", "serial.tar")
+    run(corpus, "build_site.py", *options, "--jobs", "2", "--output-archive", "jobs2.tar")
+
+    assert diff_outputs(open_output(corpus / "serial.tar"), open_output(corpus / "jobs2.tar")) == []
@@ -0,0 +1,48 @@
+from sitegen.parallel import build_context
+from sitegen.parallels import find_parallels, shingles, similarity, signature
+from sitegen.records import record_hook
+
+TEXT = (
+    "I bind and seal the fever and the shivering and the pain of the head "
+    "by the name of the living God, who made heaven and earth"
+)
+
+
+def _ctx():
+    spells = [
+        {"id": "s1", "manuscript_id": "m1", "title_en": "Against fever", "translation": TEXT},
+        # the same charm in another manuscript: other capitalization, a few words added
+        {"id": "s2", "manuscript_id": "m2", "title_en": "Against Fever",
+         "translation": TEXT.replace("shivering", "shivering cold").replace("seal", "seal up")},
+        {"id": "s3", "manuscript_id": "m2", "title_en": "For a safe journey",
+         "translation": "Go in peace on the road and may no robber or beast come near you"},
+        # a copy inside s1's own manuscript is not listed as its parallel
+        {"id": "s4", "manuscript_id": "m1", "title_en": "Against fever", "translation": TEXT},
+    ]
+    # records as data_loader.load_tables makes them
+    manuscripts = [{"id": "m1", "title": "Codex A", "siglum": "A"}, {"id": "m2", "title": "Codex B", "siglum": "B"}]
+    return build_context(
+        list(map(record_hook("manuscripts"), manuscripts)),
+        [record_hook("spells")({**sp, "page": "fol. 1r"}) for sp in spells],
+        [], [],
+    )
+
+
+def test_near_duplicates_across_manuscripts(tmp_path):
+    ctx = _ctx()
+    sp = ctx["idx"]["spell_by_id"]
+    assert similarity(signature(shingles(sp["s1"])), signature(shingles(sp["s2"]))) > 0.7
+
+    result = find_parallels(ctx, tmp_path / "parallels.json", threshold=0.5)
+
+    rows, total = result["by_spell"]["s1"]
+    assert [r["spell_id"] for r in rows] == ["s2"] and total == 1
+    assert rows[0]["siglum"] == "B" and rows[0]["similarity"] >= 70
+    assert [r["spell_id"] for r in result["by_spell"]["s2"][0]] == ["s1", "s4"]
+    assert "s3" not in result["by_spell"]
+    assert [sorted(ids) for ids in result["clusters"]] == [["s1", "s2", "s4"]]
+
+    # signatures come from the cache on the next build
+    again = find_parallels(_ctx(), tmp_path / "parallels.json", threshold=0.5)
+    assert again["stats"]["signed"] == 0
+    assert again["by_spell"] == result["by_spell"]
@@ -0,0 +1,26 @@
+from sitegen import profiling
+from sitegen.profiling import Profiler, format_profile
+
+
+def test_profile_without_getrusage(monkeypatch):
+    # Windows has no resource module: RSS columns are left empty
+    monkeypatch.setattr(profiling, "resource", None)
+    prof = Profiler(enabled=True)
+    with prof.stage("load"):
+        pass
+    (stage,) = prof.report()["stages"]
+    assert stage["max_rss_bytes"] is None and stage["rss_growth_bytes"] is None
+    assert format_profile(prof.report()).splitlines()[2].split()[-2:] == ["-", "-"]
+
+
+def test_rss_growth_is_per_stage():
+    prof = Profiler(enabled=True)
+    with prof.stage("small"):
+        pass
+    with prof.stage("large"):
+        block = bytearray(64 << 20)
+        block[::4096] = b"x" * len(block[::4096])
+    small, large = prof.report()["stages"]
+    assert small["rss_growth_bytes"] < 16 << 20
+    assert large["rss_growth_bytes"] >= 32 << 20
+    assert large["max_rss_bytes"] >= small["max_rss_bytes"] + large["rss_growth_bytes"]
@@ -0,0 +1,6 @@
+from sitegen.search import tokenize
+
+
+def test_tokens_fold_like_the_browser():
+    # search.js folds queries with toLowerCase(), which keeps "ß"
+    assert tokenize("Straße ΣΟΦΙΑ") == ["straße", "σοφια"]
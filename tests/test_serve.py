@@ -0,0 +1,19 @@
+from sitegen.corpora import default_corpus
+
+
+def test_dev_build_leaves_the_production_site(corpus, run, monkeypatch):
+    run(corpus, "build_site.py", "--incremental", "--api", "--gzip")
+    site = corpus / "site"
+    before = {p: p.read_bytes() for p in site.rglob("*") if p.is_file()}
+    manifest = (corpus / ".build" / "manifest.json").read_bytes()
+
+    monkeypatch.chdir(corpus)
+    from serve import DevBuild
+
+    dev = DevBuild(default_corpus())
+    dev.build()
+
+    assert {p: p.read_bytes() for p in site.rglob("*") if p.is_file()} == before
+    assert (corpus / ".build" / "manifest.json").read_bytes() == manifest
+    assert (dev.site_dir / "index.html").is_file()
+    assert (corpus / ".build" / "dev-manifest.json").is_file()
@@ -0,0 +1,42 @@
+import pytest
+
+from sitegen.sortkeys import SpellKey, page_key, spell_keys
+
+# each pair: the first reference sorts strictly before the second
+BEFORE = [
+    ("fol. 2v", "fol. 10r"),
+    ("fol. 10r", "fol. 10v"),
+    ("fol. 10v", "fol. 11r"),
+    ("fol. 9", "fol. 9r"),  # unsided before recto
+    ("fol. 3ra", "fol. 3rb"),
+    ("fol. 3rb", "fol. 3va"),
+    ("ff. 3rb-4v", "fol. 4r"),  # a range sorts by its first folio
+    ("12 r", "fol. 12v"),
+    ("p. 7", "p. 70"),
+    ("fol. 200v", "?"),  # no number: after every numbered reference
+    ("", "flyleaf"),
+]
+
+
+@pytest.mark.parametrize("first, second", BEFORE)
+def test_page_key_order(first, second):
+    assert page_key(first) < page_key(second)
+
+
+@pytest.mark.parametrize("a, b", [("fol. 12v", "FOL.  12V"), ("12 r", "fol.12r"), ("f. 3 v", "3v")])
+def test_page_key_ignores_spelling(a, b):
+    assert page_key(a)[:4] == page_key(b)[:4]
+
+
+def test_spell_keys_sort_by_title_siglum_folio_id():
+    manuscripts = {"m1": {"siglum": "B"}, "m2": {"siglum": "a"}}
+    spells = [
+        {"id": "s5", "manuscript_id": "m1", "title_en": "Binding", "page": "fol. 10r"},
+        {"id": "s4", "manuscript_id": "m1", "title_en": "binding ", "page": "fol. 2v"},
+        {"id": "s3", "manuscript_id": "m2", "title_en": "Binding", "page": "fol. 30r"},
+        {"id": "s2", "manuscript_id": "m1", "title_en": "Binding", "page": "fol. 2v"},
+        {"id": "s1", "manuscript_id": "m1", "title_en": "", "page": "fol. 1r"},
+    ]
+    keyed = spell_keys(spells, manuscripts)
+    assert all(isinstance(k, SpellKey) for k, _ in keyed)
+    assert [sp["id"] for _, sp in sorted(keyed, key=lambda pair: pair[0])] == ["s3", "s2", "s4", "s5", "s1"]
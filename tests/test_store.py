@@ -0,0 +1,55 @@
+import csv
+import tracemalloc
+
+from sitegen.data_loader import load_tables
+from sitegen.output import diff_outputs, open_output
+from sitegen.parallel import build_context
+from sitegen.store import CorpusStore
+
+
+def _peak(load):
+    tracemalloc.start()
+    try:
+        ctx = build_context(*load())
+        return tracemalloc.get_traced_memory()[1], ctx
+    finally:
+        tracemalloc.stop()
+
+
+def _lengthen_translations(path, factor):
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f, delimiter=";"))
+    col = rows[0].index("translation")
+    for row in rows[1:]:
+        row[col] = " ".join([row[col]] * factor)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, delimiter=";").writerows(rows)
+
+
+def test_sqlite_build_matches_json_build(corpus, run):
+    run(corpus, "build_data.py", "--sqlite")
+    options = ("--api", "--parallels", "--clean")
+    run(corpus, "build_site.py", *options, "--output-archive", "json.tar")
+    run(corpus, "build_site.py", *options, "--sqlite", "--jobs", "2", "--output-archive", "sqlite.tar")
+
+    assert diff_outputs(open_output(corpus / "json.tar"), open_output(corpus / "sqlite.tar")) == []
+
+
+def test_sqlite_build_keeps_less_in_memory(corpus, run):
+    # translations of a few KB, as in the real sheets
+    _lengthen_translations(corpus / "data" / "spells.csv", 20)
+    run(corpus, "build_data.py", "--sqlite")
+
+    json_peak, json_ctx = _peak(lambda: load_tables(corpus / "site" / "data"))
+    store = CorpusStore(corpus / ".build" / "corpus.sqlite")
+    store_peak, store_ctx = _peak(store.load_index_tables)
+
+    assert store_peak < json_peak / 2
+    # the same records and indexes, minus the text the pages query per page
+    assert [sp["id"] for _, sp in store_ctx["idx"]["spells_sorted"]] == [
+        sp["id"] for _, sp in json_ctx["idx"]["spells_sorted"]
+    ]
+    sid = json_ctx["rows"][1][0]["id"]
+    assert "translation" not in store_ctx["idx"]["spell_by_id"][sid]
+    assert store.spell(sid) == json_ctx["idx"]["spell_by_id"][sid]
+    store.close()